@@ -0,0 +1,113 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+from functools import wraps
+from flask import jsonify
+from instrumentation import ADMISSION_REJECTIONS, ADMISSION_WAIT
+
+# Chat turns allowed to run at once in this process
+CHAT_MAX_CONCURRENT = int(os.getenv('CHAT_MAX_CONCURRENT', '8'))
+# Turns allowed to wait for a slot; beyond this new ones are turned away immediately
+CHAT_MAX_QUEUE = int(os.getenv('CHAT_MAX_QUEUE', '16'))
+# Longest a turn may wait for a slot before giving up
+CHAT_QUEUE_TIMEOUT_SECONDS = float(os.getenv('CHAT_QUEUE_TIMEOUT_SECONDS', '2.0'))
+
+REASON_BUSY = 'session_busy'
+REASON_QUEUE_FULL = 'queue_full'
+REASON_TIMEOUT = 'queue_timeout'
+
+MESSAGES = {
+    REASON_BUSY: "Still working on your last message. Please wait for the reply.",
+    REASON_QUEUE_FULL: "Genie is busy right now. Please try again in a moment.",
+    REASON_TIMEOUT: "Genie is busy right now. Please try again in a moment.",
+}
+
+class Rejected(Exception):
+    def __init__(self, reason, retry_after):
+        super().__init__(MESSAGES[reason])
+        self.reason = reason
+        self.retry_after = retry_after
+
+class AdmissionController:
+    """Bounds concurrent work: one in-flight turn per session and a global slot limit.
+
+    A session that already has a turn running is rejected straight away. Others
+    wait for a slot only while the queue is short and only up to the queue-time
+    budget, so overload turns into quick 429s instead of a growing backlog that
+    drags every request's latency up.
+    """
+
+    def __init__(self, max_concurrent=CHAT_MAX_CONCURRENT, max_queue=CHAT_MAX_QUEUE,
+                 queue_timeout=CHAT_QUEUE_TIMEOUT_SECONDS, name='chat'):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._in_flight = set()
+        self.waiting = 0
+        self.running = 0
+
+    def _reject(self, reason, retry_after):
+        ADMISSION_REJECTIONS.inc(controller=self.name, reason=reason)
+        raise Rejected(reason, retry_after)
+
+    @contextmanager
+    def admit(self, session_key):
+        with self._lock:
+            if session_key is not None and session_key in self._in_flight:
+                busy = True
+            else:
+                busy = False
+                queue_full = self.waiting >= self.max_queue
+                if not queue_full:
+                    self.waiting += 1
+                    if session_key is not None:
+                        self._in_flight.add(session_key)
+        if busy:
+            self._reject(REASON_BUSY, 1)
+        if queue_full:
+            self._reject(REASON_QUEUE_FULL, max(int(self.queue_timeout), 1))
+
+        start = time.perf_counter()
+        acquired = self._slots.acquire(timeout=self.queue_timeout)
+        ADMISSION_WAIT.observe(time.perf_counter() - start, controller=self.name)
+        with self._lock:
+            self.waiting -= 1
+            if acquired:
+                self.running += 1
+            elif session_key is not None:
+                self._in_flight.discard(session_key)
+        if not acquired:
+            self._reject(REASON_TIMEOUT, max(int(self.queue_timeout), 1))
+
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.running -= 1
+                if session_key is not None:
+                    self._in_flight.discard(session_key)
+            self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {'running': self.running, 'waiting': self.waiting, 'max_concurrent': self.max_concurrent}
+
+def admission_controlled(controller, key_func):
+    """Run a view under `controller`, answering 429 with Retry-After when it is turned away"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                with controller.admit(key_func()):
+                    return view(*args, **kwargs)
+            except Rejected as e:
+                response = jsonify({'error': str(e), 'reason': e.reason})
+                response.status_code = 429
+                response.headers['Retry-After'] = str(e.retry_after)
+                return response
+        return wrapper
+    return decorator
@@ -1,36 +1,72 @@
-from flask import Flask, render_template, request, session, redirect, url_for, jsonify
+from flask import Flask, render_template, request, session, redirect, url_for, jsonify, g, Response, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
-from openai import OpenAI
 import os
 from dotenv import load_dotenv
 import secrets
 from google_calendar import (
     parse_event_details, create_event, SCOPES, 
-    get_events, get_events_at_time, check_overlapping_events,
-    format_event, is_valid_event, parse_iso_time,
-    check_availability
+    get_events, format_event, is_valid_event,
+    check_availability, iter_events, local_day_bounds, event_bounds,
+    acting_as, set_acting_user, reset_acting_user, set_credentials_provider,
+    event_id, NotAuthenticated, CalendarUnavailable
 )
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
+from googleapiclient.errors import HttpError
+from credential_store import CredentialStore
 from collections import defaultdict
+from bisect import bisect_left
+from overlaps import overlap_clusters
 import datetime
 import pytz
-from airtable import Airtable
 import json
+import re
 import requests  # Add this import
 from werkzeug.security import generate_password_hash, check_password_hash
-from sqlalchemy.pool import QueuePool
-from sqlalchemy import create_engine
 import time
+import click
 from contextlib import contextmanager
+from functools import lru_cache
+from trip_planner import plan_trip, book_trip, parse_trip_length, to_local_date, DEFAULT_TRIP_DAYS
+from event_cache import get_event_cache
+from calendar_view import (
+    render_calendar_view, render_events, serialize_events,
+    view_window, view_etag, VIEW_DAYS
+)
+from calendar_sync import ensure_watch, handle_notification
+from formatting import render_message, detect_kind, KIND_TEXT, KIND_CALENDAR, KIND_TRAVEL
+from availability import find_free_slots, DEFAULT_WORKING_HOURS, DEFAULT_SLOT_LIMIT
+from intent_router import (
+    classify, canned_response, timed_route, get_route_stats,
+    ROUTE_CALENDAR, ROUTE_CACHED, ROUTE_CHAT
+)
+from instrumentation import init_app as init_metrics, instrument_sqlalchemy, render_metrics, timed
+import tracing
+import logging
+import log_config
+from log_config import session_ref
+import health
+from admission import AdmissionController, admission_controlled
+from job_queue import JobQueue, DONE, FAILED
+from gazetteer import resolve_destination
+from feasibility import get_destinations, rank_destinations, travel_minutes, distance_between, format_duration
+from preferences import parse_preferences, changed_fields, DEFAULT_PREFERENCES, TravelPreferences
+import chat_export
+import assets
+from lazy import LazyObject, lazy_import
 from markupsafe import Markup  # Replace jinja2.Markup with markupsafe.Markup
 
 load_dotenv()
 
+# Heavy SDKs, imported the first time they are used rather than at startup
+OpenAI = lazy_import('openai', 'OpenAI')
+Flow = lazy_import('google_auth_oauthlib.flow', 'Flow')
+Airtable = lazy_import('airtable', 'Airtable')
+
+log_config.setup_logging()
+logger = logging.getLogger(__name__)
+
 app = Flask(__name__, static_url_path='/static', static_folder='static')
 app.secret_key = os.getenv('FLASK_SECRET_KEY')
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///chat.db?timeout=30'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///chat.db?timeout=30')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
     'pool_size': 10,
@@ -45,6 +81,11 @@ app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
 }
 
 db = SQLAlchemy(app)
+instrument_sqlalchemy()
+init_metrics(app)
+tracing.init_app(app)
+log_config.init_app(app)
+assets.init_app(app)
 
 @contextmanager
 def session_scope():
@@ -60,16 +101,97 @@ def session_scope():
         session.close()
 
 class ChatMessage(db.Model):
+    # History is always read per session in id order
+    __table_args__ = (db.Index('ix_chat_message_session_id_id', 'session_id', 'id'),)
     id = db.Column(db.Integer, primary_key=True)
     session_id = db.Column(db.String(32), nullable=False)
     role = db.Column(db.String(10), nullable=False)
     content = db.Column(db.Text, nullable=False)
+    # HTML rendered once at write time so history pages are a straight read
+    rendered = db.Column(db.Text)
     timestamp = db.Column(db.DateTime, default=db.func.current_timestamp())
 
-client = OpenAI(
-    api_key=os.getenv('OPENAI_API_KEY'),
-    # Remove base_url since we're using OpenAI directly
-)
+class CalendarCredential(db.Model):
+    # One Google OAuth token per user (email once signed in, else the session id)
+    user_key = db.Column(db.String(255), primary_key=True)
+    token = db.Column(db.Text, nullable=False)
+    updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
+
+class Job(db.Model):
+    # Background work run by job_queue.JobQueue; workers claim by status and run_after
+    __table_args__ = (db.Index('ix_job_status_run_after', 'status', 'run_after'),)
+    id = db.Column(db.String(32), primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    user_key = db.Column(db.String(255))
+    # Client-supplied key; a retried request maps back to the job it already created
+    idempotency_key = db.Column(db.String(255), unique=True)
+    payload = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(10), nullable=False)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    run_after = db.Column(db.Float, nullable=False)  # Unix seconds
+    leased_until = db.Column(db.Float)
+    result = db.Column(db.Text)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+
+def load_credentials(user_key):
+    # May run on background threads (push-triggered syncs), so bring an app context along
+    with app.app_context():
+        row = db.session.get(CalendarCredential, user_key)
+        return row.token if row else None
+
+def save_credentials(user_key, token):
+    with app.app_context(), session_scope() as db_session:
+        db_session.merge(CalendarCredential(user_key=user_key, token=token))
+
+def delete_credentials(user_key):
+    with app.app_context(), session_scope() as db_session:
+        db_session.query(CalendarCredential).filter_by(user_key=user_key).delete()
+
+credential_store = CredentialStore(load_credentials, save_credentials, delete_credentials, scopes=SCOPES)
+set_credentials_provider(credential_store.valid)
+
+# Calendar writes run here so /chat can reply before Google answers
+jobs = JobQueue(app, db, Job, permanent_errors=(NotAuthenticated,))
+
+def current_user_key():
+    return session.get('user_email') or session.get('session_id')
+
+def sign_in(email, name, session_id):
+    """Start a signed-in session; a calendar connected before signing in moves to the account"""
+    previous_key = current_user_key()
+    session['user_email'] = email
+    session['user_name'] = name
+    session['session_id'] = session_id
+    if previous_key and previous_key != email:
+        credential_store.move(previous_key, email)
+
+def calendar_connected():
+    """Whether the current user has stored Google credentials; a memory lookup once warm"""
+    return credential_store.has(current_user_key())
+
+@app.before_request
+def act_as_current_user():
+    # Calendar calls made while handling the request use this user's credentials
+    g.calendar_user_token = set_acting_user(current_user_key())
+
+@app.teardown_request
+def stop_acting_as_user(error=None):
+    token = g.pop('calendar_user_token', None)
+    if token is not None:
+        reset_acting_user(token)
+
+client = LazyObject(lambda: OpenAI(api_key=os.getenv('OPENAI_API_KEY')))
+CHAT_MODEL = os.getenv('OPENAI_CHAT_MODEL', 'gpt-3.5-turbo')
+# Public HTTPS address of /calendar/notify; enables push-based cache updates
+CALENDAR_WEBHOOK_URL = os.getenv('CALENDAR_WEBHOOK_URL')
+# Google OAuth client: the JSON itself, or the client secrets file downloaded from the console
+GOOGLE_CLIENT_CONFIG = os.getenv('GOOGLE_CLIENT_CONFIG')
+GOOGLE_CLIENT_SECRETS_FILE = os.getenv('GOOGLE_CLIENT_SECRETS_FILE', 'credentials.json')
+HISTORY_PAGE_SIZE = 50
+# How each calendar intent's reply is formatted when stored
+RESPONSE_KINDS = {'view': KIND_CALENDAR, 'trip_planning': KIND_TRAVEL}
+MAX_HISTORY_PAGE_SIZE = 200
 
 # Airtable configuration
 AIRTABLE_ENABLED = bool(os.getenv('AIRTABLE_ENABLED', 'false').lower() == 'true')
@@ -79,23 +201,17 @@ USER_TABLE_NAME = 'UserProfiles'
 
 airtable = None
 if AIRTABLE_ENABLED and AIRTABLE_BASE_ID and AIRTABLE_API_KEY:
-    try:
-        airtable = Airtable(
-            AIRTABLE_BASE_ID,
-            USER_TABLE_NAME,
-            api_key=AIRTABLE_API_KEY
-        )
-        # Verify connection and table existence
-        test = airtable.get_all(maxRecords=1)
-        print("Successfully connected to Airtable")
-    except Exception as e:
-        print(f"Failed to initialize Airtable: {str(e)}")
-        print("Please check:")
-        print("1. Your Personal Access Token is correct and starts with 'pat.'")
-        print("2. The base ID is correct")
-        print("3. A table named 'UserProfiles' exists in your base")
-        print("4. The token has proper permissions for the base")
-        airtable = None
+    airtable = LazyObject(lambda: Airtable(AIRTABLE_BASE_ID, USER_TABLE_NAME, api_key=AIRTABLE_API_KEY))
+
+    def probe_airtable():
+        with timed('airtable', 'get_all'):
+            airtable.get_all(maxRecords=1)
+
+    # Checked in the background once the app serves requests, not at import
+    health.register(
+        'airtable', probe_airtable,
+        hint=f"check the token starts with 'pat.', the base ID, that table '{USER_TABLE_NAME}' exists and the token can access it"
+    )
 
 # Add Voiceflow configuration after existing configurations
 VOICEFLOW_API_KEY = os.getenv('VOICEFLOW_API_KEY')
@@ -119,11 +235,12 @@ def get_voiceflow_response(user_id, message):
             }
         }
         
-        response = requests.post(
-            f'{VOICEFLOW_API_URL}/{user_id}/{VOICEFLOW_VERSION_ID}/interact',
-            headers=headers,
-            json=data
-        )
+        with timed('voiceflow', 'interact'):
+            response = requests.post(
+                f'{VOICEFLOW_API_URL}/{user_id}/{VOICEFLOW_VERSION_ID}/interact',
+                headers=headers,
+                json=data
+            )
         
         if response.status_code == 200:
             responses = response.json()
@@ -136,78 +253,34 @@ def get_voiceflow_response(user_id, message):
             return ' '.join(text_responses) if text_responses else None
         return None
     except Exception as e:
-        print(f"Voiceflow error: {str(e)}")
+        logger.warning("Voiceflow error: %s", e)
         return None
 
-def validate_preferences(preferences_str):
-    try:
-        if not preferences_str:
-            return get_default_preferences()
-        prefs = json.loads(preferences_str)
-        return {
-            'theme': prefs.get('theme', 'light'),
-            'language': prefs.get('language', 'en'),
-            'notifications': prefs.get('notifications', True),
-            'calendar_default_duration': prefs.get('calendar_default_duration', 60),
-            'timezone': prefs.get('timezone', 'America/Denver'),
-            'food_preferences': {
-                'budget_per_meal': prefs.get('food_preferences', {}).get('budget_per_meal', 20),
-                'dietary_restrictions': prefs.get('food_preferences', {}).get('dietary_restrictions', []),
-                'cuisine_preferences': prefs.get('food_preferences', {}).get('cuisine_preferences', [])
-            },
-            'travel_preferences': {
-                'mode': prefs.get('travel_preferences', {}).get('mode', 'driving'),
-                'max_travel_time': prefs.get('travel_preferences', {}).get('max_travel_time', 60),
-                'accommodation_budget': prefs.get('travel_preferences', {}).get('accommodation_budget', 150),
-                'preferred_airlines': prefs.get('travel_preferences', {}).get('preferred_airlines', [])
-            }
-        }
-    except json.JSONDecodeError:
-        return get_default_preferences()
-
-def get_default_preferences():
-    return {
-        'theme': 'light',
-        'language': 'en',
-        'notifications': True,
-        'calendar_default_duration': 60,
-        'timezone': 'America/Denver',
-        'food_preferences': {
-            'budget_per_meal': 20,
-            'dietary_restrictions': [],
-            'cuisine_preferences': []
-        },
-        'travel_preferences': {
-            'mode': 'driving',
-            'max_travel_time': 60,
-            'accommodation_budget': 150,
-            'preferred_airlines': []
-        }
-    }
-
 def get_user_profile(session_id):
     if not airtable:
-        return {'SessionID': session_id, 'Preferences': json.dumps(get_default_preferences())}
+        return {'SessionID': session_id, 'Preferences': DEFAULT_PREFERENCES.to_json()}
     try:
         # Use formula instead of search
         formula = f"{{SessionID}} = '{session_id}'"
-        records = airtable.get_all(formula=formula)
+        with timed('airtable', 'get_all'):
+            records = airtable.get_all(formula=formula)
         
         if records:
-            print(f"Found existing profile for session {session_id}")
+            logger.info("Found existing profile", extra={'session': session_ref(session_id), 'sample_rate': 0.1})
             return records[0]['fields']
         else:
-            print(f"Creating new profile for session {session_id}")
+            logger.info("Creating new profile", extra={'session': session_ref(session_id)})
             # Create default profile
             profile_data = {
                 'SessionID': session_id,
-                'Preferences': json.dumps(get_default_preferences())
+                'Preferences': DEFAULT_PREFERENCES.to_json()
             }
-            result = airtable.insert(profile_data)
+            with timed('airtable', 'insert'):
+                result = airtable.insert(profile_data)
             return result['fields'] if result else profile_data
     except Exception as e:
-        print(f"Error in get_user_profile: {str(e)}")
-        return {'SessionID': session_id, 'Preferences': json.dumps(get_default_preferences())}
+        logger.exception("Error in get_user_profile", extra={'session': session_ref(session_id)})
+        return {'SessionID': session_id, 'Preferences': DEFAULT_PREFERENCES.to_json()}
 
 def create_or_update_user_profile(session_id, profile_data):
     if not airtable:
@@ -215,20 +288,27 @@ def create_or_update_user_profile(session_id, profile_data):
     try:
         # Search for existing profile
         formula = f"{{SessionID}} = '{session_id}'"
-        records = airtable.get_all(formula=formula)
+        with timed('airtable', 'get_all'):
+            records = airtable.get_all(formula=formula)
         
         if records:
-            record_id = records[0]['id']
-            airtable.update(record_id, profile_data)
-            print(f"Updated profile for session {session_id}")
+            # Only send what actually changed; an identical save costs no write at all
+            changes = changed_fields(records[0]['fields'], profile_data)
+            if not changes:
+                logger.info("Profile unchanged", extra={'session': session_ref(session_id)})
+                return True
+            with timed('airtable', 'update'):
+                airtable.update(records[0]['id'], changes)
+            logger.info("Updated profile", extra={'session': session_ref(session_id), 'fields': sorted(changes)})
         else:
             # Create new profile
             profile_data['SessionID'] = session_id
-            airtable.insert(profile_data)
-            print(f"Created new profile for session {session_id}")
+            with timed('airtable', 'insert'):
+                airtable.insert(profile_data)
+            logger.info("Created new profile", extra={'session': session_ref(session_id)})
         return True
     except Exception as e:
-        print(f"Error in create_or_update_user_profile: {str(e)}")
+        logger.exception("Error in create_or_update_user_profile", extra={'session': session_ref(session_id)})
         return False
 
 @app.route('/')
@@ -239,89 +319,286 @@ def home():
     # Get user profile from Airtable with error handling
     user_profile = get_user_profile(session['session_id'])
     
-    # Get chat history from database
-    messages = ChatMessage.query.filter_by(session_id=session['session_id']).all()
-    return render_template('chat.html', messages=messages, user_profile=user_profile)
+    # Only the latest page is rendered; older messages load on scroll via /history
+    messages, has_more = recent_messages(session['session_id'])
+    return render_template('chat.html', messages=messages, has_more=has_more, user_profile=user_profile)
+
+def recent_messages(session_id, before=None, limit=HISTORY_PAGE_SIZE):
+    """Newest page of a session's messages in chronological order, and whether older ones exist"""
+    query = ChatMessage.query.filter_by(session_id=session_id)
+    if before is not None:
+        query = query.filter(ChatMessage.id < before)
+    rows = query.order_by(ChatMessage.id.desc()).limit(limit + 1).all()
+    return rows[:limit][::-1], len(rows) > limit
+
+def newer_messages(session_id, after, limit=HISTORY_PAGE_SIZE):
+    """The page of a session's messages right after `after`, oldest first, and whether newer ones exist"""
+    rows = (
+        ChatMessage.query.filter_by(session_id=session_id)
+        .filter(ChatMessage.id > after)
+        .order_by(ChatMessage.id)
+        .limit(limit + 1)
+        .all()
+    )
+    return rows[:limit], len(rows) > limit
+
+@app.template_global()
+def message_html(message):
+    """Stored HTML for a message; rows written before rendering was stored are rendered now"""
+    if message.rendered is not None:
+        return Markup(message.rendered)
+    return render_message(message.role, message.content)
+
+@app.route('/history')
+def history():
+    session_id = session.get('session_id')
+    if not session_id:
+        return jsonify({'messages': [], 'has_more': False})
+    
+    limit = min(max(request.args.get('limit', HISTORY_PAGE_SIZE, type=int), 1), MAX_HISTORY_PAGE_SIZE)
+    after = request.args.get('after', type=int)
+    if after is not None:
+        # Paging back down after older pages pushed the newest messages out of the page
+        messages, has_more = newer_messages(session_id, after, limit)
+    else:
+        messages, has_more = recent_messages(session_id, request.args.get('before', type=int), limit)
+    return jsonify({
+        'messages': [
+            {'id': message.id, 'role': message.role, 'html': message_html(message)}
+            for message in messages
+        ],
+        'has_more': has_more
+    })
+
+# Bounds concurrent chat turns so spikes get a fast 429 instead of a slow reply for everyone
+chat_admission = AdmissionController()
 
 @app.route('/chat', methods=['POST'])
+@admission_controlled(chat_admission, lambda: session.get('session_id'))
 def chat():
     user_message = request.form['message']
     session_id = session['session_id']
+    job_id = None
     
     try:
         with session_scope() as db_session:
             # Save user message
-            user_msg = ChatMessage(role='user', content=user_message, session_id=session_id)
+            user_msg = ChatMessage(
+                role='user', content=user_message, session_id=session_id,
+                rendered=render_message('user', user_message)
+            )
             db_session.add(user_msg)
             
-            # Check for calendar event
-            event_data = parse_event_details(user_message)
+            # Route to the cheapest handler that can answer the message
+            route, canned_label = classify(user_message)
+            event_data = parse_event_details(user_message) if route == ROUTE_CALENDAR else None
+            if route == ROUTE_CALENDAR and not event_data:
+                route = ROUTE_CHAT
+            
             if event_data:
-                if not os.path.exists('token.json'):
+                if not calendar_connected():
                     return {'error': 'Please authenticate first'}, 401
                 
                 try:
-                    if event_data["type"] == "view":
-                        events = get_events()
-                        ai_response = format_calendar_view(events)
-                    
-                    elif event_data["type"] == "check_availability":
-                        events = get_events()
-                        availability = check_availability(event_data["date"], events)
-                        ai_response = format_availability_response(availability)
-                    
-                    elif event_data["type"] == "recurring":
-                        ai_response = handle_recurring_event(event_data)
-                    
-                    elif event_data["type"] == "trip_planning":
-                        ai_response = handle_trip_planning(event_data, session_id)
-                    
-                    else:
-                        # Handle regular event creation
-                        if not event_data.get("summary") or not event_data.get("start_time"):
-                            return {'error': 'Could not parse event details. Try "Add [event] at [time]"'}, 400
+                    with timed_route(ROUTE_CALENDAR, event_data["type"]):
+                        if event_data["type"] == "view":
+                            ai_response = render_calendar_view(get_event_cache())
+                        
+                        elif event_data["type"] == "check_availability":
+                            day_start, day_end = local_day_bounds(event_data["date"])
+                            availability = check_availability(event_data["date"], iter_events(day_start, day_end))
+                            ai_response = format_availability_response(availability, suggest_slots(event_data["date"]))
+                        
+                        elif event_data["type"] == "recurring":
+                            ai_response, job_id = handle_recurring_event(event_data, session_id)
                         
-                        ai_response = create_event(
-                            summary=event_data.get("summary"),
-                            start_time=event_data.get("start_time"),
-                            end_time=event_data.get("end_time"),
-                            description=event_data.get("description", ""),
-                            location=event_data.get("location", "")
-                        )
+                        elif event_data["type"] == "trip_planning":
+                            ai_response, job_id = handle_trip_planning(event_data, session_id)
+                        
+                        else:
+                            # Handle regular event creation
+                            if not event_data.get("summary") or not event_data.get("start_time"):
+                                return {'error': 'Could not parse event details. Try "Add [event] at [time]"'}, 400
+                            
+                            ai_response, job_id = schedule_event(event_data, session_id)
                 
+                except NotAuthenticated:
+                    # Stored credentials were revoked or could not be refreshed
+                    return {'error': 'Please authenticate first'}, 401
                 except Exception as e:
                     return {'error': f"Calendar error: {str(e)}"}, 500
+            elif route == ROUTE_CACHED:
+                with timed_route(ROUTE_CACHED, canned_label):
+                    ai_response = canned_response(canned_label)
             else:
                 # Handle non-calendar messages with OpenAI
-                ai_response = handle_chat_message(session_id, user_message)
+                with timed_route(ROUTE_CHAT):
+                    ai_response, job_id = handle_chat_message(session_id, user_message)
             
             # Save AI response
-            ai_msg = ChatMessage(role='assistant', content=ai_response, session_id=session_id)
+            # Only the calendar view's own output is stored as HTML; anything else,
+            # model replies included, is escaped whatever it looks like
+            kind = RESPONSE_KINDS.get(event_data["type"], KIND_TEXT) if event_data else detect_kind(ai_response)
+            ai_html = render_message('assistant', ai_response, kind)
+            ai_msg = ChatMessage(role='assistant', content=ai_response, session_id=session_id, rendered=ai_html)
             db_session.add(ai_msg)
+            db_session.flush()
             
-            return {'response': ai_response}
+            if event_data and event_data["type"] == "view":
+                return {'response': ai_response, 'html': ai_html, 'id': ai_msg.id, 'view': 'calendar'}
+            if job_id:
+                # The UI polls /jobs/<id> for the outcome of the calendar write
+                return {'response': ai_response, 'html': ai_html, 'id': ai_msg.id, 'job': job_id}
+            return {'response': ai_response, 'html': ai_html, 'id': ai_msg.id}
             
+    except NotAuthenticated:
+        return {'error': 'Please authenticate first'}, 401
     except Exception as e:
-        print(f"Error in chat route: {str(e)}")
+        logger.exception("Error in chat route", extra={'session': session_ref(session_id)})
         return {'error': str(e)}, 500
 
+@app.route('/availability')
+def availability():
+    if not calendar_connected():
+        return jsonify({'error': 'Please authenticate first'}), 401
+    
+    try:
+        tz_name = request.args.get('timezone', 'America/Denver')
+        tz = pytz.timezone(tz_name)
+        now = datetime.datetime.now(tz)
+        start = datetime.datetime.fromisoformat(request.args['start']) if 'start' in request.args else now
+        end = datetime.datetime.fromisoformat(request.args['end']) if 'end' in request.args else now + datetime.timedelta(days=7)
+        if not start.tzinfo:
+            start = tz.localize(start)
+        if not end.tzinfo:
+            end = tz.localize(end)
+        prefer_hour = request.args.get('prefer_hour', type=int)
+        calendars = [c for c in request.args.get('calendars', '').split(',') if c] or None
+        
+        slots = find_free_slots(
+            (start, end),
+            duration=datetime.timedelta(minutes=request.args.get('duration', 60, type=int)),
+            working_hours=(
+                request.args.get('work_start', DEFAULT_WORKING_HOURS[0], type=int),
+                request.args.get('work_end', DEFAULT_WORKING_HOURS[1], type=int)
+            ),
+            buffer=datetime.timedelta(minutes=request.args.get('buffer', 0, type=int)),
+            timezone=tz_name,
+            limit=request.args.get('limit', DEFAULT_SLOT_LIMIT, type=int),
+            preferred_hour=prefer_hour,
+            calendar_ids=calendars
+        )
+    except (ValueError, pytz.UnknownTimeZoneError) as e:
+        return jsonify({'error': f"Invalid availability query: {str(e)}"}), 400
+    except NotAuthenticated:
+        return jsonify({'error': 'Please authenticate first'}), 401
+    except (CalendarUnavailable, HttpError) as e:
+        logger.warning("Availability check failed: %s", e)
+        return jsonify({'error': "Couldn't check your calendar right now; please try again"}), 502
+    
+    return jsonify({
+        'slots': [{'start': s.isoformat(), 'end': e.isoformat()} for s, e in slots],
+        'count': len(slots)
+    })
+
+@app.route('/calendar/events')
+def calendar_events():
+    if not calendar_connected():
+        return jsonify({'error': 'Please authenticate first'}), 401
+    
+    days = min(max(request.args.get('days', VIEW_DAYS, type=int), 1), 365)
+    cache = get_event_cache()
+    first_day, window_start, window_end = view_window(days=days)
+    try:
+        version = cache.ensure(window_start, window_end)
+    except NotAuthenticated:
+        return jsonify({'error': 'Please authenticate first'}), 401
+    except HttpError as e:
+        logger.warning("Calendar fetch failed: %s", e)
+        return jsonify({'error': "Couldn't load your calendar right now; please try again"}), 502
+    etag = view_etag(cache.fingerprint, first_day, days)
+    
+    # Unchanged window: answer from the validator alone, no body, no upstream call
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = jsonify({
+            'version': version,
+            'start': window_start.isoformat(),
+            'end': window_end.isoformat(),
+            'events': serialize_events(cache.get_events(window_start, window_end))
+        })
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@app.before_request
+def watch_calendar():
+    # Push notifications keep the event cache fresh without polling
+    if CALENDAR_WEBHOOK_URL and request.endpoint != 'calendar_notify' and calendar_connected():
+        ensure_watch(CALENDAR_WEBHOOK_URL)
+
+@app.route('/calendar/notify', methods=['POST'])
+def calendar_notify():
+    if not handle_notification(request.headers):
+        return '', 404
+    return '', 200
+
+@app.route('/stats/routes')
+def route_stats():
+    return jsonify(get_route_stats())
+
+@app.before_request
+def start_health_checks():
+    health.start()
+
+@app.before_request
+def start_job_workers():
+    jobs.start()
+
+@app.route('/healthz')
+def healthz():
+    checks = health.get_status()
+    degraded = any(check['ok'] is False for check in checks.values())
+    return jsonify({'status': 'degraded' if degraded else 'ok', 'checks': checks})
+
+@app.route('/metrics')
+def metrics():
+    return app.response_class(render_metrics(), mimetype='text/plain; version=0.0.4')
+
 # Add these helper functions
-def format_availability_response(availability):
+def format_availability_response(availability, free_slots=None):
     if availability['is_available']:
         return f"📅 You're completely free on {availability['date']}! Perfect time for a trip! 🎉"
     busy_times = "\n".join(
         [f"- {start.strftime('%I:%M %p')} to {end.strftime('%I:%M %p')}" 
          for start, end in availability['busy_periods']]
     )
+    if free_slots:
+        free_times = "\n".join(
+            f"- {start.strftime('%I:%M %p')} to {end.strftime('%I:%M %p')}"
+            for start, end in free_slots
+        )
+        free_section = f"Free slots that day:\n{free_times}"
+    else:
+        free_section = "No free hour left during working hours that day."
     return (
         f"📅 On {availability['date']}, you have commitments during:\n"
         f"{busy_times}\n\n"
-        f"Free time available between these slots!"
+        f"{free_section}"
     )
 
-def handle_recurring_event(event_data):
-    events = get_events()
-    conflicts = []
+def suggest_slots(target_date, duration_minutes=60):
+    """Free one-hour slots during working hours on the target day"""
+    return find_free_slots(
+        local_day_bounds(target_date),
+        duration=datetime.timedelta(minutes=duration_minutes)
+    )
+
+@tracing.traced()
+def handle_recurring_event(event_data, session_id):
+    mst = pytz.timezone('America/Denver')
+    slots = []
     current_day = event_data["start_date"]
     
     while current_day <= event_data["end_date"]:
@@ -332,32 +609,48 @@ def handle_recurring_event(event_data):
             start_time = datetime.datetime.combine(current_day, event_data["base_time"].time())
             end_time = start_time + datetime.timedelta(hours=1)
         
-        daily_conflicts = get_events_at_time(
-            start_time.astimezone(pytz.timezone('America/Denver')),
-            end_time.astimezone(pytz.timezone('America/Denver'))
-        )
-        if daily_conflicts:
-            conflicts.append({
-                "date": current_day.strftime("%Y-%m-%d"),
-                "events": daily_conflicts
-            })
-        
+        slots.append((current_day, mst.localize(start_time), mst.localize(end_time)))
         current_day += datetime.timedelta(days=1)
     
+    if not slots:
+        return "🚫 No dates found for this recurring event.", None
+    
+    # One windowed, paginated pass over the whole range instead of a list call per day
+    slot_starts = [start.timestamp() for _, start, _ in slots]
+    daily_conflicts = defaultdict(list)
+    for event in iter_events(slots[0][1], slots[-1][2]):
+        event_start, event_end = event_bounds(event)
+        i = bisect_left(slot_starts, event_end) - 1
+        while i >= 0 and slots[i][2].timestamp() > event_start:
+            daily_conflicts[i].append(event)
+            i -= 1
+    conflicts = [
+        {"date": slots[i][0].strftime("%Y-%m-%d"), "events": daily_conflicts[i]}
+        for i in sorted(daily_conflicts)
+    ]
+    
     if conflicts:
         conflict_msg = "🚫 Conflicts found:\n"
         for conflict in conflicts:
             conflict_msg += f"\n📅 {conflict['date']}:\n"
             conflict_msg += "\n".join([f"- {format_event(e)}" for e in conflict['events']])
-        return conflict_msg + "\n\nPlease resolve conflicts first!"
+        return conflict_msg + "\n\nPlease resolve conflicts first!", None
     
-    # Create events if no conflicts
-    created_count = create_recurring_events(event_data)
-    return f"✅ Added {created_count} events for {event_data['duration']}!"
+    # Create events if no conflicts, in the background
+    occurrences = recurring_occurrences(event_data)
+    job_id = enqueue_calendar_job('calendar.recurring', {
+        'session_id': session_id,
+        'summary': event_data.get("summary"),
+        'description': event_data.get("description", ""),
+        'location': event_data.get("location", ""),
+        'duration': event_data['duration'],
+        'occurrences': [[start.isoformat(), end.isoformat()] for start, end in occurrences],
+    })
+    return f"⏳ Adding {len(occurrences)} events for {event_data['duration']}…", job_id
 
-def create_recurring_events(event_data):
-    """Create recurring events based on event data"""
-    created_count = 0
+def recurring_occurrences(event_data):
+    """(start, end) local datetimes for each occurrence of a recurring event"""
+    occurrences = []
     current_day = event_data["start_date"]
     
     while current_day <= event_data["end_date"]:
@@ -368,108 +661,64 @@ def create_recurring_events(event_data):
             start_time = datetime.datetime.combine(current_day, event_data["base_time"].time())
             end_time = start_time + datetime.timedelta(hours=1)
         
-        create_event(
-            summary=event_data.get("summary"),
-            start_time=start_time,
-            end_time=end_time,
-            description=event_data.get("description", ""),
-            location=event_data.get("location", "")
-        )
-        created_count += 1
+        occurrences.append((start_time, end_time))
         current_day += datetime.timedelta(days=event_data["interval"])
     
-    return created_count
-    events = get_events()
-    conflicts = []
-    current_day = event_data["start_date"]
-    
-    while current_day <= event_data["end_date"]:
-        if event_data["is_all_day"]:
-            start_time = datetime.datetime.combine(current_day, datetime.time(0,0))
-            end_time = start_time + datetime.timedelta(days=1)
-        else:
-            start_time = datetime.datetime.combine(current_day, event_data["base_time"].time())
-            end_time = start_time + datetime.timedelta(hours=1)
-        
-        daily_conflicts = get_events_at_time(
-            start_time.astimezone(pytz.timezone('America/Denver')),
-            end_time.astimezone(pytz.timezone('America/Denver'))
-        )
-        if daily_conflicts:
-            conflicts.append({
-                "date": current_day.strftime("%Y-%m-%d"),
-                "events": daily_conflicts
-            })
-        
-        current_day += datetime.timedelta(days=1)
-    
-    if conflicts:
-        conflict_msg = "🚫 Conflicts found:\n"
-        for conflict in conflicts:
-            conflict_msg += f"\n📅 {conflict['date']}:\n"
-            conflict_msg += "\n".join([f"- {format_event(e)}" for e in conflict['events']])
-        return conflict_msg + "\n\nPlease resolve conflicts first!"
-    
-    # Create events if no conflicts
-    created_count = create_recurring_events(event_data)
-    return f"✅ Added {created_count} events for {event_data['duration']}!"
+    return occurrences
 
+@tracing.traced()
 def handle_trip_planning(event_data, session_id):
-    """Enhanced trip planning with preferences"""
+    """Enhanced trip planning with preferences; returns the plan and the booking job's id"""
     # Get user preferences from Airtable
-    user_profile = get_user_profile(session_id)
-    preferences = json.loads(user_profile.get('Preferences', '{}'))
-    travel_prefs = preferences.get('travel_preferences', {})
+    travel_prefs = travel_preferences(session_id)
     
-    # Get calendar availability
-    free_days = []
-    current_day = event_data["start_date"]
-    end_date = event_data.get("end_date") or (current_day + datetime.timedelta(days=7))
-    
-    # Check calendar availability
-    while current_day <= end_date:
-        availability = check_availability(current_day, get_events())
-        if availability['is_available']:
-            free_days.append({
-                'date': current_day,
-                'formatted_date': current_day.strftime("%A, %B %d")
-            })
-        current_day += datetime.timedelta(days=1)
+    # Trip length comes from the requested dates unless the message gave one
+    start_date = to_local_date(event_data["start_date"])
+    length = event_data.get("duration_days")
+    if not length:
+        end_date = to_local_date(event_data.get("end_date") or (start_date + datetime.timedelta(days=DEFAULT_TRIP_DAYS - 1)))
+        length = max((end_date - start_date).days + 1, 1)
     
-    if not free_days:
-        return "🚫 No available dates found in your calendar for this trip."
+    # Find the earliest contiguous free block from one windowed calendar fetch
+    block = plan_trip(start_date, length)
+    if not block:
+        return "🚫 No available dates found in your calendar for this trip.", None
+    trip_start, trip_end = block
     
     # Format travel plan based on preferences
     response = format_travel_plan(
         destination=event_data['location'],
-        free_days=free_days,
+        trip_start=trip_start,
+        trip_end=trip_end,
         preferences=travel_prefs
     )
     
-    # Create calendar events for the trip
-    try:
-        created_events = create_trip_events(free_days[0]['date'], travel_prefs)
-        if created_events:
-            response += "\n\n✅ Added trip to your calendar!"
-    except Exception as e:
-        response += f"\n\n⚠️ Note: Couldn't add to calendar: {str(e)}"
+    # Book the trip and its travel buffers in the background
+    job_id = enqueue_calendar_job('calendar.trip', {
+        'session_id': session_id,
+        'destination': event_data['location'],
+        'trip_start': trip_start.isoformat(),
+        'trip_end': trip_end.isoformat(),
+        'preferences': travel_prefs.to_dict(),
+    })
+    response += "\n\n⏳ Adding the trip to your calendar…"
     
-    return response
+    return response, job_id
 
-def format_travel_plan(destination, free_days, preferences):
+def format_travel_plan(destination, trip_start, trip_end, preferences):
     """Format travel plan with bullet points"""
-    mode = preferences.get('mode', 'flying')
-    budget = preferences.get('accommodation_budget', 150)
-    max_time = preferences.get('max_travel_time', 60)
-    airlines = preferences.get('preferred_airlines', [])
+    mode = preferences.mode
+    budget = preferences.accommodation_budget
+    max_time = preferences.max_travel_time
+    airlines = preferences.preferred_airlines
+    nights = (trip_end - trip_start).days
     
     # Build response in parts for better structure
     header = f"🌍 Trip to {destination}\n"
     
-    dates_section = "\n📅 Available Dates:\n" + "\n".join(
-        f"• {day['formatted_date']}" 
-        for day in free_days[:3]
-    )
+    dates_section = "\n📅 Trip Dates:\n"
+    dates_section += f"• {trip_start.strftime('%A, %B %d')} to {trip_end.strftime('%A, %B %d')}\n"
+    dates_section += f"• {nights + 1} days, {nights} nights"
     
     prefs_section = "\n\n🎯 Your Preferences:\n"
     prefs_section += f"• Mode: {mode.title()}\n"
@@ -479,37 +728,199 @@ def format_travel_plan(destination, free_days, preferences):
     if mode == "flying" and airlines:
         prefs_section += f"\n• Preferred airlines: {', '.join(airlines)}"
     
-    return header + dates_section + prefs_section
+    return header + dates_section + prefs_section + format_getting_there(destination, preferences)
+
+SUGGEST_PATTERN = re.compile(
+    r"\b(?:suggest|recommend)\b.*\b(?:destinations?|trips?|places?|getaways?|somewhere)\b"
+    r"|\bwhere (?:should|could|can) (?:i|we) (?:go|travel)\b|\bweekend getaway\b"
+)
+SUGGESTION_LIMIT = 5
+
+def format_getting_there(destination, preferences):
+    """Estimated trip from the user's home town, or nothing if either place is unknown"""
+    home = resolve_destination(preferences.home_location)
+    place = resolve_destination(destination)
+    if not home or not place or home is place:
+        return ""
+    mode = preferences.mode
+    max_time = preferences.max_travel_time
+    distance = distance_between(home, place)
+    minutes = travel_minutes(distance, mode)
+    
+    section = "\n\n🧭 Getting There:\n"
+    section += f"• From {home.name}: about {format_duration(minutes)} by {mode} ({round(distance)} km)"
+    if minutes > max_time:
+        section += f"\n• Longer than your {max_time} minute limit; consider another mode"
+    return section
 
-def create_trip_events(start_date, preferences):
-    """Create calendar events for the trip"""
-    events = []
+def suggest_destinations(preferences, limit=SUGGESTION_LIMIT):
+    """Destinations within the user's travel time, cheapest and closest first"""
+    home = resolve_destination(preferences.home_location)
+    if not home:
+        return "🏠 I don't know where home is yet. Set your home town in Travel Preferences and ask again."
+    mode = preferences.mode
+    max_time = max(preferences.max_travel_time, 1)
+    budget = preferences.accommodation_budget
+    
+    ideas = rank_destinations(get_destinations(), (home.lat, home.lon), mode, max_time, budget, limit)
+    if not ideas:
+        return (
+            f"🚫 Nothing I know of is within {format_duration(max_time)} by {mode} of {home.name}. "
+            f"Try a longer max travel time or another mode."
+        )
     
-    # Main trip event
-    main_event = create_event(
-        summary="Trip",
-        start_time=start_date,
-        is_all_day=True,
-        description=f"Travel Mode: {preferences.get('mode', 'flying')}\n" +
-                   f"Budget: ${preferences.get('accommodation_budget', 150)}/night"
+    response = f"🌍 Trip ideas from {home.name}\n"
+    response += f"Within {format_duration(max_time)} by {mode}{f', budget ${budget}/night' if budget else ''}:\n"
+    for idea in ideas:
+        response += (
+            f"\n• {idea['name']}: about {format_duration(idea['travel_minutes'])}, "
+            f"{idea['distance_km']} km, around ${idea['lodging']}/night"
+            f"{' (over budget)' if idea['over_budget'] else ''}"
+        )
+    return response
+
+def travel_preferences(session_id):
+    user_profile = get_user_profile(session_id)
+    return parse_preferences(user_profile.get('Preferences')).travel_preferences
+
+@app.route('/destinations')
+def destinations():
+    """Ranked destinations for the user's travel preferences; query parameters override them"""
+    preferences = (
+        travel_preferences(session['session_id']) if 'session_id' in session
+        else DEFAULT_PREFERENCES.travel_preferences
     )
-    events.append(main_event)
-    
-    # Add travel time buffers based on preferences
-    if preferences.get('mode') == 'flying':
-        # Add airport buffer times
-        buffer_before = create_event(
-            summary="Travel to Airport",
-            start_time=start_date - datetime.timedelta(hours=3),
-            is_all_day=False
+    home = resolve_destination(request.args.get('home') or preferences.home_location)
+    if not home:
+        return jsonify({'error': 'Unknown home location'}), 400
+    mode = request.args.get('mode', preferences.mode)
+    max_time = request.args.get('max_travel_time', preferences.max_travel_time, type=int)
+    budget = request.args.get('budget', preferences.accommodation_budget, type=int)
+    limit = max(1, min(request.args.get('limit', 10, type=int), 100))
+    if max_time <= 0:
+        return jsonify({'error': 'max_travel_time must be positive'}), 400
+    
+    return jsonify({
+        'home': home.name,
+        'mode': mode,
+        'destinations': rank_destinations(get_destinations(), (home.lat, home.lon), mode, max_time, budget, limit)
+    })
+
+# --- Calendar writes, run by the job queue -----------------------------------
+
+def enqueue_calendar_job(kind, payload):
+    """Queue a calendar write for the current user; a retried request with the same Idempotency-Key reuses the job"""
+    user_key = current_user_key()
+    client_key = request.headers.get('Idempotency-Key')
+    return jobs.enqueue(
+        kind, payload, user_key=user_key,
+        idempotency_key=f"{user_key}:{client_key}" if client_key else None
+    )
+
+def format_when(start_time):
+    return start_time.strftime('%A, %B %d at %I:%M %p')
+
+def schedule_event(event_data, session_id):
+    """Queue a single event; returns the interim reply and the job id"""
+    start_time = event_data["start_time"]
+    end_time = event_data.get("end_time")
+    job_id = enqueue_calendar_job('calendar.create_event', {
+        'session_id': session_id,
+        'summary': event_data["summary"],
+        'start_time': start_time.isoformat(),
+        'end_time': end_time.isoformat() if end_time else None,
+        'description': event_data.get("description", ""),
+        'location': event_data.get("location", ""),
+    })
+    return f"⏳ Scheduling \"{event_data['summary']}\" for {format_when(start_time)}…", job_id
+
+def post_assistant_message(session_id, text, kind=None):
+    """Store a reply produced outside a /chat request; returns its id"""
+    with session_scope() as db_session:
+        message = ChatMessage(
+            role='assistant', content=text, session_id=session_id,
+            rendered=render_message('assistant', text, kind)
         )
-        events.append(buffer_before)
+        db_session.add(message)
+        db_session.flush()
+        return message.id
+
+def run_create_event_job(job):
+    payload = job.payload
+    start_time = datetime.datetime.fromisoformat(payload['start_time'])
+    event = create_event(
+        summary=payload['summary'],
+        start_time=start_time,
+        end_time=datetime.datetime.fromisoformat(payload['end_time']) if payload['end_time'] else None,
+        description=payload['description'],
+        location=payload['location'],
+        event_id=event_id(job.key)
+    )
+    if event is None:
+        raise RuntimeError("Google Calendar did not accept the event")
+    text = f"✅ Added \"{payload['summary']}\" to your calendar for {format_when(start_time)}."
+    return {'message_id': post_assistant_message(payload['session_id'], text)}
+
+def run_recurring_job(job):
+    payload = job.payload
+    for i, (start, end) in enumerate(payload['occurrences']):
+        # Stable ids make a retry skip the occurrences an earlier attempt created
+        event = create_event(
+            summary=payload['summary'],
+            start_time=datetime.datetime.fromisoformat(start),
+            end_time=datetime.datetime.fromisoformat(end),
+            description=payload['description'],
+            location=payload['location'],
+            event_id=event_id(job.key, i)
+        )
+        if event is None:
+            raise RuntimeError(f"Google Calendar did not accept the event on {start[:10]}")
+    text = f"✅ Added {len(payload['occurrences'])} events for {payload['duration']}!"
+    return {'message_id': post_assistant_message(payload['session_id'], text)}
+
+def run_trip_job(job):
+    payload = job.payload
+    book_trip(
+        payload['destination'],
+        datetime.date.fromisoformat(payload['trip_start']),
+        datetime.date.fromisoformat(payload['trip_end']),
+        TravelPreferences.from_dict(payload['preferences']),
+        key=job.key
+    )
+    return {'message_id': post_assistant_message(payload['session_id'], "✅ Added trip to your calendar!")}
+
+def report_failed_job(job, error):
+    if isinstance(error, NotAuthenticated):
+        text = "⚠️ Couldn't add to calendar: please connect Google Calendar and try again."
+    else:
+        text = f"⚠️ Couldn't add to calendar: {str(error)}"
+    return {'message_id': post_assistant_message(job.payload['session_id'], text)}
+
+jobs.register('calendar.create_event', run_create_event_job, on_failure=report_failed_job)
+jobs.register('calendar.recurring', run_recurring_job, on_failure=report_failed_job)
+jobs.register('calendar.trip', run_trip_job, on_failure=report_failed_job)
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    status = jobs.status(job_id)
+    if status is None or status['user_key'] != current_user_key():
+        return jsonify({'error': 'Job not found'}), 404
     
-    return events
+    body = {'id': job_id, 'status': status['status']}
+    message_id = (status['result'] or {}).get('message_id')
+    if status['status'] in (DONE, FAILED) and message_id:
+        message = db.session.get(ChatMessage, message_id)
+        if message is not None:
+            body.update({'response': message.content, 'html': message_html(message), 'message_id': message.id})
+    return jsonify(body)
 
+@tracing.traced()
 def handle_chat_message(session_id, user_message):
-    """Enhanced chat handling with travel detection"""
+    """Enhanced chat handling with travel detection; returns the reply and any calendar job id"""
     # Check if it's a travel-related query
+    if SUGGEST_PATTERN.search(user_message.lower()):
+        return suggest_destinations(travel_preferences(session_id)), None
+    
     travel_keywords = ['trip to', 'travel to', 'visit', 'vacation in', 'planning to go to']
     is_travel_query = any(keyword in user_message.lower() for keyword in travel_keywords)
     
@@ -522,7 +933,7 @@ def handle_chat_message(session_id, user_message):
                 "type": "trip_planning",
                 "location": destination,
                 "start_date": datetime.datetime.now() + datetime.timedelta(days=1),
-                "end_date": datetime.datetime.now() + datetime.timedelta(days=30)
+                "duration_days": parse_trip_length(user_message)
             }
             return handle_trip_planning(event_data, session_id)
     
@@ -530,108 +941,102 @@ def handle_chat_message(session_id, user_message):
     history = ChatMessage.query.filter_by(session_id=session_id).all()
     messages = [{'role': msg.role, 'content': msg.content} for msg in history]
     
-    response = client.chat.completions.create(
-        model="gpt-3.5-turbo",  # Use OpenAI's model
-        messages=[
-            {
-                "role": "system",
-                "content": "You are Genie, a helpful AI assistant focused on travel planning and calendar management. Help users plan trips and manage their schedule effectively."
-            },
-            *[{'role': msg.role, 'content': msg.content} for msg in history],
-            {"role": "user", "content": user_message}
-        ],
-        stream=False
-    )
+    with timed('openai', 'chat.completions'):
+        response = client.chat.completions.create(
+            model=CHAT_MODEL,  # Full conversational model, only reached on the chat route
+            messages=[
+                {
+                    "role": "system",
+                    "content": "You are Genie, a helpful AI assistant focused on travel planning and calendar management. Help users plan trips and manage their schedule effectively."
+                },
+                *[{'role': msg.role, 'content': msg.content} for msg in history],
+                {"role": "user", "content": user_message}
+            ],
+            stream=False
+        )
     
-    return response.choices[0].message.content
+    return response.choices[0].message.content, None
 
 def extract_destination(message):
     """Extract destination from travel query"""
-    keywords = ['trip to', 'travel to', 'visit', 'vacation in', 'planning to go to']
-    for keyword in keywords:
-        if keyword in message.lower():
-            # Extract text after keyword
-            parts = message.lower().split(keyword)
-            if len(parts) > 1:
-                # Clean up the destination text
-                destination = parts[1].strip().split()[0].title()
-                return destination
-    return None
+    place = resolve_destination(message)
+    if place:
+        return place.name
+    # Not in the gazetteer: fall back to the words after the travel keyword
+    match = re.search(
+        r"(?:trip to|travel to|visit|vacation in|planning to go to) ([a-z][a-z .'-]*?)"
+        r"(?= (?:on|in|for|from|next|this|with|and|to|during|tomorrow)\b|[,.!?]|$)",
+        message.lower()
+    )
+    return match.group(1).strip().title() if match else None
 
 def format_calendar_view(events):
     """Format calendar events in a cleaner way"""
-    if not events:
-        return "🎉 Your calendar is clear!"
-    
-    response = "📅 Your Calendar\n\n"
-    grouped = group_events_by_date(events)
-    
-    for date_str, daily_events in sorted(grouped.items()):
-        date_obj = datetime.datetime.strptime(date_str, "%Y-%m-%d")
-        if not daily_events:
-            continue
-            
-        response += f"<div class='calendar-date'>\n"
-        response += f"<h3>{date_obj.strftime('%A, %B %d, %Y')}</h3>\n"
-        
-        for event in daily_events:
-            if is_valid_event(event):
-                if 'date' in event['start']:  # All-day event
-                    response += (
-                        "<div class='calendar-event all-day'>\n"
-                        "<span class='calendar-icon'>📅</span>\n"
-                        "<span class='event-title'>"
-                        f"<strong>{event['summary']}</strong> (All day)"
-                        "</span>\n"
-                        "</div>\n"
-                    )
-                else:  # Timed event
-                    start = parse_iso_time(event['start']['dateTime'])
-                    end = parse_iso_time(event['end']['dateTime'])
-                    response += (
-                        "<div class='calendar-event'>\n"
-                        "<span class='calendar-icon'>🕒</span>\n"
-                        "<span class='event-time'>"
-                        f"{start.strftime('%I:%M %p')} - {end.strftime('%I:%M %p')}"
-                        "</span>\n"
-                        f"<span class='event-title'><strong>{event['summary']}</strong></span>\n"
-                        "</div>\n"
-                    )
-        response += "</div>\n"
-    
-    return response
+    return render_events(events)
 
-@app.route('/authorize')
-def authorize():
-    flow = InstalledAppFlow.from_client_secrets_file(
-        'credentials.json',
+@lru_cache(maxsize=1)
+def google_client_config():
+    """OAuth client config from GOOGLE_CLIENT_CONFIG (JSON) or the GOOGLE_CLIENT_SECRETS_FILE download"""
+    if GOOGLE_CLIENT_CONFIG:
+        return json.loads(GOOGLE_CLIENT_CONFIG)
+    with open(GOOGLE_CLIENT_SECRETS_FILE, encoding='utf-8') as f:
+        return json.load(f)
+
+def oauth_flow(state=None):
+    return Flow.from_client_config(
+        google_client_config(),
         scopes=SCOPES,
+        state=state,
         redirect_uri=url_for('oauth_callback', _external=True)
     )
-    authorization_url, _ = flow.authorization_url(
+
+@app.route('/authorize')
+def authorize():
+    authorization_url, state = oauth_flow().authorization_url(
         prompt='consent',
-        login_hint='avushetti@gmail.com'
+        access_type='offline'
     )
+    session['oauth_state'] = state
     return redirect(authorization_url)
 
 @app.route('/oauth2callback')
 def oauth_callback():
     try:
-        flow = InstalledAppFlow.from_client_secrets_file(
-            'credentials.json',
-            scopes=SCOPES,
-            redirect_uri=url_for('oauth_callback', _external=True)
-        )
+        flow = oauth_flow(state=session.pop('oauth_state', None))
         flow.fetch_token(authorization_response=request.url)
         credentials = flow.credentials
         
-        with open('token.json', 'w') as token:
-            token.write(credentials.to_json())
+        credential_store.put(current_user_key(), credentials)
         
         return redirect(url_for('home'))
     except Exception as e:
         return f"Authentication failed: {str(e)}", 400
 
+@app.route('/history/export')
+def export_history():
+    """This session's messages as NDJSON, streamed as they are read"""
+    session_id = session.get('session_id')
+    if not session_id:
+        return jsonify({'error': 'No session'}), 400
+    lines = chat_export.export_lines(db.session, ChatMessage, session_id)
+    return Response(
+        stream_with_context(lines), mimetype='application/x-ndjson',
+        headers={'Content-Disposition': 'attachment; filename="chat-history.ndjson"'}
+    )
+
+@app.route('/history/import', methods=['POST'])
+def import_history():
+    """Append messages from an NDJSON body (as produced by /history/export) to this session"""
+    session_id = session.get('session_id')
+    if not session_id:
+        return jsonify({'error': 'No session'}), 400
+    try:
+        # request.stream yields the body line by line without buffering it
+        count = chat_export.import_lines(db.session, ChatMessage, request.stream, session_id=session_id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'imported': count})
+
 @app.route('/clear', methods=['POST'])
 def clear_history():
     session_id = session.get('session_id')
@@ -646,7 +1051,7 @@ def clear_history():
                 return '', 204
             except Exception as e:
                 if attempt == max_retries - 1:  # Last attempt
-                    print(f"Failed to clear history after {max_retries} attempts: {str(e)}")
+                    logger.error("Failed to clear history after %d attempts: %s", max_retries, e)
                     return 'Database error', 500
                 time.sleep(retry_delay)
                 retry_delay *= 2  # Exponential backoff
@@ -665,18 +1070,18 @@ def update_profile():
     
     try:
         # Validate and structure the preferences
-        validated_prefs = validate_preferences(preferences_str)
+        preferences = parse_preferences(preferences_str)
         
         # Update user profile in Airtable
         profile_data = {
-            'Preferences': json.dumps(validated_prefs)
+            'Preferences': preferences.to_json()
         }
         
         if create_or_update_user_profile(session_id, profile_data):
             return jsonify({
                 'success': True,
                 'message': 'Preferences updated successfully',
-                'preferences': validated_prefs
+                'preferences': preferences.to_dict()
             })
         else:
             return jsonify({
@@ -684,7 +1089,7 @@ def update_profile():
                 'error': 'Failed to update preferences'
             }), 500
     except Exception as e:
-        print(f"Error in update_profile: {str(e)}")
+        logger.exception("Error in update_profile")
         return jsonify({
             'success': False,
             'error': str(e)
@@ -708,11 +1113,13 @@ def logout():
                 os.getenv('AIRTABLE_API_KEY')
             )
             formula = f"{{Email}} = '{session['user_email']}'"
-            users = signin_table.get_all(formula=formula)
+            with timed('airtable', 'get_all'):
+                users = signin_table.get_all(formula=formula)
             if users:
-                signin_table.update(users[0]['id'], {'Session': ''})
+                with timed('airtable', 'update'):
+                    signin_table.update(users[0]['id'], {'Session': ''})
     except Exception as e:
-        print(f"Error updating Airtable session on logout: {str(e)}")
+        logger.warning("Error updating Airtable session on logout: %s", e)
     finally:
         # Always clear session data, even if Airtable update fails
         session.clear()
@@ -733,7 +1140,8 @@ def auth():
         if data['type'] == 'signup':
             # Check if email already exists
             formula = f"{{Email}} = '{data['email']}'"
-            existing_user = signin_table.get_all(formula=formula)
+            with timed('airtable', 'get_all'):
+                existing_user = signin_table.get_all(formula=formula)
             
             if existing_user:
                 return jsonify({
@@ -745,21 +1153,20 @@ def auth():
             session_id = secrets.token_hex(16)
             hashed_password = generate_password_hash(data['password'], method='pbkdf2:sha256')
             
-            signin_table.insert({
-                'Name': data['name'],
-                'Email': data['email'],
-                'Password': hashed_password,
-                'Session': session_id
-            })
+            with timed('airtable', 'insert'):
+                signin_table.insert({
+                    'Name': data['name'],
+                    'Email': data['email'],
+                    'Password': hashed_password,
+                    'Session': session_id
+                })
             
-            # Set session data for new user
-            session['user_email'] = data['email']
-            session['user_name'] = data['name']
-            session['session_id'] = session_id
+            sign_in(data['email'], data['name'], session_id)
             
         else:  # signin
             formula = f"{{Email}} = '{data['email']}'"
-            users = signin_table.get_all(formula=formula)
+            with timed('airtable', 'get_all'):
+                users = signin_table.get_all(formula=formula)
             
             if not users:
                 return jsonify({
@@ -776,38 +1183,120 @@ def auth():
             
             # Update session
             session_id = secrets.token_hex(16)
-            signin_table.update(user['id'], {'Session': session_id})
+            with timed('airtable', 'update'):
+                signin_table.update(user['id'], {'Session': session_id})
             
-            # Set session data
-            session['user_email'] = data['email']
-            session['user_name'] = user['fields'].get('Name')
-            session['session_id'] = session_id
+            sign_in(data['email'], user['fields'].get('Name'), session_id)
         
         return jsonify({'success': True})
         
     except Exception as e:
-        print(f"Auth error: {str(e)}")
+        logger.exception("Auth error")
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
-def group_events_by_date(events):
-    grouped = defaultdict(list)
-    for event in events:
-        if not is_valid_event(event):
-            continue
-        start = event['start'].get('dateTime', event['start'].get('date'))
-        date_str = parse_iso_time(start).strftime("%Y-%m-%d")
-        grouped[date_str].append(event)
-    
-    # Sort dates and filter empty days
-    return {
-        k: v for k, v in sorted(
-            grouped.items(),
-            key=lambda x: x[0]
-        ) if v
-    }
+@app.cli.command('audit-conflicts')
+@click.option('--days', default=365, help='How far ahead to audit.')
+@click.option('--user', 'user_key', required=True, help='Email (or session id) whose stored credentials to use.')
+def audit_conflicts(days, user_key):
+    """Report every group of clashing events in the calendar"""
+    now = datetime.datetime.now(pytz.UTC)
+    with acting_as(user_key):
+        events = [e for e in iter_events(now, now + datetime.timedelta(days=days)) if is_valid_event(e)]
+    bounds = [event_bounds(event) for event in events]
+    clusters = overlap_clusters([start for start, _ in bounds], [end for _, end in bounds])
+    
+    for cluster in clusters:
+        click.echo(f"⏳ {len(cluster)} overlapping events:")
+        for i in cluster:
+            start = events[i]['start'].get('dateTime', events[i]['start'].get('date'))
+            click.echo(f"  - {start}: {events[i]['summary']}")
+    click.echo(f"Checked {len(events)} events, found {len(clusters)} conflict groups.")
+
+@app.cli.command('backfill-rendered')
+@click.option('--batch-size', default=1000, help='Rows rendered per transaction.')
+def backfill_rendered(batch_size):
+    """Render and store HTML for messages saved before it was stored"""
+    total = 0
+    while True:
+        with session_scope() as db_session:
+            rows = db_session.query(ChatMessage).filter(ChatMessage.rendered.is_(None)).limit(batch_size).all()
+            for message in rows:
+                message.rendered = str(render_message(message.role, message.content))
+            total += len(rows)
+        if len(rows) < batch_size:
+            break
+    click.echo(f"Rendered {total} messages.")
+
+@app.cli.command('export-history')
+@click.option('--output', '-o', default='-', help='NDJSON file to write (.gz to compress); - for stdout.')
+@click.option('--session', 'session_id', default=None, help='Only this session id; default is every message.')
+@click.option('--batch-size', default=chat_export.EXPORT_BATCH_SIZE, help='Rows fetched per round trip.')
+def export_history_command(output, session_id, batch_size):
+    """Stream chat messages to NDJSON with constant memory"""
+    lines = chat_export.export_lines(db.session, ChatMessage, session_id, batch_size)
+    if output == '-':
+        count = write_lines(click.get_text_stream('stdout'), lines)
+    else:
+        with chat_export.open_ndjson(output, 'w') as f:
+            count = write_lines(f, lines)
+    click.echo(f"Exported {count} messages.", err=True)
+
+def write_lines(f, lines):
+    count = 0
+    for line in lines:
+        f.write(line)
+        count += 1
+    return count
+
+@app.cli.command('import-history')
+@click.argument('path')
+@click.option('--session', 'session_id', default=None, help='Assign every message to this session id.')
+@click.option('--keep-ids', is_flag=True, help='Keep exported ids and stored HTML (restoring a trusted export into an empty database).')
+@click.option('--chunk-size', default=chat_export.IMPORT_CHUNK_SIZE, help='Rows inserted per transaction.')
+def import_history_command(path, session_id, keep_ids, chunk_size):
+    """Bulk-load chat messages from an NDJSON export (.gz or plain; - for stdin)"""
+    ensure_schema()
+    f = click.get_text_stream('stdin') if path == '-' else chat_export.open_ndjson(path)
+    with f:
+        try:
+            # A --keep-ids restore is a trusted copy of this app's own export; keep its stored HTML
+            count = chat_export.import_lines(
+                db.session, ChatMessage, f, session_id, keep_ids, chunk_size, trust_rendered=keep_ids
+            )
+        except ValueError as e:
+            raise click.ClickException(str(e))
+    click.echo(f"Imported {count} messages.")
+
+@app.cli.command('build-assets')
+def build_assets():
+    """Fingerprint and precompress static assets (wsgi.py also does this at startup); restart to serve them"""
+    for name, target in assets.build(app.static_folder).items():
+        click.echo(f"{name} -> {target}")
+
+@app.cli.command('show-trace')
+@click.argument('trace_id')
+@click.option('--file', 'path', default=tracing.TRACE_FILE, help='Exported span file.')
+def show_trace(trace_id, path):
+    """Print the span waterfall for one request (trace id from its traceparent header)"""
+    spans = tracing.load_trace(trace_id, path)
+    if not spans:
+        click.echo(f"No spans for trace {trace_id} in {path}.")
+        return
+    click.echo(tracing.format_waterfall(spans))
+
+def ensure_schema():
+    """Create tables, plus columns and indexes added since the database was created"""
+    db.create_all()
+    columns = {column['name'] for column in db.inspect(db.engine).get_columns('chat_message')}
+    if 'rendered' not in columns:
+        with db.engine.begin() as connection:
+            connection.execute(db.text('ALTER TABLE chat_message ADD COLUMN rendered TEXT'))
+    # create_all skips indexes added to an existing table
+    for index in ChatMessage.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
 
 @app.template_filter('process_calendar')
 def process_calendar(text):
@@ -816,5 +1305,5 @@ def process_calendar(text):
 
 if __name__ == '__main__':
     with app.app_context():
-        db.create_all()
+        ensure_schema()
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,142 @@
+"""Fingerprinted, precompressed static assets.
+
+The build (run by wsgi.py at startup, or `flask build-assets`) copies each
+file in ASSETS into static/dist under a name carrying a hash of its content
+(css/style.3fa1c2d40b.css), writes a gzip (and, when the brotli package is
+installed, a brotli) copy next to it, and records the names in a manifest.
+With a manifest present,
+url_for('static', ...) points at the fingerprinted names and the /static
+route serves them with a one-year immutable Cache-Control in the smallest
+encoding the browser accepts, so a repeat page load fetches only the HTML.
+Without a build, ASSETS are served uncached from their source files.
+"""
+import os
+import gzip
+import json
+import hashlib
+import logging
+import mimetypes
+from importlib.util import find_spec
+from flask import request, send_from_directory
+from lazy import lazy_import
+
+logger = logging.getLogger(__name__)
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+# Logical names, as templates pass them to url_for('static', filename=...)
+ASSETS = ('css/style.css', 'css/signin.css', 'js/chat.js')
+BUILD_DIR = 'dist'
+MANIFEST_FILE = 'manifest.json'
+HASH_LENGTH = 10
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Precompressed variants, best first; the uncompressed file is always there too
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+brotli = lazy_import('brotli')
+
+def find_source(static_folder, name):
+    """An asset's source: under the static folder, or by file name at the repository root"""
+    for path in (os.path.join(static_folder, name), os.path.join(ROOT, os.path.basename(name))):
+        if os.path.isfile(path):
+            return path
+    raise FileNotFoundError(f"No source file for asset {name}")
+
+def fingerprint(name, content):
+    """`name` with a hash of `content` before the extension"""
+    base, ext = os.path.splitext(name)
+    return f"{base}.{hashlib.sha256(content).hexdigest()[:HASH_LENGTH]}{ext}"
+
+def _write(path, content):
+    # Replace atomically; running workers may be serving the previous copy
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+def build(static_folder, names=ASSETS):
+    """Write fingerprinted, precompressed copies of `names` and the manifest; returns the manifest.
+
+    Earlier builds are left in place so pages rendered before a deploy can
+    still load the assets they reference.
+    """
+    with_brotli = find_spec('brotli') is not None
+    if not with_brotli:
+        logger.warning("brotli is not installed; building gzip variants only")
+    manifest = {}
+    for name in names:
+        with open(find_source(static_folder, name), 'rb') as f:
+            content = f.read()
+        target = f"{BUILD_DIR}/{fingerprint(name, content)}"
+        path = os.path.join(static_folder, target)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _write(path, content)
+        _write(path + '.gz', gzip.compress(content, compresslevel=9, mtime=0))
+        if with_brotli:
+            _write(path + '.br', brotli.compress(content, quality=11))
+        manifest[name] = target
+    _write(os.path.join(static_folder, BUILD_DIR, MANIFEST_FILE), json.dumps(manifest, indent=2, sort_keys=True).encode())
+    return manifest
+
+def load_manifest(static_folder):
+    """Logical name -> fingerprinted path from the last build, or {} if there hasn't been one"""
+    try:
+        with open(os.path.join(static_folder, BUILD_DIR, MANIFEST_FILE), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        logger.info("No asset manifest; serving static files unfingerprinted (run `flask build-assets`)")
+        return {}
+
+def load(app):
+    """(Re)read the manifest and note which precompressed variants exist on disk"""
+    manifest = load_manifest(app.static_folder)
+    # Fingerprinted path -> encodings with a precompressed file on disk
+    built = {
+        target: [
+            (encoding, suffix) for encoding, suffix in ENCODINGS
+            if os.path.isfile(os.path.join(app.static_folder, target + suffix))
+        ]
+        for target in manifest.values()
+    }
+    app.extensions['assets'] = {'manifest': manifest, 'built': built}
+
+def build_on_start(app):
+    """Build into the app's static folder and serve the result; unbuilt files are served if that fails"""
+    try:
+        build(app.static_folder)
+    except OSError as e:
+        logger.warning("Asset build failed; serving static files unfingerprinted: %s", e)
+        return
+    load(app)
+
+def init_app(app):
+    """Route url_for('static') to built assets and serve them cached and compressed"""
+    load(app)
+    serve_unbuilt = app.view_functions['static']
+
+    @app.url_defaults
+    def fingerprinted_url(endpoint, values):
+        manifest = app.extensions['assets']['manifest']
+        if endpoint == 'static' and values.get('filename') in manifest:
+            values['filename'] = manifest[values['filename']]
+
+    def send_asset(filename):
+        variants = app.extensions['assets']['built'].get(filename)
+        if variants is None:
+            if filename in ASSETS:
+                # Not built yet: serve the source, which may live at the repository root
+                path = find_source(app.static_folder, filename)
+                return send_from_directory(os.path.dirname(path), os.path.basename(path))
+            return serve_unbuilt(filename=filename)
+        encoding = request.accept_encodings.best_match([e for e, _ in variants])
+        suffix = dict(variants).get(encoding, '')
+        response = send_from_directory(
+            app.static_folder, filename + suffix,
+            mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        )
+        if suffix:
+            response.headers['Content-Encoding'] = encoding
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        response.vary.add('Accept-Encoding')
+        return response
+
+    app.view_functions['static'] = send_asset
@@ -0,0 +1,134 @@
+import heapq
+from functools import lru_cache
+from datetime import datetime, time, timedelta
+import os
+import pytz
+from event_cache import get_event_cache
+from google_calendar import get_busy_intervals
+
+DEFAULT_WORKING_HOURS = (9, 17)
+DEFAULT_SLOT_LIMIT = 5
+# Calendars considered for availability, e.g. "primary,family@group.calendar.google.com"
+CALENDAR_IDS = [c.strip() for c in os.getenv('CALENDAR_IDS', 'primary').split(',') if c.strip()]
+
+def merge_intervals(intervals, buffer_seconds=0.0):
+    """Merge (start, end) pairs sorted by start, padding each by the buffer"""
+    merged = []
+    for start, end in intervals:
+        start -= buffer_seconds
+        end += buffer_seconds
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return merged
+
+@lru_cache(maxsize=64)
+def day_windows(first_day, last_day, working_hours, timezone, preferred_hour=None):
+    """Working-hour (start_ts, end_ts, preferred_ts) per local day.
+
+    Localizing every day is the slow part of a long search and does not
+    depend on the events, so the windows are computed once per range.
+    """
+    tz = pytz.timezone(timezone)
+    start_hour, end_hour = working_hours
+    windows = []
+    day = first_day
+    while day <= last_day:
+        window_start = tz.localize(datetime.combine(day, time(start_hour))).timestamp()
+        if end_hour >= 24:
+            window_end = tz.localize(datetime.combine(day + timedelta(days=1), time(0))).timestamp()
+        else:
+            window_end = tz.localize(datetime.combine(day, time(end_hour))).timestamp()
+        preferred = None
+        if preferred_hour is not None:
+            preferred = tz.localize(datetime.combine(day, time(preferred_hour))).timestamp()
+        windows.append((window_start, window_end, preferred))
+        day += timedelta(days=1)
+    return tuple(windows)
+
+def working_windows(range_start, range_end, working_hours, timezone, preferred_hour=None):
+    """Yield per-day working windows clipped to the range"""
+    tz = pytz.timezone(timezone)
+    range_start_ts, range_end_ts = range_start.timestamp(), range_end.timestamp()
+    windows = day_windows(
+        range_start.astimezone(tz).date(), range_end.astimezone(tz).date(),
+        tuple(working_hours), timezone, preferred_hour
+    )
+    for window_start, window_end, preferred in windows:
+        window_start = max(window_start, range_start_ts)
+        window_end = min(window_end, range_end_ts)
+        if window_start < window_end:
+            yield window_start, window_end, preferred
+
+def free_intervals(busy, windows):
+    """Sweep merged busy intervals against working windows in a single pass"""
+    i = 0
+    for window_start, window_end, preferred in windows:
+        while i < len(busy) and busy[i][1] <= window_start:
+            i += 1
+        cursor = window_start
+        j = i
+        while j < len(busy) and busy[j][0] < window_end:
+            if busy[j][0] > cursor:
+                yield cursor, busy[j][0], preferred
+            cursor = max(cursor, busy[j][1])
+            j += 1
+        if cursor < window_end:
+            yield cursor, window_end, preferred
+
+def calendar_busy_intervals(calendar_ids, range_start, range_end):
+    """Busy intervals across calendars as sorted timestamps.
+
+    A lone primary calendar is served from the event cache; any other
+    selection is answered by a single batched freebusy query.
+    """
+    if list(calendar_ids) == ['primary']:
+        return get_event_cache().busy_intervals(range_start, range_end)
+    busy = get_busy_intervals(list(calendar_ids), range_start, range_end)
+    return sorted(
+        (start.timestamp(), end.timestamp())
+        for periods in busy.values()
+        for start, end in periods
+    )
+
+def find_free_slots(time_range, duration, working_hours=DEFAULT_WORKING_HOURS,
+                    buffer=timedelta(0), timezone='America/Denver',
+                    limit=DEFAULT_SLOT_LIMIT, preferred_hour=None, busy=None,
+                    calendar_ids=None):
+    """Top free slots of `duration` inside `time_range`, within working hours.
+
+    Busy intervals are merged across `calendar_ids` (default CALENDAR_IDS)
+    unless given. Slots are ranked earliest-first, or by distance from
+    `preferred_hour` when it is set.
+    """
+    tz = pytz.timezone(timezone)
+    range_start, range_end = time_range
+    if busy is None:
+        busy = calendar_busy_intervals(calendar_ids or CALENDAR_IDS, range_start, range_end)
+    merged = merge_intervals(busy, buffer.total_seconds())
+    needed = duration.total_seconds()
+
+    windows = working_windows(range_start, range_end, working_hours, timezone, preferred_hour)
+    ranked = []
+    for free_start, free_end, preferred in free_intervals(merged, windows):
+        if free_end - free_start < needed:
+            continue
+        if preferred is None:
+            # Back-to-back slots through the gap until enough are found
+            slot_start = free_start
+            while slot_start + needed <= free_end and len(ranked) < limit:
+                ranked.append((slot_start, slot_start))
+                slot_start += needed
+            if len(ranked) >= limit:
+                break
+        else:
+            # Slide the slot as close to the preferred hour as the gap allows
+            slot_start = min(max(preferred, free_start), free_end - needed)
+            ranked.append((abs(slot_start - preferred), slot_start))
+
+    return [
+        (datetime.fromtimestamp(ts, tz), datetime.fromtimestamp(ts + needed, tz))
+        for _, ts in heapq.nsmallest(limit, ranked)
+    ]
@@ -0,0 +1,60 @@
+"""Time free-slot search against synthetic calendars.
+
+    python benchmarks/bench_availability.py [events] [repeats]
+
+Busy intervals are passed in directly, so this measures the search itself
+(merge, working-hour windows, slot ranking) with no Calendar round trip.
+"""
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pytz
+from availability import find_free_slots, day_windows
+from bench_overlaps import synthetic_events, timed
+
+TARGET_MS = 10
+TIMEZONE = 'America/Denver'
+
+# name -> (days searched, slot minutes, buffer minutes, preferred hour)
+SCENARIOS = (
+    ('next week, 1h', 7, 60, 0, None),
+    ('next month, 30m near 2pm', 30, 30, 0, 14),
+    ('next quarter, 3h with 15m buffer', 90, 180, 15, None),
+    ('whole year, 4h near 10am', 365, 240, 15, 10),
+)
+
+def busy_intervals(events):
+    """Sorted (start_ts, end_ts) pairs, as the event cache hands them over"""
+    return sorted(
+        (datetime.fromisoformat(e['start']['dateTime']).timestamp(),
+         datetime.fromisoformat(e['end']['dateTime']).timestamp())
+        for e in events
+    )
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    busy = busy_intervals(synthetic_events(count))
+    range_start = pytz.timezone(TIMEZONE).localize(datetime(2026, 1, 1))
+
+    print(f"busy intervals: {count}")
+    over = 0
+    for name, days, minutes, buffer, preferred in SCENARIOS:
+        def search():
+            return find_free_slots(
+                (range_start, range_start + timedelta(days=days)),
+                timedelta(minutes=minutes), buffer=timedelta(minutes=buffer),
+                timezone=TIMEZONE, preferred_hour=preferred, busy=busy
+            )
+        day_windows.cache_clear()
+        cold_ms, slots = timed(search, 1)
+        warm_ms, _ = timed(search, repeats)
+        over += warm_ms > TARGET_MS
+        print(f"{name:36} cold {cold_ms:6.2f} ms  warm {warm_ms:6.2f} ms  ({len(slots)} slots)")
+    print(f"target: {TARGET_MS} ms warm; {len(SCENARIOS) - over}/{len(SCENARIOS)} scenarios within it")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+"""Per-endpoint latency against local fakes.
+
+    pip install -r benchmarks/requirements.txt
+    python -m pytest benchmarks/bench_endpoints.py
+
+BENCH_ROUNDS sets samples per scenario (default 30) and
+FAKE_<SERVICE>_LATENCY_MS the simulated upstream delays; p50/p95/p99 per
+scenario are printed at the end and saved in each benchmark's extra_info
+(see --benchmark-json).
+"""
+import os
+
+import pytest
+
+import harness
+
+ROUNDS = int(os.getenv('BENCH_ROUNDS', '30'))
+
+RESULTS = {}
+
+@pytest.fixture(scope='module')
+def client():
+    return harness.signed_in_client(harness.load_app())
+
+@pytest.mark.parametrize('scenario', harness.SCENARIOS, ids=[s[0] for s in harness.SCENARIOS])
+def test_endpoint(benchmark, client, scenario):
+    statuses = []
+    benchmark.pedantic(
+        lambda: statuses.append(harness.send(client, scenario)),
+        rounds=ROUNDS, iterations=1, warmup_rounds=2
+    )
+    samples = list(benchmark.stats.stats.data)
+    errors = sum(1 for status in statuses[-ROUNDS:] if status >= 500)
+    RESULTS[scenario[0]] = (samples, errors)
+    benchmark.extra_info.update({f'p{p}_ms': value * 1000 for p, value in harness.percentiles(samples).items()})
+    benchmark.extra_info['server_errors'] = errors
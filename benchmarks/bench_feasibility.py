@@ -0,0 +1,60 @@
+"""Time destination ranking and check default preferences get suggestions.
+
+    python benchmarks/bench_feasibility.py [repeats]
+
+Exits non-zero if the default travel preferences rank no destinations, or
+if an over-budget place outranks a comparable one within budget.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from feasibility import get_destinations, rank_destinations
+from gazetteer import resolve_destination
+from preferences import DEFAULT_PREFERENCES
+
+def rank_defaults(destinations):
+    preferences = DEFAULT_PREFERENCES.travel_preferences
+    home = resolve_destination(preferences.home_location)
+    return rank_destinations(
+        destinations, (home.lat, home.lon), preferences.mode,
+        preferences.max_travel_time, preferences.accommodation_budget
+    )
+
+def check(destinations):
+    failures = []
+    ideas = rank_defaults(destinations)
+    if not ideas:
+        failures.append(f"default preferences ({DEFAULT_PREFERENCES.travel_preferences}) produced no suggestions")
+    # Within the same travel time, a place within budget must come first
+    for earlier, later in zip(ideas, ideas[1:]):
+        if earlier['over_budget'] and not later['over_budget'] and later['travel_minutes'] <= earlier['travel_minutes']:
+            failures.append(f"{earlier['name']} is over budget but ranked above {later['name']}")
+    return failures
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    start = time.perf_counter()
+    destinations = get_destinations()
+    load_ms = (time.perf_counter() - start) * 1000
+
+    rank_defaults(destinations)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        rank_defaults(destinations)
+    per_call_us = (time.perf_counter() - start) / repeats * 1e6
+
+    ideas = rank_defaults(destinations)
+    failures = check(destinations)
+    print(f"places:      {len(destinations.names)}")
+    print(f"load:        {load_ms:.1f} ms")
+    print(f"rank:        {per_call_us:.1f} us per call")
+    print(f"defaults:    {len(ideas)} suggestions ({sum(i['over_budget'] for i in ideas)} over budget)")
+    for failure in failures:
+        print(f"  FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
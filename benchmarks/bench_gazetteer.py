@@ -0,0 +1,69 @@
+"""Time destination lookup and check it on known messages.
+
+    python benchmarks/bench_gazetteer.py [repeats]
+
+Exits non-zero if any message in CASES resolves to the wrong place.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from gazetteer import get_gazetteer
+from google_calendar import parse_event_details
+
+# Message -> expected destination (None: no place should be found)
+CASES = (
+    ("plan a trip to denver from jan 2 to jan 5", 'Denver'),
+    ("I want to visit denvr next week", 'Denver'),
+    ("weekend in new york", 'New York'),
+    ("trip to salt lake city", 'Salt Lake City'),
+    ("show my calendar for tomorrow", None),
+    ("add a walk in the parks at 5pm", None),
+    # A later cued place is a stopover or side trip, not the destination
+    ("trip to Paris with a layover in London", 'Paris'),
+    ("plan a trip to Boise from jan 2 to jan 5 to visit denver", 'Boise'),
+)
+# Trip messages whose parsed dates must survive a trailing clause
+TRIP_CASES = (
+    ("plan a trip to Boise from jan 2 to jan 5 to visit denver", 'Boise'),
+)
+
+def check():
+    gazetteer = get_gazetteer()
+    failures = []
+    for message, expected in CASES:
+        place = gazetteer.resolve(message)
+        if (place.name if place else None) != expected:
+            failures.append(f"{message!r}: expected {expected}, got {place}")
+    for message, expected in TRIP_CASES:
+        details = parse_event_details(message) or {}
+        if details.get('location') != expected or not details.get('end_date'):
+            failures.append(f"{message!r}: expected a trip to {expected} with an end date, got {details}")
+    return failures
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    start = time.perf_counter()
+    gazetteer = get_gazetteer()
+    load_ms = (time.perf_counter() - start) * 1000
+
+    messages = [message for message, _ in CASES]
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for message in messages:
+            gazetteer.resolve(message)
+    per_call_us = (time.perf_counter() - start) / (repeats * len(messages)) * 1e6
+
+    failures = check()
+    print(f"places:      {len(gazetteer.places)}")
+    print(f"load:        {load_ms:.1f} ms")
+    print(f"resolve:     {per_call_us:.1f} us per message")
+    print(f"cases:       {len(CASES) + len(TRIP_CASES) - len(failures)}/{len(CASES) + len(TRIP_CASES)} ok")
+    for failure in failures:
+        print(f"  FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
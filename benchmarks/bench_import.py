@@ -0,0 +1,60 @@
+"""Measure how long a fresh interpreter takes to import the app.
+
+    python benchmarks/bench_import.py [runs] [top]
+
+Each run is a new `python -X importtime -c "import app"` process. Prints the
+median wall time, the slowest imports by cumulative time from the last run,
+and whether any of the SDKs that should load lazily were imported.
+"""
+import os
+import sys
+import time
+import statistics
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Should only be imported on first use, never by `import app`
+LAZY_MODULES = ('openai', 'dateparser', 'googleapiclient.discovery', 'google_auth_oauthlib', 'airtable', 'numpy')
+
+SCRIPT = (
+    "import sys; import app; "
+    f"print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+)
+
+def run_once():
+    env = dict(os.environ, LOG_LEVEL='WARNING')
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', SCRIPT],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return time.perf_counter() - start, result.stdout.strip(), result.stderr
+
+def parse_importtime(stderr):
+    """(cumulative microseconds, module) for each line of -X importtime output"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        rows.append((int(cumulative), name.rstrip()))
+    return rows
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    top = int(sys.argv[2]) if len(sys.argv) > 2 else 15
+    durations = []
+    for _ in range(runs):
+        elapsed, loaded, stderr = run_once()
+        durations.append(elapsed)
+
+    print(f"import app: median {statistics.median(durations) * 1000:.0f}ms over {runs} runs "
+          f"(min {min(durations) * 1000:.0f}ms, max {max(durations) * 1000:.0f}ms)")
+    print(f"\nSlowest imports in the last run (cumulative ms):")
+    for cumulative, name in sorted(parse_importtime(stderr), reverse=True)[:top]:
+        print(f"{cumulative / 1000:>9.1f}  {name}")
+    print(f"\nLazy SDKs imported eagerly: {loaded or 'none'}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Time the overlap engine against synthetic calendars.
+
+    python benchmarks/bench_overlaps.py [events] [repeats]
+"""
+import os
+import sys
+import random
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pytz
+from overlaps import find_overlaps, overlap_clusters
+from google_calendar import check_overlapping_events
+
+def synthetic_events(count, days=365, seed=42):
+    """Timed events spread over a year, with enough density to clash"""
+    rng = random.Random(seed)
+    tz = pytz.timezone('America/Denver')
+    base = tz.localize(datetime(2026, 1, 1, 8))
+    events = []
+    for i in range(count):
+        start = base + timedelta(days=rng.randrange(days), minutes=rng.randrange(0, 12 * 60, 15))
+        end = start + timedelta(minutes=rng.choice([15, 30, 45, 60, 90, 120, 240]))
+        events.append({
+            'id': str(i),
+            'summary': f"Synthetic meeting {i}",
+            'start': {'dateTime': start.isoformat()},
+            'end': {'dateTime': end.isoformat()}
+        })
+    return events
+
+def adjacent_pairs(starts, ends):
+    """The old check: only neighbours in start order are compared"""
+    order = sorted(range(len(starts)), key=starts.__getitem__)
+    return sum(1 for a, b in zip(order, order[1:]) if ends[a] > starts[b])
+
+def timed(fn, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    events = synthetic_events(count)
+    starts = [datetime.fromisoformat(e['start']['dateTime']).timestamp() for e in events]
+    ends = [datetime.fromisoformat(e['end']['dateTime']).timestamp() for e in events]
+
+    pairs_ms, pairs = timed(lambda: find_overlaps(starts, ends), repeats)
+    clusters_ms, clusters = timed(lambda: overlap_clusters(starts, ends), repeats)
+    full_ms, messages = timed(lambda: check_overlapping_events(events), repeats)
+
+    print(f"events:                   {count}")
+    print(f"overlapping pairs:        {len(pairs)} (adjacent-only check finds {adjacent_pairs(starts, ends)})")
+    print(f"conflict clusters:        {len(clusters)}")
+    print(f"find_overlaps:            {pairs_ms:.2f} ms")
+    print(f"overlap_clusters:         {clusters_ms:.2f} ms")
+    print(f"check_overlapping_events: {full_ms:.2f} ms (parse + sweep + format, {len(messages)} messages)")
+
+if __name__ == '__main__':
+    main()
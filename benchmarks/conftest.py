@@ -0,0 +1,11 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+def pytest_terminal_summary(terminalreporter):
+    from bench_endpoints import RESULTS
+    import harness
+    if RESULTS:
+        terminalreporter.section('endpoint latency percentiles')
+        terminalreporter.write_line(harness.format_report(RESULTS))
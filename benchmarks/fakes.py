@@ -0,0 +1,312 @@
+"""Local stand-ins for OpenAI, Google Calendar, Airtable and Voiceflow.
+
+Each fake answers the calls the app makes with plausible data after a
+configurable delay, so the app's own overhead can be measured without
+network access. Delays (milliseconds) come from FAKE_<SERVICE>_LATENCY_MS,
+e.g. FAKE_OPENAI_LATENCY_MS=0 for a pure CPU profile.
+"""
+import os
+import re
+import time
+import uuid
+import random
+import threading
+from datetime import datetime, timedelta
+
+import pytz
+
+DEFAULT_LATENCY_MS = {
+    'openai': 400,
+    'google_calendar': 80,
+    'airtable': 120,
+    'voiceflow': 150,
+}
+JITTER = 0.2  # +/- fraction applied to each delay
+
+def latency_from_env():
+    return {
+        service: float(os.getenv(f'FAKE_{service.upper()}_LATENCY_MS', default))
+        for service, default in DEFAULT_LATENCY_MS.items()
+    }
+
+class Upstream:
+    """Shared delay logic; one instance per fake service"""
+
+    def __init__(self, latency_ms, seed=0):
+        self.latency_ms = latency_ms
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            self.calls += 1
+            factor = 1 + self._rng.uniform(-JITTER, JITTER)
+        if self.latency_ms:
+            time.sleep(self.latency_ms * factor / 1000)
+
+# --- OpenAI -----------------------------------------------------------------
+
+class _Message:
+    def __init__(self, content):
+        self.content = content
+
+class _Choice:
+    def __init__(self, content):
+        self.message = _Message(content)
+
+class _Completion:
+    def __init__(self, content):
+        self.choices = [_Choice(content)]
+
+class FakeOpenAI(Upstream):
+    """Answers client.chat.completions.create"""
+
+    def __init__(self, latency_ms, reply="Sure! Pack layers, a rain jacket and comfortable shoes."):
+        super().__init__(latency_ms)
+        self.reply = reply
+        self.chat = self
+        self.completions = self
+
+    def create(self, model, messages, **kwargs):
+        self.wait()
+        return _Completion(self.reply)
+
+# --- Google Calendar --------------------------------------------------------
+
+class _Request:
+    def __init__(self, upstream, fn):
+        self._upstream = upstream
+        self._fn = fn
+
+    def execute(self):
+        self._upstream.wait()
+        return self._fn()
+
+def synthetic_calendar(count=300, days=90, seed=7, tz_name='America/Denver'):
+    """Timed events spread over the coming days, during working hours"""
+    rng = random.Random(seed)
+    tz = pytz.timezone(tz_name)
+    today = datetime.now(tz).replace(hour=8, minute=0, second=0, microsecond=0)
+    events = []
+    for i in range(count):
+        start = today + timedelta(days=rng.randrange(days), minutes=rng.randrange(0, 9 * 60, 30))
+        end = start + timedelta(minutes=rng.choice([30, 60, 90]))
+        events.append({
+            'id': f'evt{i}',
+            'etag': f'"{i}"',
+            'status': 'confirmed',
+            'summary': f"Meeting {i}",
+            'start': {'dateTime': start.isoformat()},
+            'end': {'dateTime': end.isoformat()},
+        })
+    return events
+
+class FakeCalendarService(Upstream):
+    """The slice of the Calendar v3 discovery client the app uses"""
+
+    def __init__(self, latency_ms, events=None):
+        super().__init__(latency_ms)
+        self._lock = threading.Lock()
+        self._events = []
+        for event in (events if events is not None else synthetic_calendar()):
+            self._store(event)
+
+    def _store(self, event):
+        start = datetime.fromisoformat(event['start'].get('dateTime', event['start'].get('date')))
+        end = datetime.fromisoformat(event['end'].get('dateTime', event['end'].get('date')))
+        if start.tzinfo is None:
+            start, end = pytz.UTC.localize(start), pytz.UTC.localize(end)
+        self._events.append((start, end, event))
+
+    # Resource accessors return self; the methods below are the calls made on them
+    def events(self):
+        return self
+
+    def channels(self):
+        return self
+
+    def freebusy(self):
+        return self
+
+    def _window(self, time_min, time_max):
+        low = datetime.fromisoformat(time_min) if time_min else None
+        high = datetime.fromisoformat(time_max) if time_max else None
+        with self._lock:
+            rows = list(self._events)
+        return [
+            (start, end, event) for start, end, event in rows
+            if (low is None or end > low) and (high is None or start < high)
+        ]
+
+    def list(self, calendarId='primary', timeMin=None, timeMax=None, maxResults=250,
+             pageToken=None, syncToken=None, orderBy=None, **kwargs):
+        def run():
+            if syncToken:
+                return {'items': [], 'nextSyncToken': syncToken}
+            rows = self._window(timeMin, timeMax)
+            if orderBy == 'startTime':
+                rows.sort(key=lambda row: row[0])
+            offset = int(pageToken or 0)
+            page = rows[offset:offset + maxResults]
+            result = {'items': [event for _, _, event in page]}
+            if offset + maxResults < len(rows):
+                result['nextPageToken'] = str(offset + maxResults)
+            else:
+                result['nextSyncToken'] = uuid.uuid4().hex
+            return result
+        return _Request(self, run)
+
+    def insert(self, calendarId, body):
+        def run():
+            event = dict(body, status='confirmed')
+            event.setdefault('id', uuid.uuid4().hex)
+            with self._lock:
+                if any(stored['id'] == event['id'] for _, _, stored in self._events):
+                    raise _conflict()
+                self._store(event)
+            return event
+        return _Request(self, run)
+
+    def get(self, calendarId, eventId):
+        def run():
+            with self._lock:
+                return next(event for _, _, event in self._events if event['id'] == eventId)
+        return _Request(self, run)
+
+    def watch(self, calendarId, body):
+        return _Request(self, lambda: {'id': body['id'], 'resourceId': uuid.uuid4().hex})
+
+    def stop(self, body):
+        return _Request(self, lambda: {})
+
+    def query(self, body):
+        def run():
+            busy = [
+                {'start': start.isoformat(), 'end': end.isoformat()}
+                for start, end, _ in self._window(body['timeMin'], body['timeMax'])
+            ]
+            return {'calendars': {item['id']: {'busy': busy} for item in body['items']}}
+        return _Request(self, run)
+
+    def new_batch_http_request(self, callback=None):
+        return _Batch(self, callback)
+
+def _conflict():
+    """The error the API raises when an insert reuses an existing event id"""
+    from googleapiclient.errors import HttpError
+    from httplib2 import Response
+    return HttpError(Response({'status': 409}), b'{"error": {"message": "The requested identifier already exists."}}')
+
+class _Batch:
+    """One round trip for all queued requests, like the real batch endpoint"""
+
+    def __init__(self, service, callback):
+        self._service = service
+        self._callback = callback
+        self._requests = []
+
+    def add(self, request, request_id=None):
+        self._requests.append((request_id or str(len(self._requests)), request))
+
+    def execute(self):
+        self._service.wait()
+        for request_id, request in self._requests:
+            try:
+                response, exception = request._fn(), None
+            except Exception as e:
+                response, exception = None, e
+            if self._callback:
+                self._callback(request_id, response, exception)
+
+# --- Airtable ---------------------------------------------------------------
+
+FORMULA = re.compile(r"\{(\w+)\}\s*=\s*'([^']*)'")
+
+class FakeAirtable(Upstream):
+    """In-memory table answering get_all/insert/update like airtable-python-wrapper"""
+
+    def __init__(self, latency_ms, table_name='UserProfiles'):
+        super().__init__(latency_ms)
+        self.table_name = table_name
+        self._records = {}
+        self._lock = threading.Lock()
+
+    def get_all(self, formula=None, maxRecords=None, **kwargs):
+        self.wait()
+        with self._lock:
+            records = list(self._records.values())
+        match = FORMULA.fullmatch(formula.strip()) if formula else None
+        if match:
+            field, value = match.groups()
+            records = [r for r in records if r['fields'].get(field) == value]
+        return [dict(r, fields=dict(r['fields'])) for r in records[:maxRecords]]
+
+    def insert(self, fields, **kwargs):
+        self.wait()
+        record = {'id': 'rec' + uuid.uuid4().hex[:14], 'fields': dict(fields)}
+        with self._lock:
+            self._records[record['id']] = record
+        return record
+
+    def update(self, record_id, fields, **kwargs):
+        self.wait()
+        with self._lock:
+            self._records[record_id]['fields'].update(fields)
+            return self._records[record_id]
+
+class FakeAirtableFactory:
+    """Drop-in for the Airtable class: one shared table per table name"""
+
+    def __init__(self, latency_ms):
+        self.latency_ms = latency_ms
+        self.tables = {}
+
+    def __call__(self, base_id, table_name, api_key=None):
+        if table_name not in self.tables:
+            self.tables[table_name] = FakeAirtable(self.latency_ms, table_name)
+        return self.tables[table_name]
+
+# --- Voiceflow --------------------------------------------------------------
+
+class _Response:
+    status_code = 200
+
+    def __init__(self, payload):
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+class FakeVoiceflow(Upstream):
+    """Stands in for the `requests` module as used for Voiceflow's interact call"""
+
+    def post(self, url, headers=None, json=None, **kwargs):
+        self.wait()
+        return _Response([{'type': 'text', 'payload': {'message': 'Happy to help with your trip.'}}])
+
+def install(app_module, latency=None):
+    """Point the app and its helper modules at fresh fakes; returns them by service"""
+    import google_calendar
+    import trip_planner
+    import calendar_sync
+
+    latency = latency or latency_from_env()
+    fakes = {
+        'openai': FakeOpenAI(latency['openai']),
+        'google_calendar': FakeCalendarService(latency['google_calendar']),
+        'airtable': FakeAirtableFactory(latency['airtable']),
+        'voiceflow': FakeVoiceflow(latency['voiceflow']),
+    }
+    get_service = lambda *args, **kwargs: fakes['google_calendar']
+    for module in (google_calendar, trip_planner, calendar_sync):
+        module.get_calendar_service = get_service
+
+    # Every user counts as having connected their calendar
+    app_module.calendar_connected = lambda: True
+    app_module.client = fakes['openai']
+    app_module.Airtable = fakes['airtable']
+    app_module.airtable = fakes['airtable'](None, app_module.USER_TABLE_NAME)
+    app_module.requests = fakes['voiceflow']
+    app_module.VOICEFLOW_API_KEY = app_module.VOICEFLOW_API_KEY or 'fake'
+    return fakes
@@ -0,0 +1,89 @@
+"""Build the app against local fakes and describe the requests worth timing.
+
+Shared by bench_endpoints.py (pytest-benchmark) and load.py (concurrent
+load). Import this before anything imports app: it points the database,
+logging and tracing at throwaway settings first.
+"""
+import os
+import sys
+import math
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+WORKDIR = tempfile.mkdtemp(prefix='genie-bench-')
+os.environ.setdefault('FLASK_SECRET_KEY', 'benchmark')
+os.environ.setdefault('OPENAI_API_KEY', 'fake')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(WORKDIR, 'bench.db')}?timeout=30")
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+import fakes
+
+# (name, method, path, form data) for each request type we report on; /chat is split by intent
+SCENARIOS = [
+    ('home', 'GET', '/', None),
+    ('chat:greeting', 'POST', '/chat', {'message': 'hello'}),
+    ('chat:openai', 'POST', '/chat', {'message': 'What should I pack for a week in Iceland?'}),
+    ('chat:view', 'POST', '/chat', {'message': 'show my calendar'}),
+    ('chat:create', 'POST', '/chat', {'message': 'add dentist appointment tomorrow at 3pm'}),
+    ('chat:trip', 'POST', '/chat', {'message': 'plan a trip to Denver on december 12 to december 20'}),
+    ('update_profile', 'POST', '/update_profile', {'preferences': '{"theme": "dark", "travel_preferences": {"mode": "flying"}}'}),
+    ('auth:signin', 'POST', '/auth', None),
+]
+BENCH_PASSWORD = 'correct horse battery staple'
+
+_app = None
+
+def load_app(latency=None):
+    """The app module with fakes installed and a fresh database"""
+    global _app
+    if _app is None:
+        os.chdir(WORKDIR)
+        import jinja2
+        import app as app_module
+        # Templates live at the repository root
+        app_module.app.jinja_loader = jinja2.FileSystemLoader(ROOT)
+        with app_module.app.app_context():
+            app_module.db.create_all()
+        _app = app_module
+    _app.fakes = fakes.install(_app, latency)
+    return _app
+
+def signed_in_client(app_module, email='bench@example.com'):
+    """A test client with an account and a session, as after signing up"""
+    client = app_module.app.test_client()
+    response = client.post('/auth', json={
+        'type': 'signup', 'name': 'Bench', 'email': email, 'password': BENCH_PASSWORD
+    })
+    if response.status_code != 200:
+        client.post('/auth', json={'type': 'signin', 'email': email, 'password': BENCH_PASSWORD})
+    return client
+
+def send(client, scenario, email='bench@example.com'):
+    """Issue one scenario request; returns the status code"""
+    name, method, path, data = scenario
+    if name == 'auth:signin':
+        response = client.post(path, json={'type': 'signin', 'email': email, 'password': BENCH_PASSWORD})
+    elif method == 'GET':
+        response = client.get(path)
+    else:
+        response = client.post(path, data=data)
+    response.close()
+    return response.status_code
+
+def percentiles(samples, points=(50, 95, 99)):
+    """Nearest-rank percentiles of a list of durations"""
+    ordered = sorted(samples)
+    if not ordered:
+        return {p: None for p in points}
+    return {p: ordered[max(math.ceil(p / 100 * len(ordered)) - 1, 0)] for p in points}
+
+def format_report(results):
+    """Table of p50/p95/p99 (ms) per scenario from {name: (durations_s, errors)}"""
+    lines = [f"{'scenario':<16} {'n':>6} {'err':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"]
+    for name, (samples, errors) in results.items():
+        pct = percentiles(samples)
+        cells = ' '.join(f"{pct[p] * 1000:>9.1f}" if pct[p] is not None else f"{'-':>9}" for p in (50, 95, 99))
+        lines.append(f"{name:<16} {len(samples):>6} {errors:>5} {cells}")
+    return '\n'.join(lines)
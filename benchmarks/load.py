@@ -0,0 +1,104 @@
+"""Concurrent load against the app, reporting p50/p95/p99 per scenario.
+
+    python benchmarks/load.py [--users 16] [--requests 25] [--url http://host:port]
+
+Without --url the app is served in-process (threaded werkzeug server) on
+local fakes, with delays from FAKE_<SERVICE>_LATENCY_MS. Each virtual user
+signs up, keeps its own session cookie and cycles through the scenarios.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.cookiejar import CookieJar
+
+import harness
+
+class VirtualUser:
+    def __init__(self, base_url, index):
+        self.base_url = base_url
+        self.email = f'load{index}-{int(time.time())}@example.com'
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()))
+
+    def request(self, method, path, form=None, body=None):
+        headers = {}
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        elif form is not None:
+            data = urllib.parse.urlencode(form).encode()
+        req = urllib.request.Request(self.base_url + path, data=data, method=method, headers=headers)
+        try:
+            with self.opener.open(req, timeout=60) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    def sign_up(self):
+        return self.request('POST', '/auth', body={
+            'type': 'signup', 'name': 'Load', 'email': self.email, 'password': harness.BENCH_PASSWORD
+        })
+
+    def send(self, scenario):
+        name, method, path, data = scenario
+        if name == 'auth:signin':
+            return self.request('POST', path, body={'type': 'signin', 'email': self.email, 'password': harness.BENCH_PASSWORD})
+        return self.request(method, path, form=data)
+
+async def run_user(user, count, offset, results):
+    await asyncio.to_thread(user.sign_up)
+    scenarios = itertools.islice(itertools.cycle(harness.SCENARIOS), offset, offset + count)
+    for scenario in scenarios:
+        start = time.perf_counter()
+        status = await asyncio.to_thread(user.send, scenario)
+        samples, errors = results.setdefault(scenario[0], ([], [0]))
+        samples.append(time.perf_counter() - start)
+        if status >= 500:
+            errors[0] += 1
+
+async def run(base_url, users, requests_per_user):
+    results = {name: ([], [0]) for name, _, _, _ in harness.SCENARIOS}
+    vusers = [VirtualUser(base_url, i) for i in range(users)]
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        run_user(user, requests_per_user, i, results) for i, user in enumerate(vusers)
+    ))
+    elapsed = time.perf_counter() - started
+    return {name: (samples, errors[0]) for name, (samples, errors) in results.items()}, elapsed
+
+def serve_in_process():
+    from werkzeug.serving import make_server
+    app_module = harness.load_app()
+    server = make_server('127.0.0.1', 0, app_module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}', server
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=16, help='concurrent virtual users')
+    parser.add_argument('--requests', type=int, default=25, help='requests per user')
+    parser.add_argument('--url', help='target an already running server instead')
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url
+    if not base_url:
+        base_url, server = serve_in_process()
+    asyncio.run(run(base_url, 1, 0))  # Create the tables and warm imports before timing
+
+    results, elapsed = asyncio.run(run(base_url, args.users, args.requests))
+    total = sum(len(samples) for samples, _ in results.values())
+    print(f"{total} requests from {args.users} users in {elapsed:.1f}s ({total / elapsed:.1f} req/s)")
+    print(harness.format_report(results))
+    if server:
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+import time
+import logging
+import uuid
+import secrets
+import threading
+import requests
+from google_calendar import get_calendar_service, acting_as, current_user
+from event_cache import get_event_cache
+from instrumentation import timed
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_TTL_SECONDS = 7 * 24 * 3600  # Longest lifetime Google grants event channels
+RENEW_MARGIN_SECONDS = 3600
+# Wait before retrying a failed renewal while the old channel is still open
+RENEW_RETRY_SECONDS = 300
+
+class Channel:
+    def __init__(self, channel_id, resource_id, token, expiration, calendar_id='primary', service=None, user_key=None):
+        self.channel_id = channel_id
+        self.resource_id = resource_id
+        self.token = token
+        self.expiration = expiration  # Unix seconds
+        self.calendar_id = calendar_id
+        self.service = service
+        self.user_key = user_key
+        self.timer = None
+
+_channels = {}
+_channels_lock = threading.Lock()
+_watched = {}
+_pending = set()  # Keys a thread is currently opening a channel for
+_last_failure = {}
+RETRY_AFTER_SECONDS = 300
+
+def start_watch(address, calendar_id='primary', token=None, ttl=CHANNEL_TTL_SECONDS, service=None, user_key=None):
+    """Open a push channel so Google posts change notifications to `address`"""
+    user_key = user_key if user_key is not None else current_user()
+    if service is None:
+        with acting_as(user_key):
+            service = get_calendar_service()
+    token = token or secrets.token_urlsafe(24)
+    with timed('google_calendar', 'events.watch'):
+        result = service.events().watch(calendarId=calendar_id, body={
+            'id': uuid.uuid4().hex,
+            'type': 'web_hook',
+            'address': address,
+            'token': token,
+            'params': {'ttl': str(ttl)}
+        }).execute()
+    expiration = int(result.get('expiration', (time.time() + ttl) * 1000)) / 1000
+    channel = Channel(result['id'], result['resourceId'], token, expiration, calendar_id, service, user_key)
+    with _channels_lock:
+        _channels[channel.channel_id] = channel
+        _watched[(user_key, calendar_id)] = channel
+    get_event_cache(calendar_id, user_key).push_enabled = True
+    schedule_renewal(channel, address)
+    return channel
+
+def stop_watch(channel):
+    """Close a channel; Google stops sending to it immediately"""
+    with _channels_lock:
+        _channels.pop(channel.channel_id, None)
+        key = (channel.user_key, channel.calendar_id)
+        if _watched.get(key) is channel:
+            del _watched[key]
+            # Fall back to TTL polling until a channel is opened again
+            get_event_cache(channel.calendar_id, channel.user_key).push_enabled = False
+    if channel.timer:
+        channel.timer.cancel()
+    try:
+        with timed('google_calendar', 'channels.stop'):
+            channel.service.channels().stop(body={'id': channel.channel_id, 'resourceId': channel.resource_id}).execute()
+    except Exception as e:
+        logger.warning("Failed to stop calendar channel %s: %s", channel.channel_id, e)
+
+def schedule_renewal(channel, address, delay=None):
+    """Replace the channel shortly before it expires so coverage never lapses"""
+    if delay is None:
+        delay = max(channel.expiration - time.time() - RENEW_MARGIN_SECONDS, 0)
+    channel.timer = threading.Timer(delay, renew_watch, args=(channel, address))
+    channel.timer.daemon = True
+    channel.timer.start()
+
+def renew_watch(channel, address):
+    """Open the replacement channel, then close this one.
+
+    If the new watch fails the old channel stays open and renewal is retried
+    until it is about to expire; then the cache falls back to TTL polling
+    and the next request's ensure_watch tries again.
+    """
+    try:
+        start_watch(address, channel.calendar_id, token=channel.token, service=channel.service, user_key=channel.user_key)
+    except Exception as e:
+        if channel.expiration - time.time() > RENEW_RETRY_SECONDS:
+            logger.warning("Failed to renew calendar channel %s, retrying in %ds: %s",
+                           channel.channel_id, RENEW_RETRY_SECONDS, e)
+            schedule_renewal(channel, address, delay=RENEW_RETRY_SECONDS)
+            return
+        logger.error("Failed to renew calendar channel %s before it expired; polling instead: %s",
+                     channel.channel_id, e)
+    stop_watch(channel)
+
+def ensure_watch(address, calendar_id='primary', user_key=None):
+    """Open a channel for the user's calendar unless one is already active or being opened"""
+    key = (user_key if user_key is not None else current_user(), calendar_id)
+    # Check and reserve in one step, so concurrent first requests open a single channel
+    with _channels_lock:
+        if key in _watched:
+            return _watched[key]
+        if key in _pending or time.monotonic() - _last_failure.get(key, -RETRY_AFTER_SECONDS) < RETRY_AFTER_SECONDS:
+            return None
+        _pending.add(key)
+    try:
+        return start_watch(address, calendar_id, user_key=key[0])
+    except Exception as e:
+        with _channels_lock:
+            _last_failure[key] = time.monotonic()
+        logger.warning("Failed to start calendar watch: %s", e)
+        return None
+    finally:
+        with _channels_lock:
+            _pending.discard(key)
+
+def handle_notification(headers):
+    """Process a push notification's headers; returns False if it isn't ours.
+
+    Only the headers matter: Google sends no body. The 'sync' message just
+    confirms the channel; anything else means the calendar changed, so the
+    cache is marked dirty and synced in the background.
+    """
+    channel = _channels.get(headers.get('X-Goog-Channel-ID'))
+    if not channel or not secrets.compare_digest(headers.get('X-Goog-Channel-Token', ''), channel.token):
+        return False
+    if headers.get('X-Goog-Resource-State') == 'sync':
+        return True
+
+    cache = get_event_cache(channel.calendar_id, channel.user_key)
+    cache.mark_dirty()
+    threading.Thread(target=cache.sync, daemon=True).start()
+    return True
+
+class LocalNotifier:
+    """Stand-in for Google's push service, for local runs and tests.
+
+    Serves as the `service` for start_watch and delivers notifications to the
+    channel address with the same headers Google would send. Pass a Flask
+    test client's `post` to deliver without a running server.
+    """
+
+    def __init__(self, post=requests.post):
+        self._post = post
+        self.open_channels = {}
+        self.message_numbers = {}
+
+    # Minimal events().watch / channels().stop surface used by start_watch and stop_watch
+    def events(self):
+        return self
+
+    def channels(self):
+        return self
+
+    def watch(self, calendarId, body):
+        channel = dict(body, resourceId=uuid.uuid4().hex, calendarId=calendarId,
+                       expiration=str(int((time.time() + int(body['params']['ttl'])) * 1000)))
+        self.open_channels[body['id']] = channel
+        return _Result(channel)
+
+    def stop(self, body):
+        self.open_channels.pop(body['id'], None)
+        return _Result({})
+
+    def notify(self, state='exists'):
+        """Send a notification on every open channel"""
+        responses = []
+        for channel_id, channel in list(self.open_channels.items()):
+            self.message_numbers[channel_id] = self.message_numbers.get(channel_id, 0) + 1
+            responses.append(self._post(channel['address'], headers={
+                'X-Goog-Channel-ID': channel_id,
+                'X-Goog-Channel-Token': channel['token'],
+                'X-Goog-Channel-Expiration': channel['expiration'],
+                'X-Goog-Resource-ID': channel['resourceId'],
+                'X-Goog-Resource-State': state,
+                'X-Goog-Message-Number': str(self.message_numbers[channel_id])
+            }))
+        return responses
+
+class _Result:
+    def __init__(self, value):
+        self._value = value
+
+    def execute(self):
+        return self._value
@@ -0,0 +1,129 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import pytz
+from jinja2 import Environment
+from google_calendar import event_bounds, is_valid_event
+
+LOCAL_TZ = pytz.timezone('America/Denver')
+VIEW_DAYS = 14
+RENDER_CACHE_SIZE = 64
+
+# Compiled once at import; rendering is then a plain function call
+_env = Environment(autoescape=True, trim_blocks=True)
+CALENDAR_TEMPLATE = _env.from_string(
+    "📅 Your Calendar\n\n"
+    "{% for day in days %}"
+    "<div class='calendar-date'>\n"
+    "<h3>{{ day.label }}</h3>\n"
+    "{% for event in day.events %}"
+    "{% if event.all_day %}"
+    "<div class='calendar-event all-day'>\n"
+    "<span class='calendar-icon'>📅</span>\n"
+    "<span class='event-title'><strong>{{ event.summary }}</strong> (All day)</span>\n"
+    "</div>\n"
+    "{% else %}"
+    "<div class='calendar-event'>\n"
+    "<span class='calendar-icon'>🕒</span>\n"
+    "<span class='event-time'>{{ event.start }} - {{ event.end }}</span>\n"
+    "<span class='event-title'><strong>{{ event.summary }}</strong></span>\n"
+    "</div>\n"
+    "{% endif %}"
+    "{% endfor %}"
+    "</div>\n"
+    "{% endfor %}"
+)
+EMPTY_VIEW = "🎉 Your calendar is clear!"
+
+def build_days(events, tz=LOCAL_TZ):
+    """Group valid events by local start date, parsing each event's times once"""
+    days = OrderedDict()
+    rows = []
+    for event in events:
+        if not is_valid_event(event):
+            continue
+        start_ts, end_ts = event_bounds(event)
+        rows.append((start_ts, end_ts, event))
+    rows.sort(key=lambda row: row[0])
+
+    for start_ts, end_ts, event in rows:
+        all_day = 'date' in event['start']
+        if all_day:
+            day = datetime.fromisoformat(event['start']['date']).date()
+        else:
+            start = datetime.fromtimestamp(start_ts, tz)
+            day = start.date()
+        if day not in days:
+            days[day] = {'label': day.strftime('%A, %B %d, %Y'), 'events': []}
+        item = {'summary': event.get('summary', ''), 'all_day': all_day}
+        if not all_day:
+            item['start'] = start.strftime('%I:%M %p')
+            item['end'] = datetime.fromtimestamp(end_ts, tz).strftime('%I:%M %p')
+        days[day]['events'].append(item)
+    return list(days.values())
+
+def render_events(events):
+    """Render an iterable of events to the chat calendar HTML"""
+    days = build_days(events)
+    if not days:
+        return EMPTY_VIEW
+    return CALENDAR_TEMPLATE.render(days=days)
+
+def view_window(now=None, days=VIEW_DAYS):
+    """Local-midnight window covering the next `days` days, plus its first day"""
+    now = now or datetime.now(LOCAL_TZ)
+    first_day = now.astimezone(LOCAL_TZ).date()
+    window_start = LOCAL_TZ.localize(datetime.combine(first_day, datetime.min.time()))
+    # Localize the last midnight too: adding days to window_start keeps its UTC offset across DST
+    window_end = LOCAL_TZ.localize(datetime.combine(first_day + timedelta(days=days), datetime.min.time()))
+    return first_day, window_start, window_end
+
+def view_etag(fingerprint, first_day, days):
+    """Strong validator for a window; the content fingerprint keeps it stable across restarts"""
+    return f"{fingerprint[:16]}-{first_day.isoformat()}-{days}"
+
+def serialize_events(events, tz=LOCAL_TZ):
+    """JSON-ready events with local ISO times, ordered by start"""
+    rows = []
+    for event in events:
+        if not is_valid_event(event):
+            continue
+        start_ts, end_ts = event_bounds(event)
+        all_day = 'date' in event['start']
+        start = datetime.fromtimestamp(start_ts, tz)
+        rows.append({
+            'id': event.get('id'),
+            'summary': event.get('summary', ''),
+            'location': event.get('location', ''),
+            'all_day': all_day,
+            'date': event['start']['date'] if all_day else start.date().isoformat(),
+            'start': start.isoformat(),
+            'end': datetime.fromtimestamp(end_ts, tz).isoformat()
+        })
+    rows.sort(key=lambda row: row['start'])
+    return rows
+
+_render_cache = OrderedDict()
+_render_lock = threading.Lock()
+
+def render_calendar_view(cache, days=VIEW_DAYS, now=None):
+    """Render the upcoming days from an event cache, reusing the last render.
+
+    Entries are keyed on the cache version, which only moves when the
+    calendar's events change, so an unchanged calendar is a dict lookup.
+    The cache's key keeps users with the same version number apart.
+    """
+    first_day, window_start, window_end = view_window(now, days)
+    key = (cache.key, cache.ensure(window_start, window_end), first_day, days)
+    with _render_lock:
+        html = _render_cache.get(key)
+        if html is not None:
+            _render_cache.move_to_end(key)
+            return html
+
+    html = render_events(cache.get_events(window_start, window_end))
+    with _render_lock:
+        _render_cache[key] = html
+        while len(_render_cache) > RENDER_CACHE_SIZE:
+            _render_cache.popitem(last=False)
+    return html
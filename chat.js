@@ -0,0 +1,498 @@
+// Add at the beginning of your script
+let isMuted = false;
+const muteBtn = document.getElementById('mute-btn');
+
+muteBtn.addEventListener('click', function() {
+    isMuted = !isMuted;
+    this.textContent = isMuted ? '🔇' : '🔊';
+    this.title = isMuted ? 'Unmute Voice Output' : 'Mute Voice Output';
+    
+    if (isMuted) {
+        speechSynthesis.cancel(); // Stop any ongoing speech
+    }
+});
+
+// Add speech recognition setup
+let recognition;
+if ('webkitSpeechRecognition' in window) {
+    recognition = new webkitSpeechRecognition();
+    recognition.continuous = false;
+    recognition.interimResults = false;
+    recognition.lang = 'en-US';
+
+    recognition.onresult = function(event) {
+        const transcript = event.results[0][0].transcript;
+        document.getElementById('messageInput').value = transcript;
+        // Auto-send voice message
+        sendMessage(new Event('submit'));
+    };
+
+    recognition.onend = function() {
+        document.getElementById('voice-btn').textContent = '🎤';
+    };
+}
+
+document.getElementById('voice-btn').addEventListener('click', function() {
+    if (recognition) {
+        try {
+            recognition.start();
+            this.textContent = '🔴';
+        } catch (e) {
+            console.error('Speech recognition error:', e);
+        }
+    }
+});
+
+// Chat history is rendered incrementally: new messages are appended as
+// nodes and at most MAX_RENDERED_MESSAGES stay in the DOM. Scrolling to the
+// top fetches older pages from /history and drops the newest nodes; scrolling
+// back to the bottom fetches those again and drops the oldest.
+const MAX_RENDERED_MESSAGES = 200;
+const HISTORY_PAGE_SIZE = 50;
+let hasMoreHistory = document.getElementById('chatHistory').dataset.hasMore === 'true';
+let hasNewerHistory = false;
+let loadingHistory = false;
+
+// Messages arrive already rendered to HTML by the server
+function createMessageNode(role, html, id) {
+    const node = document.createElement('div');
+    node.className = role === 'assistant' ? 'message ai' : `message ${role}`;
+    node.innerHTML = html;
+    if (id) {
+        node.dataset.id = id;
+    }
+    return node;
+}
+
+function escapeHtml(text) {
+    const node = document.createElement('div');
+    node.textContent = text;
+    return node.innerHTML;
+}
+
+function oldestMessageId() {
+    const first = document.querySelector('#chatHistory .message[data-id]');
+    return first ? first.dataset.id : null;
+}
+
+function newestMessageId() {
+    const messages = document.querySelectorAll('#chatHistory .message[data-id]');
+    return messages.length ? messages[messages.length - 1].dataset.id : null;
+}
+
+function appendMessage(role, html, id) {
+    // Scrolled back in history: a stored message shows up when paging down to it
+    if (hasNewerHistory && id) return;
+    const chatHistory = document.getElementById('chatHistory');
+    chatHistory.appendChild(createMessageNode(role, html, id));
+    trimRenderedMessages();
+    chatHistory.scrollTop = chatHistory.scrollHeight;
+}
+
+// Drop the oldest nodes beyond the cap, keeping the visible messages in place
+function trimRenderedMessages() {
+    const chatHistory = document.getElementById('chatHistory');
+    const previousHeight = chatHistory.scrollHeight;
+    while (chatHistory.children.length > MAX_RENDERED_MESSAGES) {
+        const oldest = chatHistory.firstElementChild;
+        if (oldest.dataset.id) {
+            hasMoreHistory = true;
+        }
+        oldest.remove();
+    }
+    chatHistory.scrollTop -= previousHeight - chatHistory.scrollHeight;
+}
+
+// Drop the newest nodes beyond the cap after an older page was prepended
+function trimNewestMessages() {
+    const chatHistory = document.getElementById('chatHistory');
+    while (chatHistory.children.length > MAX_RENDERED_MESSAGES) {
+        const newest = chatHistory.lastElementChild;
+        if (newest.dataset.id) {
+            hasNewerHistory = true;
+        }
+        newest.remove();
+    }
+}
+
+function loadOlderMessages() {
+    const before = oldestMessageId();
+    if (!hasMoreHistory || loadingHistory || !before) return;
+    loadingHistory = true;
+
+    fetch(`/history?before=${before}&limit=${HISTORY_PAGE_SIZE}`)
+        .then(response => response.json())
+        .then(data => {
+            const chatHistory = document.getElementById('chatHistory');
+            const previousHeight = chatHistory.scrollHeight;
+            const fragment = document.createDocumentFragment();
+            for (const message of data.messages) {
+                fragment.appendChild(createMessageNode(message.role, message.html, message.id));
+            }
+            chatHistory.insertBefore(fragment, chatHistory.firstChild);
+            // Keep the messages the user was reading in place
+            chatHistory.scrollTop += chatHistory.scrollHeight - previousHeight;
+            hasMoreHistory = data.has_more;
+            trimNewestMessages();
+        })
+        .catch(error => console.error('History error:', error))
+        .finally(() => { loadingHistory = false; });
+}
+
+function loadNewerMessages() {
+    const after = newestMessageId();
+    if (!hasNewerHistory || loadingHistory || !after) return;
+    loadingHistory = true;
+
+    fetch(`/history?after=${after}&limit=${HISTORY_PAGE_SIZE}`)
+        .then(response => response.json())
+        .then(data => {
+            const chatHistory = document.getElementById('chatHistory');
+            const fragment = document.createDocumentFragment();
+            for (const message of data.messages) {
+                fragment.appendChild(createMessageNode(message.role, message.html, message.id));
+            }
+            chatHistory.appendChild(fragment);
+            hasNewerHistory = data.has_more;
+            trimRenderedMessages();
+        })
+        .catch(error => console.error('History error:', error))
+        .finally(() => { loadingHistory = false; });
+}
+
+// Replace the window with the newest page, e.g. before sending from far back in history
+function jumpToLatest() {
+    return fetch(`/history?limit=${HISTORY_PAGE_SIZE}`)
+        .then(response => response.json())
+        .then(data => {
+            const chatHistory = document.getElementById('chatHistory');
+            chatHistory.replaceChildren(
+                ...data.messages.map(message => createMessageNode(message.role, message.html, message.id))
+            );
+            hasMoreHistory = data.has_more;
+            chatHistory.scrollTop = chatHistory.scrollHeight;
+        })
+        .catch(error => console.error('History error:', error))
+        .finally(() => { hasNewerHistory = false; });
+}
+
+document.getElementById('chatHistory').addEventListener('scroll', function() {
+    if (this.scrollTop < 100) {
+        loadOlderMessages();
+    } else if (this.scrollHeight - this.scrollTop - this.clientHeight < 100) {
+        loadNewerMessages();
+    }
+});
+
+window.addEventListener('load', () => {
+    const chatHistory = document.getElementById('chatHistory');
+    chatHistory.scrollTop = chatHistory.scrollHeight;
+});
+
+// One message in flight at a time; the server rejects a second one with 429 anyway
+let sending = false;
+// The message awaiting a reply and its Idempotency-Key; resending the same
+// text reuses the key so the server can recognise the retry
+let unsent = null;
+
+function setSending(value) {
+    sending = value;
+    document.getElementById('sendButton').disabled = value;
+}
+
+// Keep existing sendMessage function but add text-to-speech
+function sendMessage(event) {
+    event.preventDefault();
+    if (sending) return;
+    const input = document.getElementById('messageInput');
+    const message = input.value.trim();
+    if (!message) return;
+    if (hasNewerHistory) {
+        // The reply belongs after the newest messages, not after the page being read
+        setSending(true);
+        jumpToLatest().then(() => {
+            setSending(false);
+            sendMessage(event);
+        });
+        return;
+    }
+
+    if (!unsent || unsent.message !== message) {
+        unsent = { message, key: crypto.randomUUID() };
+    }
+
+    // Add user message
+    appendMessage('user', escapeHtml(message));
+    
+    // Clear input
+    input.value = '';
+    setSending(true);
+    
+    // Get AI response
+    fetch('/chat', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/x-www-form-urlencoded',
+            // Lets the server recognise a retried message instead of booking it twice
+            'Idempotency-Key': unsent.key,
+        },
+        body: `message=${encodeURIComponent(message)}`
+    })
+    .then(response => {
+        if (response.status === 429) {
+            // Overloaded: hand the text back so the user can resend it
+            const retryAfter = response.headers.get('Retry-After') || '1';
+            return response.json().then(data => {
+                input.value = input.value || message;
+                appendMessage('error', escapeHtml(`${data.error} (retry in ${retryAfter}s)`));
+                return null;
+            });
+        }
+        unsent = null;
+        return response.json();
+    })
+    .then(data => {
+        if (!data) return;
+        if (data.error) {
+            if (data.error.includes('authenticate')) {
+                document.getElementById('authPrompt').style.display = 'block';
+            }
+            appendMessage('error', escapeHtml(`Error: ${data.error}`));
+            console.error('API Error:', data.error);
+        } else if (data.view === 'calendar') {
+            showCalendar();
+        } else {
+            appendMessage('assistant', data.html, data.id);
+            // Add text-to-speech for AI responses
+            speakResponse(data.response);
+            if (data.job) {
+                pollJob(data.job);
+            }
+        }
+    }).catch(error => {
+        if (unsent) {
+            // The message may or may not have arrived; a resend reuses its key
+            input.value = input.value || message;
+        }
+        handleError(error.message);
+    }).finally(() => setSending(false));
+}
+
+// Calendar writes finish in the background; show their outcome once the job is done
+function pollJob(jobId, delay = 500) {
+    setTimeout(() => {
+        fetch(`/jobs/${jobId}`, { cache: 'no-store' })
+            .then(response => response.json())
+            .then(data => {
+                if (data.status === 'done' || data.status === 'failed') {
+                    if (data.html) {
+                        appendMessage('assistant', data.html, data.message_id);
+                        speakResponse(data.response);
+                    }
+                } else if (!data.error) {
+                    pollJob(jobId, Math.min(delay * 2, 5000));
+                }
+            })
+            .catch(() => pollJob(jobId, Math.min(delay * 2, 5000)));
+    }, delay);
+}
+
+// Calendar view rendered from the JSON API. no-cache makes the browser
+// revalidate with If-None-Match, so an unchanged calendar is a 304.
+function showCalendar() {
+    fetch('/calendar/events', { cache: 'no-cache' })
+        .then(response => response.json())
+        .then(data => {
+            if (data.error) {
+                handleError(data.error);
+                return;
+            }
+            const chatHistory = document.getElementById('chatHistory');
+            chatHistory.appendChild(renderCalendar(data.events));
+            trimRenderedMessages();
+            chatHistory.scrollTop = chatHistory.scrollHeight;
+        })
+        .catch(error => handleError(error.message));
+}
+
+function formatEventTime(iso) {
+    const [hours, minutes] = iso.slice(11, 16).split(':').map(Number);
+    const suffix = hours < 12 ? 'AM' : 'PM';
+    const hour12 = String(hours % 12 || 12).padStart(2, '0');
+    return `${hour12}:${String(minutes).padStart(2, '0')} ${suffix}`;
+}
+
+function renderCalendar(events) {
+    const message = document.createElement('div');
+    message.className = 'message ai';
+    if (!events.length) {
+        message.textContent = '🎉 Your calendar is clear!';
+        return message;
+    }
+
+    const view = document.createElement('div');
+    view.className = 'calendar-view';
+    view.appendChild(document.createTextNode('📅 Your Calendar'));
+    let dateBlock = null;
+    let currentDate = null;
+    for (const event of events) {
+        if (event.date !== currentDate) {
+            currentDate = event.date;
+            dateBlock = document.createElement('div');
+            dateBlock.className = 'calendar-date';
+            const heading = document.createElement('h3');
+            heading.textContent = new Date(`${event.date}T00:00:00`).toLocaleDateString('en-US', {
+                weekday: 'long', month: 'long', day: '2-digit', year: 'numeric'
+            });
+            dateBlock.appendChild(heading);
+            view.appendChild(dateBlock);
+        }
+
+        const row = document.createElement('div');
+        row.className = event.all_day ? 'calendar-event all-day' : 'calendar-event';
+        const icon = document.createElement('span');
+        icon.className = 'calendar-icon';
+        icon.textContent = event.all_day ? '📅' : '🕒';
+        row.appendChild(icon);
+        if (!event.all_day) {
+            const time = document.createElement('span');
+            time.className = 'event-time';
+            time.textContent = `${formatEventTime(event.start)} - ${formatEventTime(event.end)}`;
+            row.appendChild(time);
+        }
+        const title = document.createElement('span');
+        title.className = 'event-title';
+        const summary = document.createElement('strong');
+        summary.textContent = event.summary;
+        title.appendChild(summary);
+        if (event.all_day) {
+            title.appendChild(document.createTextNode(' (All day)'));
+        }
+        row.appendChild(title);
+        dateBlock.appendChild(row);
+    }
+    message.appendChild(view);
+    return message;
+}
+
+// Modify the existing speakResponse function
+function speakResponse(text) {
+    if ('speechSynthesis' in window && !isMuted) {
+        const utterance = new SpeechSynthesisUtterance(text);
+        speechSynthesis.speak(utterance);
+    }
+}
+
+function handleError(error) {
+    if (error.includes('authenticate')) {
+        document.getElementById('authPrompt').style.display = 'block';
+    }
+    // ... rest of error handling
+}
+
+function clearHistory() {
+    fetch('/clear', { method: 'POST' })
+        .then(() => location.reload());
+}
+
+function logoutUser() {
+    if (confirm('Are you sure you want to logout?')) {
+        window.location.href = '/logout';
+    }
+}
+
+// Update the form submission handler
+document.getElementById('preferencesForm').addEventListener('submit', async (e) => {
+    e.preventDefault();
+    
+    const formData = {
+        theme: document.getElementById('theme').value,
+        timezone: document.getElementById('timezone').value,
+        food_preferences: {
+            budget_per_meal: parseInt(document.getElementById('budget_per_meal').value),
+            dietary_restrictions: Array.from(document.getElementById('dietary_restrictions').selectedOptions).map(opt => opt.value),
+            cuisine_preferences: Array.from(document.getElementById('cuisine_preferences').selectedOptions).map(opt => opt.value)
+        },
+        travel_preferences: {
+            mode: document.getElementById('travel_mode').value,
+            max_travel_time: parseInt(document.getElementById('max_travel_time').value),
+            accommodation_budget: parseInt(document.getElementById('accommodation_budget').value),
+            preferred_airlines: Array.from(document.getElementById('preferred_airlines').selectedOptions).map(opt => opt.value),
+            home_location: document.getElementById('home_location').value.trim() || 'Denver'
+        }
+    };
+    
+    try {
+        const response = await fetch('/update_profile', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/x-www-form-urlencoded',
+            },
+            body: `preferences=${encodeURIComponent(JSON.stringify(formData))}`
+        });
+        
+        const result = await response.json();
+        if (result.success) {
+            alert('Preferences saved successfully!');
+        } else {
+            alert('Error saving preferences: ' + result.error);
+        }
+    } catch (error) {
+        alert('Error saving preferences: ' + error);
+    }
+});
+
+// Update the load preferences handler
+window.addEventListener('load', () => {
+    try {
+        // The template embeds the stored preferences as a JSON-encoded string
+        const prefsStr = JSON.parse(document.getElementById('savedPreferences').textContent || '""');
+        const savedPrefs = prefsStr ? JSON.parse(prefsStr) : {};
+        
+        if (!savedPrefs) {
+            console.warn('No preferences found, using defaults');
+            return;
+        }
+
+        // Load general preferences
+        document.getElementById('theme').value = savedPrefs.theme || 'light';
+        document.getElementById('timezone').value = savedPrefs.timezone || 'America/Denver';
+        
+        // Load food preferences
+        if (savedPrefs.food_preferences) {
+            document.getElementById('budget_per_meal').value = savedPrefs.food_preferences.budget_per_meal || 20;
+            setMultipleValues('dietary_restrictions', savedPrefs.food_preferences.dietary_restrictions || []);
+            setMultipleValues('cuisine_preferences', savedPrefs.food_preferences.cuisine_preferences || []);
+        }
+        
+        // Load travel preferences
+        if (savedPrefs.travel_preferences) {
+            document.getElementById('travel_mode').value = savedPrefs.travel_preferences.mode || 'driving';
+            document.getElementById('max_travel_time').value = savedPrefs.travel_preferences.max_travel_time || 60;
+            document.getElementById('accommodation_budget').value = savedPrefs.travel_preferences.accommodation_budget || 150;
+            setMultipleValues('preferred_airlines', savedPrefs.travel_preferences.preferred_airlines || []);
+            document.getElementById('home_location').value = savedPrefs.travel_preferences.home_location || 'Denver';
+        }
+    } catch (e) {
+        console.error('Error loading preferences:', e);
+        // Use default values if there's an error
+        setDefaultPreferences();
+    }
+});
+
+function setDefaultPreferences() {
+    document.getElementById('theme').value = 'light';
+    document.getElementById('timezone').value = 'America/Denver';
+    document.getElementById('budget_per_meal').value = 20;
+    document.getElementById('travel_mode').value = 'driving';
+    document.getElementById('max_travel_time').value = 60;
+    document.getElementById('accommodation_budget').value = 150;
+    document.getElementById('home_location').value = 'Denver';
+}
+
+function setMultipleValues(selectId, values) {
+    const select = document.getElementById(selectId);
+    for (const option of select.options) {
+        option.selected = values.includes(option.value);
+    }
+}
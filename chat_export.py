@@ -0,0 +1,95 @@
+import gzip
+import json
+import datetime
+from formatting import render_message
+
+# Rows fetched per round trip while exporting; memory stays flat however large the table is
+EXPORT_BATCH_SIZE = 5000
+# Rows inserted per executemany and committed per transaction while importing
+IMPORT_CHUNK_SIZE = 5000
+FIELDS = ('id', 'session_id', 'role', 'content', 'rendered', 'timestamp')
+
+def open_ndjson(path, mode='r'):
+    """Text file handle for an NDJSON file; `.gz` paths are (de)compressed on the fly"""
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+def export_lines(session, model, session_id=None, batch_size=EXPORT_BATCH_SIZE):
+    """NDJSON lines for every message (or one session's), oldest first.
+
+    Selects plain column tuples rather than ORM objects and streams them with
+    yield_per, so nothing is held beyond the current batch.
+    """
+    query = session.query(*(getattr(model, field) for field in FIELDS))
+    if session_id is not None:
+        query = query.filter(model.session_id == session_id)
+    for row in query.order_by(model.id).yield_per(batch_size):
+        record = dict(zip(FIELDS, row))
+        if record['timestamp'] is not None:
+            record['timestamp'] = record['timestamp'].isoformat()
+        yield json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+def render_imported(role, content):
+    """HTML for an imported message, rebuilt from its text.
+
+    No kind is passed, so a calendar view comes back as escaped text rather
+    than trusted HTML.
+    """
+    return str(render_message(role, content))
+
+def _row(line, number, session_id, keep_ids, trust_rendered):
+    try:
+        record = json.loads(line)
+        row = {
+            'session_id': session_id or record['session_id'],
+            'role': record['role'],
+            'content': record['content'],
+            'timestamp': datetime.datetime.fromisoformat(record['timestamp']) if record.get('timestamp') else None,
+        }
+        if not isinstance(row['content'], str):
+            raise TypeError("content is not a string")
+        if trust_rendered:
+            row['rendered'] = record.get('rendered')
+        else:
+            row['rendered'] = render_imported(row['role'], row['content'])
+        if keep_ids:
+            row['id'] = record['id']
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Line {number}: not a chat message record ({e})") from e
+    return row
+
+def import_lines(session, model, lines, session_id=None, keep_ids=False, chunk_size=IMPORT_CHUNK_SIZE,
+                 trust_rendered=False):
+    """Insert messages from NDJSON lines in chunked transactions; returns the number imported.
+
+    Each chunk is one executemany INSERT on the table, skipping ORM object
+    construction. `session_id` reassigns every message to that session.
+    Without `keep_ids` rows get fresh ids so they can't collide with existing
+    ones. Stored HTML is only kept with `trust_rendered` (an operator
+    restoring their own export); otherwise it is rebuilt from the text, so
+    an uploaded file can't inject markup. Chunks already committed stay if a
+    later line is malformed.
+    """
+    table = model.__table__
+    total = 0
+    chunk = []
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        chunk.append(_row(line, number, session_id, keep_ids, trust_rendered))
+        if len(chunk) >= chunk_size:
+            total += _insert(session, table, chunk)
+            chunk = []
+    if chunk:
+        total += _insert(session, table, chunk)
+    return total
+
+def _insert(session, table, rows):
+    try:
+        session.execute(table.insert(), rows)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    return len(rows)
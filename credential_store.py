@@ -0,0 +1,112 @@
+import json
+import time
+import logging
+import threading
+from lazy import lazy_import
+
+logger = logging.getLogger(__name__)
+
+Credentials = lazy_import('google.oauth2.credentials', 'Credentials')
+Request = lazy_import('google.auth.transport.requests', 'Request')
+
+# How long "this user has no credentials" is remembered before asking the database again
+MISSING_TTL_SECONDS = 15
+
+class CredentialStore:
+    """Per-user Google OAuth credentials, persisted through `load`/`save` and kept live in memory.
+
+    Requests read credentials from memory; the database is only touched on a
+    cold miss, after a refresh and when a user connects. Refreshing takes a
+    per-user lock and re-checks validity inside it, so a burst of requests
+    holding an expired token costs a single call to the token endpoint.
+    """
+
+    def __init__(self, load, save, delete=None, scopes=None):
+        self._load = load      # user_key -> token JSON string or None
+        self._save = save      # (user_key, token JSON string) -> None
+        self._delete = delete  # user_key -> None
+        self.scopes = scopes
+        self._credentials = {}
+        self._missing = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _user_lock(self, user_key):
+        with self._lock:
+            lock = self._locks.get(user_key)
+            if lock is None:
+                lock = self._locks[user_key] = threading.Lock()
+            return lock
+
+    def get(self, user_key):
+        """Stored credentials for a user, possibly expired, or None"""
+        if not user_key:
+            return None
+        credentials = self._credentials.get(user_key)
+        if credentials is not None:
+            return credentials
+        if time.monotonic() - self._missing.get(user_key, float('-inf')) < MISSING_TTL_SECONDS:
+            return None
+
+        with self._user_lock(user_key):
+            credentials = self._credentials.get(user_key)
+            if credentials is None:
+                token = self._load(user_key)
+                if token is None:
+                    self._missing[user_key] = time.monotonic()
+                    return None
+                credentials = Credentials.from_authorized_user_info(json.loads(token), self.scopes)
+                self._credentials[user_key] = credentials
+                self._missing.pop(user_key, None)
+            return credentials
+
+    def has(self, user_key):
+        return self.get(user_key) is not None
+
+    def valid(self, user_key):
+        """Credentials ready to use, refreshed first if they have expired; None if the user never connected"""
+        credentials = self.get(user_key)
+        if credentials is None or credentials.valid:
+            return credentials
+
+        with self._user_lock(user_key):
+            # Another request may have refreshed while this one waited
+            if credentials.valid:
+                return credentials
+            if not credentials.refresh_token:
+                logger.warning("Stored Google credentials cannot be refreshed; user must reconnect")
+                self.remove(user_key, locked=True)
+                return None
+            try:
+                credentials.refresh(Request())
+            except Exception:
+                # Keep the stored token; a transient failure shouldn't force a reconnect
+                self._credentials.pop(user_key, None)
+                raise
+            self._save(user_key, credentials.to_json())
+            return credentials
+
+    def put(self, user_key, credentials):
+        """Store credentials from a completed OAuth flow"""
+        with self._user_lock(user_key):
+            self._save(user_key, credentials.to_json())
+            self._credentials[user_key] = credentials
+            self._missing.pop(user_key, None)
+
+    def move(self, old_key, new_key):
+        """Re-key `old_key`'s credentials to `new_key`, unless `new_key` already has some"""
+        credentials = self.get(old_key)
+        if credentials is None or self.has(new_key):
+            return False
+        self.put(new_key, credentials)
+        self.remove(old_key)
+        return True
+
+    def remove(self, user_key, locked=False):
+        if not locked:
+            with self._user_lock(user_key):
+                return self.remove(user_key, locked=True)
+        self._credentials.pop(user_key, None)
+        self._missing[user_key] = time.monotonic()
+        if self._delete:
+            self._delete(user_key)
@@ -0,0 +1,195 @@
+import time
+import threading
+import hashlib
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import pytz
+from google_calendar import fetch_window, fetch_changes, event_bounds, SyncTokenExpired, acting_as, current_user
+
+CACHE_TTL_SECONDS = 300
+# Safety net if a push notification is ever lost
+PUSH_MAX_AGE_SECONDS = 6 * 3600
+DEFAULT_HORIZON = timedelta(days=90)
+MAX_CACHES = 1000  # Calendars kept in memory; the least recently used are dropped
+
+class EventCache:
+    """Events for one user's calendar window, pre-parsed into sorted intervals.
+
+    `version` only changes when the fetched events actually differ, so it can
+    key anything derived from the events (rendered views, ETags). While a
+    push channel is watching the calendar, entries stay valid until a
+    notification marks them dirty, and are then brought up to date with an
+    incremental sync instead of a full refetch. Fetches run as the cache's
+    user, so a sync started by a push notification needs no request context.
+    """
+
+    def __init__(self, calendar_id='primary', user_key=None, fetch=fetch_window,
+                 fetch_changes=fetch_changes, ttl=CACHE_TTL_SECONDS):
+        self.calendar_id = calendar_id
+        self.user_key = user_key
+        self._fetch = fetch
+        self._fetch_changes = fetch_changes
+        self._lock = threading.Lock()
+        self.ttl = ttl
+        self.time_min = None
+        self.time_max = None
+        self.fetched_at = 0.0
+        self.fingerprint = None
+        self.version = 0
+        self.sync_token = None
+        self.dirty = False
+        self.push_enabled = False
+        self.events = []
+        self.starts = []
+        self.ends = []
+        self.max_duration = 0.0
+
+    @property
+    def key(self):
+        return (self.user_key, self.calendar_id)
+
+    def is_fresh(self):
+        if self.dirty:
+            return False
+        max_age = PUSH_MAX_AGE_SECONDS if self.push_enabled else self.ttl
+        return time.monotonic() - self.fetched_at < max_age
+
+    def covers(self, time_min, time_max):
+        return (
+            self.time_min is not None
+            and self.time_min <= time_min
+            and time_max <= self.time_max
+        )
+
+    def invalidate(self):
+        with self._lock:
+            self.fetched_at = 0.0
+
+    def mark_dirty(self):
+        """Flag the cached window as stale, e.g. after a change notification"""
+        with self._lock:
+            self.dirty = True
+
+    def refresh(self, time_min, time_max):
+        """Fetch the window (widened to the default horizon) and re-index it"""
+        now = datetime.now(pytz.UTC)
+        time_min = min(time_min, now - timedelta(days=1))
+        time_max = max(time_max, now + DEFAULT_HORIZON)
+        with acting_as(self.user_key):
+            events, self.sync_token = self._fetch(time_min, time_max, self.calendar_id)
+        self.dirty = False
+        self._index(events, time_min, time_max)
+
+    def sync(self):
+        """Bring the cached window up to date, incrementally when possible"""
+        with self._lock:
+            if self.time_min is not None:
+                self._sync()
+
+    def _sync(self):
+        if not self.sync_token:
+            self.refresh(self.time_min, self.time_max)
+            return
+        try:
+            with acting_as(self.user_key):
+                changes, sync_token = self._fetch_changes(self.sync_token, self.calendar_id)
+        except SyncTokenExpired:
+            self.refresh(self.time_min, self.time_max)
+            return
+        
+        by_id = {event.get('id'): event for event in self.events}
+        for change in changes:
+            if change.get('status') == 'cancelled' or 'start' not in change:
+                by_id.pop(change.get('id'), None)
+            else:
+                by_id[change.get('id')] = change
+        self.sync_token = sync_token or self.sync_token
+        self.dirty = False
+        self._index(list(by_id.values()), self.time_min, self.time_max)
+
+    def _index(self, events, time_min, time_max):
+        min_ts, max_ts = time_min.timestamp(), time_max.timestamp()
+        bounds = []
+        for event in events:
+            if 'start' not in event or 'end' not in event:
+                continue
+            start_ts, end_ts = event_bounds(event)
+            # Incremental changes can land anywhere; keep only the window
+            if end_ts > min_ts and start_ts < max_ts:
+                bounds.append((start_ts, end_ts, event))
+        bounds.sort(key=lambda item: item[0])
+        digest = hashlib.sha1()
+        for _, _, event in bounds:
+            digest.update(f"{event.get('id')}:{event.get('etag', event.get('updated'))};".encode())
+        fingerprint = digest.hexdigest()
+
+        self.events = [item[2] for item in bounds]
+        self.starts = [item[0] for item in bounds]
+        self.ends = [item[1] for item in bounds]
+        self.max_duration = max((e - s for s, e in zip(self.starts, self.ends)), default=0.0)
+        self.time_min, self.time_max = time_min, time_max
+        self.fetched_at = time.monotonic()
+        if fingerprint != self.fingerprint:
+            self.fingerprint = fingerprint
+            self.version += 1
+
+    def _ensure(self, time_min, time_max):
+        if not self.covers(time_min, time_max):
+            if self.time_min is not None:
+                time_min, time_max = min(time_min, self.time_min), max(time_max, self.time_max)
+            self.refresh(time_min, time_max)
+        elif self.dirty:
+            self._sync()
+        elif not self.is_fresh():
+            self.refresh(self.time_min, self.time_max)
+
+    def ensure(self, time_min, time_max):
+        """Make sure the window is cached and fresh; returns the version"""
+        with self._lock:
+            self._ensure(time_min, time_max)
+            return self.version
+
+    def _span(self, start_ts, end_ts):
+        """Index range of events that can overlap [start_ts, end_ts)"""
+        lo = bisect_left(self.starts, start_ts - self.max_duration)
+        hi = bisect_right(self.starts, end_ts)
+        return lo, hi
+
+    def get_events(self, time_min, time_max):
+        """Events overlapping the window, ordered by start"""
+        with self._lock:
+            self._ensure(time_min, time_max)
+            start_ts, end_ts = time_min.timestamp(), time_max.timestamp()
+            lo, hi = self._span(start_ts, end_ts)
+            return [
+                self.events[i] for i in range(lo, hi)
+                if self.ends[i] > start_ts and self.starts[i] < end_ts
+            ]
+
+    def busy_intervals(self, time_min, time_max):
+        """(start_ts, end_ts) pairs overlapping the window, ordered by start"""
+        with self._lock:
+            self._ensure(time_min, time_max)
+            start_ts, end_ts = time_min.timestamp(), time_max.timestamp()
+            lo, hi = self._span(start_ts, end_ts)
+            return [
+                (self.starts[i], self.ends[i]) for i in range(lo, hi)
+                if self.ends[i] > start_ts and self.starts[i] < end_ts
+            ]
+
+_caches = OrderedDict()
+_caches_lock = threading.Lock()
+
+def get_event_cache(calendar_id='primary', user_key=None):
+    """Shared cache for a user's calendar (the acting user by default), created on first use"""
+    key = (user_key if user_key is not None else current_user(), calendar_id)
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = EventCache(calendar_id, key[0])
+            while len(_caches) > MAX_CACHES:
+                _caches.popitem(last=False)
+        else:
+            _caches.move_to_end(key)
+        return cache
@@ -0,0 +1,118 @@
+"""Which destinations fit a traveller's time and money limits.
+
+Distances, travel times and costs for every candidate are computed as
+whole-array NumPy operations, so ranking tens of thousands of places is a
+handful of vector passes rather than a Python loop.
+"""
+import math
+from functools import lru_cache
+from lazy import lazy_import
+from gazetteer import get_gazetteer
+from trip_planner import MODE_OVERHEAD_HOURS
+
+np = lazy_import('numpy')
+
+EARTH_RADIUS_KM = 6371.0
+# Door-to-door cruising speed for each mode
+SPEED_KMH = {'driving': 90, 'train': 110, 'transit': 60, 'flying': 750}
+# How much longer the actual route is than the great-circle distance
+ROUTE_FACTOR = {'driving': 1.25, 'train': 1.3, 'transit': 1.35, 'flying': 1.05}
+# Closer than this is the home town itself, not a trip
+MIN_DISTANCE_KM = 30
+# Extra score per 100% a place's lodging rate is over the nightly budget
+OVER_BUDGET_WEIGHT = 2.0
+DEFAULT_LIMIT = 10
+
+class Destinations:
+    """Candidate places as parallel arrays, with coordinates pre-converted to radians"""
+
+    def __init__(self, names, lats, lons, lodging):
+        self.names = list(names)
+        self.lat = np.radians(np.asarray(lats, dtype=np.float64))
+        self.lon = np.radians(np.asarray(lons, dtype=np.float64))
+        self.cos_lat = np.cos(self.lat)
+        self.lodging = np.asarray(lodging, dtype=np.float64)
+
+    @classmethod
+    def from_places(cls, places):
+        return cls(
+            [place.name for place in places],
+            [place.lat for place in places],
+            [place.lon for place in places],
+            [place.lodging for place in places]
+        )
+
+    def __len__(self):
+        return len(self.names)
+
+    def distances_km(self, lat, lon):
+        """Great-circle distance from one point (degrees) to every candidate"""
+        return haversine_km(math.radians(lat), math.radians(lon), self.lat, self.lon, self.cos_lat)
+
+def haversine_km(lat1, lon1, lat2, lon2, cos_lat2=None):
+    """Great-circle distance between points given in radians; any argument may be an array"""
+    if cos_lat2 is None:
+        cos_lat2 = np.cos(lat2)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * cos_lat2 * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+def distance_between(a, b):
+    """Great-circle km between two places"""
+    return float(haversine_km(math.radians(a.lat), math.radians(a.lon), math.radians(b.lat), math.radians(b.lon)))
+
+def travel_minutes(distance_km, mode):
+    """One-way door-to-door estimate; works on scalars and arrays alike.
+
+    Flyers are assumed to drive when that is quicker, as it is for short hops
+    once airport time is counted.
+    """
+    mode = mode if mode in SPEED_KMH else 'driving'
+    hours = distance_km * ROUTE_FACTOR[mode] / SPEED_KMH[mode] + MODE_OVERHEAD_HOURS.get(mode, 0)
+    if mode == 'flying':
+        return np.minimum(hours * 60, travel_minutes(distance_km, 'driving'))
+    return hours * 60
+
+def rank_destinations(destinations, home, mode='driving', max_minutes=60, budget=None, limit=DEFAULT_LIMIT):
+    """Best `limit` candidates reachable from `home` (lat, lon) within the time limit.
+
+    A candidate qualifies if its travel time is at most `max_minutes`.
+    Qualifying places are ordered by the share of the time and money
+    allowance they use, lowest first. A nightly `budget` is a soft limit:
+    places whose typical lodging rate is over it are penalised and flagged
+    `over_budget` rather than dropped, since the rates are rough estimates.
+    Returns dicts ready for JSON.
+    """
+    distance = destinations.distances_km(*home)
+    minutes = travel_minutes(distance, mode)
+    ok = (minutes <= max_minutes) & (distance >= MIN_DISTANCE_KM)
+    score = minutes / max_minutes
+    over_budget = np.zeros(len(destinations), dtype=bool)
+    if budget:
+        ratio = destinations.lodging / budget
+        score = score + ratio + OVER_BUDGET_WEIGHT * np.maximum(ratio - 1, 0)
+        over_budget = ratio > 1
+
+    candidates = np.flatnonzero(ok)
+    if len(candidates) > limit:
+        # Partial selection first; only the survivors get fully sorted
+        candidates = candidates[np.argpartition(score[candidates], limit)[:limit]]
+    candidates = candidates[np.argsort(score[candidates], kind='stable')]
+    return [
+        {
+            'name': destinations.names[i],
+            'distance_km': round(float(distance[i])),
+            'travel_minutes': round(float(minutes[i])),
+            'lodging': round(float(destinations.lodging[i])),
+            'over_budget': bool(over_budget[i]),
+        }
+        for i in candidates
+    ]
+
+@lru_cache(maxsize=None)
+def get_destinations():
+    """Every gazetteer place as a candidate table; built once"""
+    return Destinations.from_places(get_gazetteer().places)
+
+def format_duration(minutes):
+    hours, minutes = divmod(int(round(minutes)), 60)
+    return f"{hours}h {minutes:02d}m" if hours else f"{minutes}m"
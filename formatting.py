@@ -0,0 +1,52 @@
+import re
+from markupsafe import Markup, escape
+
+KIND_TEXT = 'text'
+KIND_TRAVEL = 'travel'
+KIND_CALENDAR = 'calendar'
+
+TRAVEL_HEADERS = ("🌍 Trip to", "🌍 Travel Plan", "🌍 Trip ideas")
+
+# Line prefix -> CSS class in a travel plan; checked in order
+TRAVEL_LINE_CLASSES = (
+    ('✈️', 'travel-mode'),
+    ('💰', 'budget'),
+    ('⏱️', 'time'),
+)
+BULLET = re.compile(r"^(?:- |• )")
+
+def detect_kind(content):
+    """Guess how a stored message's text should be formatted.
+
+    Never KIND_CALENDAR: that content is inserted as HTML, so only the
+    calendar view that generated it may say so.
+    """
+    if content.startswith(TRAVEL_HEADERS):
+        return KIND_TRAVEL
+    return KIND_TEXT
+
+def render_travel_plan(content):
+    lines = []
+    for line in content.split('\n'):
+        if BULLET.match(line):
+            lines.append(f"<div class=\"date-option\">{escape(line[2:])}</div>")
+            continue
+        css_class = next((cls for prefix, cls in TRAVEL_LINE_CLASSES if line.startswith(prefix)), 'text')
+        lines.append(f"<div class=\"{css_class}\">{escape(line)}</div>")
+    return f"<div class=\"travel-plan\">{''.join(lines)}</div>"
+
+def render_text(content):
+    return str(escape(content)).replace('\n', '<br>')
+
+RENDERERS = {
+    KIND_TEXT: render_text,
+    KIND_TRAVEL: render_travel_plan,
+    # Calendar views are generated by calendar_view and are already HTML
+    KIND_CALENDAR: lambda content: f"<div class=\"calendar-view\">{content}</div>",
+}
+
+def render_message(role, content, kind=None):
+    """HTML for a chat message, computed once when the message is stored"""
+    if role == 'user':
+        return Markup(render_text(content))
+    return Markup(RENDERERS[kind or detect_kind(content)](content))
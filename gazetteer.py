@@ -0,0 +1,274 @@
+"""Destination lookup against a local place-name list (data/places.tsv).
+
+Every place name and alias is compiled into one word-level Aho-Corasick
+automaton, so all known places in a message, including multi-word ones like
+"new york" or "salt lake city", are found in a single pass over its words.
+Words the automaton doesn't know are checked against the place vocabulary
+at edit distance 1 ("denvr" -> "denver") before matching.
+"""
+import os
+import re
+import time
+import logging
+import unicodedata
+from array import array
+from collections import deque
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+PLACES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'places.tsv')
+
+WORD = re.compile(r"[a-z0-9]+")
+# Words after which a place name is most likely the destination
+CUES = frozenset(('to', 'in', 'visit', 'visiting', 'at', 'for', 'around', 'explore', 'see'))
+# Cue words that on their own say the place is where the trip goes
+TRAVEL_CUES = frozenset(('visit', 'visiting', 'explore'))
+# Words that make a following "to"/"in" cue a travel one ("trip to", "fly to")
+TRAVEL_WORDS = frozenset((
+    'trip', 'travel', 'traveling', 'travelling', 'go', 'going', 'fly', 'flying', 'drive', 'driving',
+    'head', 'heading', 'headed', 'vacation', 'holiday', 'getaway', 'move', 'moving'
+))
+# Shorter words are too likely to be ordinary English ("home" -> "rome")
+FUZZY_MIN_LENGTH = 5
+TOKEN_BITS = 20  # Transition keys pack (state, word id) into one int
+
+class Place:
+    __slots__ = ('name', 'region', 'country', 'lat', 'lon', 'population', 'lodging')
+
+    def __init__(self, name, region, country, lat, lon, population, lodging):
+        self.name = name
+        self.region = region
+        self.country = country
+        self.lat = lat
+        self.lon = lon
+        self.population = population
+        self.lodging = lodging  # Typical mid-range nightly rate, USD
+
+    def __repr__(self):
+        return f"Place({self.name!r}, {self.country})"
+
+class Match:
+    __slots__ = ('place', 'start', 'end', 'fuzzy', 'cued', 'travel')
+
+    def __init__(self, place, start, end, fuzzy, cued, travel=False):
+        self.place = place
+        self.start = start  # Character offsets of the matched text in the message
+        self.end = end
+        self.fuzzy = fuzzy
+        self.cued = cued
+        self.travel = travel  # Cued by a travel phrase ("trip to", "visit")
+
+def normalize(text):
+    """Lower-case and strip accents, so "Zürich" and "zurich" are the same words"""
+    if text.isascii():
+        return text.lower()
+    text = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(c for c in text if not unicodedata.combining(c))
+
+def load_places(path=PLACES_FILE):
+    """(places, phrases) from the TSV: phrases pairs each name or alias with its place's index"""
+    places = []
+    phrases = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.startswith('#') or not line.strip():
+                continue
+            name, region, country, lat, lon, population, lodging, aliases = line.rstrip('\n').split('\t')
+            index = len(places)
+            places.append(Place(name, region or None, country, float(lat), float(lon), int(population), int(lodging)))
+            phrases.append((name, index))
+            phrases.extend((alias, index) for alias in aliases.split('|') if alias)
+    return places, phrases
+
+class Gazetteer:
+    """Word-level Aho-Corasick automaton over place names and aliases.
+
+    States are ints; transitions live in one dict keyed by
+    `state << TOKEN_BITS | word id`, and failure links, output links and
+    terminal places are flat arrays indexed by state.
+    """
+
+    def __init__(self, places, phrases):
+        self.places = places
+        self.vocabulary = {}  # word -> id, ids start at 1
+        self._goto = {}
+        depth = array('H', [0])
+        terminal = array('i', [-1])
+
+        for phrase, index in phrases:
+            state = 0
+            for word in WORD.findall(normalize(phrase)):
+                token = self.vocabulary.setdefault(word, len(self.vocabulary) + 1)
+                key = state << TOKEN_BITS | token
+                if key not in self._goto:
+                    self._goto[key] = len(depth)
+                    depth.append(depth[state] + 1)
+                    terminal.append(-1)
+                state = self._goto[key]
+            # A phrase shared by several places ("portland") goes to the most populous
+            current = terminal[state]
+            if current < 0 or places[index].population > places[current].population:
+                terminal[state] = index
+
+        self._depth = depth
+        self._terminal = terminal
+        self._fail, self._output = self._link(len(depth))
+        self._deletions = self._deletion_index()
+        # Messages repeat the same unknown words ("tomorrow", "december"); remember the answer
+        self.correct = lru_cache(maxsize=4096)(self.correct)
+
+    def _link(self, size):
+        """Breadth-first failure links, plus output links to the nearest terminal suffix state"""
+        children = [[] for _ in range(size)]
+        for key, child in self._goto.items():
+            children[key >> TOKEN_BITS].append((key & ((1 << TOKEN_BITS) - 1), child))
+        fail = array('i', [0]) * size
+        output = array('i', [-1]) * size
+        queue = deque(child for _, child in children[0])
+        while queue:
+            state = queue.popleft()
+            for token, child in children[state]:
+                link = fail[state]
+                while link and (link << TOKEN_BITS | token) not in self._goto:
+                    link = fail[link]
+                target = self._goto.get(link << TOKEN_BITS | token, 0)
+                fail[child] = target if target != child else 0
+                output[child] = fail[child] if self._terminal[fail[child]] >= 0 else output[fail[child]]
+                queue.append(child)
+        return fail, output
+
+    def _deletion_index(self):
+        """Every single-character deletion of each vocabulary word -> the words it came from"""
+        index = {}
+        for word in self.vocabulary:
+            if len(word) < FUZZY_MIN_LENGTH - 1:
+                continue
+            for variant in {word[:i] + word[i + 1:] for i in range(len(word))} | {word}:
+                index.setdefault(variant, []).append(word)
+        return index
+
+    def correct(self, word):
+        """The vocabulary word within one edit of `word`, or None"""
+        if len(word) < FUZZY_MIN_LENGTH:
+            return None
+        candidates = set(self._deletions.get(word, ()))
+        for i in range(len(word)):
+            candidates.update(self._deletions.get(word[:i] + word[i + 1:], ()))
+        best = None
+        for candidate in candidates:
+            if _within_one_edit(word, candidate) and (best is None or candidate < best):
+                best = candidate
+        return best
+
+    def find_all(self, message):
+        """Every known place mentioned in `message`, in order of appearance"""
+        goto, fail, output, terminal, depth = self._goto, self._fail, self._output, self._terminal, self._depth
+        text = normalize(message)
+        words = WORD.findall(text)
+        tokens = [self.vocabulary.get(word, 0) for word in words]
+        fuzzy = set()
+        for position, token in enumerate(tokens):
+            if not token and len(words[position]) >= FUZZY_MIN_LENGTH:
+                correction = self.correct(words[position])
+                if correction:
+                    tokens[position] = self.vocabulary[correction]
+                    fuzzy.add(position)
+
+        hits = []
+        state = 0
+        for position, token in enumerate(tokens):
+            if not token:
+                # No place contains this word, so every partial match ends here
+                state = 0
+                continue
+            while state and (state << TOKEN_BITS | token) not in goto:
+                state = fail[state]
+            state = goto.get(state << TOKEN_BITS | token, 0)
+            hit = state if terminal[state] >= 0 else output[state]
+            while hit > 0:
+                hits.append((position - depth[hit] + 1, position, terminal[hit]))
+                hit = output[hit]
+        if not hits:
+            return []
+
+        # Character offsets are only worked out when something matched
+        spans = [word.span() for word in WORD.finditer(text)]
+        matches = [
+            Match(
+                self.places[place], spans[first][0], spans[last][1],
+                not fuzzy.isdisjoint(range(first, last + 1)),
+                first > 0 and words[first - 1] in CUES,
+                _travel_cued(words, first)
+            )
+            for first, last, place in hits
+        ]
+        matches.sort(key=lambda m: (m.start, -m.end))
+        # An alias inside a longer name for the same place ("salt lake" in "salt lake city") adds nothing
+        return [
+            m for i, m in enumerate(matches)
+            if not any(o.place is m.place and o.start <= m.start and m.end <= o.end for o in matches[:i])
+        ]
+
+    def best(self, message):
+        """The match most likely naming the destination, or None.
+
+        A place right after a cue word ("to", "in", "visit") wins over one
+        without, and among those a travel cue ("trip to", "visit") wins over
+        a plain one, then the earliest: in "trip to Paris with a layover in
+        London" the destination is Paris. Without any cue the longest name,
+        exact over fuzzy, then the most populous is taken. A fuzzy match
+        only counts after a cue word; elsewhere a near-miss is more likely
+        an ordinary word ("parks") than a misspelt place.
+        """
+        matches = [m for m in self.find_all(message) if m.cued or not m.fuzzy]
+        if not matches:
+            return None
+        cued = [m for m in matches if m.cued]
+        if cued:
+            return min(cued, key=lambda m: (not m.travel, m.start, m.start - m.end, m.fuzzy))
+        return max(matches, key=lambda m: (m.end - m.start, not m.fuzzy, m.place.population))
+
+    def resolve(self, message):
+        match = self.best(message)
+        return match.place if match else None
+
+def _travel_cued(words, first):
+    """Whether the place starting at word `first` follows a travel phrase"""
+    if first == 0:
+        return False
+    cue = words[first - 1]
+    if cue in TRAVEL_CUES:
+        return True
+    return cue in CUES and first > 1 and words[first - 2] in TRAVEL_WORDS
+
+def _within_one_edit(a, b):
+    """Levenshtein distance <= 1, or a single adjacent transposition"""
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    if len(a) == len(b):
+        return a[i + 1:] == b[i + 1:] or (a[i + 2:] == b[i + 2:] and a[i:i + 2] == b[i + 1::-1][:2])
+    return a[i:] == b[i + 1:]
+
+@lru_cache(maxsize=None)
+def get_gazetteer(path=PLACES_FILE):
+    start = time.perf_counter()
+    gazetteer = Gazetteer(*load_places(path))
+    logger.info("Loaded %d places into the gazetteer in %.1fms",
+                len(gazetteer.places), (time.perf_counter() - start) * 1000)
+    return gazetteer
+
+def match_destination(message):
+    """Best-guess destination Match in `message`; offsets index into normalize(message)"""
+    return get_gazetteer().best(message)
+
+def resolve_destination(message):
+    """Best-guess destination Place named in `message`, or None"""
+    return get_gazetteer().resolve(message)
@@ -1,65 +1,149 @@
-import os
+import json
+import hashlib
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
 from datetime import datetime, timedelta
-import dateparser
+from itertools import islice
 import re
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 import pytz
+from lazy import lazy_import
+from overlaps import find_overlaps
+from instrumentation import timed
+from tracing import traced
+from gazetteer import match_destination, normalize
+
+logger = logging.getLogger(__name__)
+
+# Heavy SDKs, imported the first time they are used rather than at startup
+dateparser = lazy_import('dateparser')
+discovery = lazy_import('googleapiclient.discovery')
+discovery_cache = lazy_import('googleapiclient.discovery_cache')
 
 SCOPES = ["https://www.googleapis.com/auth/calendar"]
-TOKEN_PATH = "token.json"
 
-def get_calendar_service(credentials_path="credentials.json"):
-    creds = None
-    if os.path.exists(TOKEN_PATH):
-        creds = Credentials.from_authorized_user_file(TOKEN_PATH, SCOPES)
-    
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file(
-                credentials_path, SCOPES)
-            creds = flow.run_local_server(port=0)
-        
-        with open(TOKEN_PATH, "w") as token:
-            token.write(creds.to_json())
-    
-    return build("calendar", "v3", credentials=creds)
+class NotAuthenticated(Exception):
+    """The acting user has not connected a Google Calendar"""
+
+# user_key -> usable Credentials or None; installed by the app (see credential_store)
+credentials_provider = None
+_acting_user = ContextVar('calendar_user', default=None)
+
+def set_credentials_provider(provider):
+    global credentials_provider
+    credentials_provider = provider
+
+def current_user():
+    return _acting_user.get()
+
+def set_acting_user(user_key):
+    """Act as `user_key` until reset_acting_user(token); for request hooks"""
+    return _acting_user.set(user_key)
+
+def reset_acting_user(token):
+    _acting_user.reset(token)
+
+@contextmanager
+def acting_as(user_key):
+    """Make Calendar calls in the block with `user_key`'s credentials"""
+    token = set_acting_user(user_key)
+    try:
+        yield
+    finally:
+        reset_acting_user(token)
+
+def get_calendar_service():
+    """Calendar client authorized as the acting user"""
+    user_key = _acting_user.get()
+    credentials = credentials_provider(user_key) if credentials_provider and user_key else None
+    if credentials is None:
+        raise NotAuthenticated("Connect your Google Calendar first")
+    return build_calendar_service(credentials)
+
+@lru_cache(maxsize=None)
+def calendar_discovery_document():
+    """Calendar v3 discovery document bundled with the client library, parsed once"""
+    return json.loads(discovery_cache.get_static_doc("calendar", "v3"))
 
-def create_event(summary, start_time, is_all_day=False):
-    """Create a calendar event"""
+def build_calendar_service(credentials=None, developer_key=None):
+    """Calendar client built from the cached document, skipping a discovery read and parse per call"""
+    return discovery.build_from_document(
+        calendar_discovery_document(), credentials=credentials, developerKey=developer_key
+    )
+
+def create_event(summary, start_time, end_time=None, description="", location="", is_all_day=False, event_id=None):
+    """Create a calendar event.
+
+    With an `event_id` the insert is idempotent: if a previous attempt already
+    created the event, that event is returned instead of a duplicate.
+    """
     service = get_calendar_service()
-    
-    # Set end time to 1 hour after start if not all-day
-    end_time = start_time + timedelta(hours=1)
-    
-    event = {
-        'summary': summary,
-        'start': {
-            'dateTime': start_time.isoformat(),
-            'timeZone': 'America/Denver',
-        },
-        'end': {
-            'dateTime': end_time.isoformat(),
-            'timeZone': 'America/Denver',
-        },
-    }
-    
-    if is_all_day:
-        event['start'] = {'date': start_time.date().isoformat()}
-        event['end'] = {'date': end_time.date().isoformat()}
+    body = build_event_body(summary, start_time, end_time, description, location, is_all_day)
+    if event_id:
+        body['id'] = event_id
     
     try:
-        created_event = service.events().insert(calendarId='primary', body=event).execute()
+        with timed('google_calendar', 'events.insert'):
+            created_event = service.events().insert(calendarId='primary', body=body).execute()
         return created_event
+    except HttpError as error:
+        if event_id and is_duplicate(error):
+            with timed('google_calendar', 'events.get'):
+                return service.events().get(calendarId='primary', eventId=event_id).execute()
+        logger.exception("Failed to create event")
+        return None
     except Exception as e:
-        print(f"Failed to create event: {str(e)}")
+        logger.exception("Failed to create event")
         return None
 
+def event_id(key, index=0):
+    """Stable Calendar event id for one event of a retryable write.
+
+    Hex digits are valid base32hex, which is what the API accepts for
+    client-supplied ids.
+    """
+    return hashlib.sha1(f"{key}:{index}".encode()).hexdigest()
+
+def is_duplicate(error):
+    """Whether an insert failed because an event with its id already exists"""
+    return isinstance(error, HttpError) and error.resp.status == 409
+
+def build_event_body(summary, start_time, end_time=None, description="", location="", is_all_day=False):
+    """Build an events().insert body; all-day end dates are exclusive"""
+    if is_all_day:
+        start_date = start_time.date() if isinstance(start_time, datetime) else start_time
+        if end_time is None:
+            end_date = start_date + timedelta(days=1)
+        else:
+            end_date = end_time.date() if isinstance(end_time, datetime) else end_time
+        event = {
+            'summary': summary,
+            'start': {'date': start_date.isoformat()},
+            'end': {'date': end_date.isoformat()},
+        }
+    else:
+        # Set end time to 1 hour after start if not given
+        end_time = end_time or start_time + timedelta(hours=1)
+        event = {
+            'summary': summary,
+            'start': {
+                'dateTime': start_time.isoformat(),
+                'timeZone': 'America/Denver',
+            },
+            'end': {
+                'dateTime': end_time.isoformat(),
+                'timeZone': 'America/Denver',
+            },
+        }
+    
+    if description:
+        event['description'] = description
+    if location:
+        event['location'] = location
+    return event
+
 def parse_natural_datetime(time_str):
     """Parse natural language date/time expressions"""
     settings = {
@@ -87,6 +171,7 @@ def parse_natural_datetime(time_str):
     
     return parsed_date
 
+@traced()
 def parse_event_details(message):
     """Enhanced event parsing with natural language support"""
     try:
@@ -133,10 +218,20 @@ def parse_event_details(message):
                     }
         
         # Check for trip planning with natural dates
-        trip_pattern = r"(?:plan|add) (?:a |an )?trip to (.+?)(?: from| on| for| starting)? (.+?)?(?: to | until | through )(.+)?"
-        trip_match = re.search(trip_pattern, msg_lower)
+        # The end date stops at a following clause ("... to jan 5 to visit denver")
+        trip_pattern = (
+            r"(?:plan|add) (?:a |an )?trip to (.+?)(?: from| on| for| starting)? (.+?)?"
+            r"(?: to | until | through )(.+?)?(?= (?:to|for|and|with) |[.!?]?$)"
+        )
+        trip_text = msg_lower
+        destination = match_destination(message) if 'trip to' in msg_lower else None
+        if destination:
+            # Stand a single word in for the place so a multi-word name can't spill into the dates
+            text = normalize(message)
+            trip_text = text[:destination.start] + 'destination' + text[destination.end:]
+        trip_match = re.search(trip_pattern, trip_text)
         if trip_match:
-            location = trip_match.group(1).strip()
+            location = destination.place.name if destination else trip_match.group(1).strip().title()
             start_str = trip_match.group(2)
             end_str = trip_match.group(3)
             
@@ -146,7 +241,7 @@ def parse_event_details(message):
             
             return {
                 "type": "trip_planning",
-                "location": location.title(),
+                "location": location,
                 "start_date": start_date,
                 "end_date": end_date,
                 "is_all_day": True
@@ -155,24 +250,129 @@ def parse_event_details(message):
         # ... rest of existing parsing code ...
         
     except Exception as e:
-        print(f"Parse error: {str(e)}")
+        logger.warning("Could not parse event details: %s", e)
         return None
 
+EVENT_PAGE_SIZE = 250  # Largest page events().list will return
+# Partial response: only the fields the app reads, which keeps pages small
+EVENT_FIELDS = "nextPageToken,items(id,etag,status,summary,location,start,end)"
+SYNC_FIELDS = "nextPageToken,nextSyncToken,items(id,etag,status,summary,location,start,end)"
+
+class SyncTokenExpired(Exception):
+    """The sync token was rejected (HTTP 410); a full sync is needed"""
+
+def iter_events(time_min=None, time_max=None, calendar_id='primary',
+                page_size=EVENT_PAGE_SIZE, fields=EVENT_FIELDS,
+                ordered=True, sync_state=None):
+    """Yield events in [time_min, time_max) page by page, ordered by start.
+
+    Pages are only requested as the caller consumes them, so stopping early
+    skips the remaining round trips and nothing beyond one page is held.
+    When `sync_state` is a dict, the last page's nextSyncToken is stored in it.
+    An HttpError on any page propagates: ending quietly would pass a partial
+    listing off as the whole window.
+    """
+    service = get_calendar_service()
+    params = {
+        'calendarId': calendar_id,
+        'singleEvents': True,
+        'maxResults': page_size,
+        'fields': fields
+    }
+    if ordered:
+        params['orderBy'] = 'startTime'
+    if time_min is not None:
+        params['timeMin'] = time_min.isoformat()
+    if time_max is not None:
+        params['timeMax'] = time_max.isoformat()
+    
+    page_token = None
+    while True:
+        with timed('google_calendar', 'events.list'):
+            result = service.events().list(pageToken=page_token, **params).execute()
+        yield from result.get('items', [])
+        page_token = result.get('nextPageToken')
+        if not page_token:
+            if sync_state is not None:
+                sync_state['sync_token'] = result.get('nextSyncToken')
+            break
+
+def fetch_window(time_min, time_max, calendar_id='primary'):
+    """All events in a window plus a sync token for later incremental syncs"""
+    # Sync tokens are not issued for ordered listings
+    sync_state = {}
+    events = list(iter_events(
+        time_min, time_max, calendar_id,
+        fields=SYNC_FIELDS, ordered=False, sync_state=sync_state
+    ))
+    return events, sync_state.get('sync_token')
+
+def fetch_changes(sync_token, calendar_id='primary'):
+    """Events changed since the sync token, cancelled ones included, and the next token"""
+    service = get_calendar_service()
+    changes = []
+    page_token = None
+    while True:
+        try:
+            with timed('google_calendar', 'events.sync'):
+                result = service.events().list(
+                    calendarId=calendar_id,
+                    syncToken=sync_token,
+                    singleEvents=True,
+                    maxResults=EVENT_PAGE_SIZE,
+                    pageToken=page_token,
+                    fields=SYNC_FIELDS
+                ).execute()
+        except HttpError as error:
+            if error.resp.status == 410:
+                raise SyncTokenExpired() from error
+            raise
+        changes.extend(result.get('items', []))
+        page_token = result.get('nextPageToken')
+        if not page_token:
+            return changes, result.get('nextSyncToken')
+
 def get_events(max_results=10):
-    try:
-        service = get_calendar_service()
-        now = datetime.utcnow().isoformat() + 'Z'
-        events_result = service.events().list(
-            calendarId='primary',
-            timeMin=now,
-            maxResults=max_results,
-            singleEvents=True,
-            orderBy='startTime'
-        ).execute()
-        return events_result.get('items', [])
-    except HttpError as error:
-        print(f"Error fetching events: {error}")
-        return []
+    now = datetime.now(pytz.UTC)
+    return list(islice(
+        iter_events(time_min=now, page_size=min(max_results, EVENT_PAGE_SIZE)),
+        max_results
+    ))
+
+FREEBUSY_MAX_CALENDARS = 50  # API limit on items per freebusy query
+
+class CalendarUnavailable(Exception):
+    """Busy times couldn't be read, so free time can't be known"""
+
+def get_busy_intervals(calendar_ids, time_min, time_max):
+    """Busy (start, end) datetimes per calendar from one freebusy query.
+
+    Only calendars beyond the API's per-request limit cost an extra round trip.
+    Raises CalendarUnavailable if the query or any calendar in it fails;
+    reporting that calendar as empty would show its busy time as free.
+    """
+    busy = {calendar_id: [] for calendar_id in calendar_ids}
+    service = get_calendar_service()
+    for i in range(0, len(calendar_ids), FREEBUSY_MAX_CALENDARS):
+        chunk = calendar_ids[i:i + FREEBUSY_MAX_CALENDARS]
+        try:
+            with timed('google_calendar', 'freebusy.query'):
+                result = service.freebusy().query(body={
+                    'timeMin': time_min.isoformat(),
+                    'timeMax': time_max.isoformat(),
+                    'items': [{'id': calendar_id} for calendar_id in chunk]
+                }).execute()
+        except HttpError as error:
+            raise CalendarUnavailable(f"Free/busy query failed: {error}") from error
+        for calendar_id, info in result.get('calendars', {}).items():
+            if info.get('errors'):
+                reasons = ', '.join(e.get('reason', 'unknown') for e in info['errors'])
+                raise CalendarUnavailable(f"Couldn't read calendar {calendar_id}: {reasons}")
+            busy[calendar_id] = [
+                (datetime.fromisoformat(period['start']), datetime.fromisoformat(period['end']))
+                for period in info.get('busy', [])
+            ]
+    return busy
 
 def parse_datetime(iso_str):
     try:
@@ -189,41 +389,42 @@ def parse_iso_time(iso_str):
         dt = dt.replace(tzinfo=pytz.UTC)
     return dt
 
+def event_bounds(event, tz_name='America/Denver'):
+    """Start/end of an event as UTC timestamps; all-day dates are local midnights"""
+    start, end = event['start'], event['end']
+    if 'dateTime' in start:
+        return (
+            datetime.fromisoformat(start['dateTime']).timestamp(),
+            datetime.fromisoformat(end['dateTime']).timestamp()
+        )
+    tz = pytz.timezone(tz_name)
+    return (
+        tz.localize(datetime.fromisoformat(start['date'])).timestamp(),
+        tz.localize(datetime.fromisoformat(end['date'])).timestamp()
+    )
+
 def check_overlapping_events(events):
     # Filter out placeholder events first
     valid_events = [e for e in events if is_valid_event(e)]
-    # Convert events to comparable datetime objects
-    parsed_events = []
-    for event in valid_events:
-        start = event['start'].get('dateTime', event['start'].get('date'))
-        end = event['end'].get('dateTime', event['end'].get('date'))
-        parsed_events.append({
-            'summary': event['summary'],
-            'start': parse_iso_time(start),
-            'end': parse_iso_time(end)
-        })
+    bounds = [event_bounds(event) for event in valid_events]
+    starts = [start for start, _ in bounds]
+    ends = [end for _, end in bounds]
     
-    # Ensure all datetimes are timezone-aware
-    utc = pytz.UTC
-    for event in parsed_events:
-        if event['start'].tzinfo is None:
-            event['start'] = event['start'].replace(tzinfo=utc)
-        if event['end'].tzinfo is None:
-            event['end'] = event['end'].replace(tzinfo=utc)
+    pairs = find_overlaps(starts, ends)
+    if not pairs:
+        return []
     
-    # Sort by start time
-    sorted_events = sorted(parsed_events, key=lambda x: x['start'])
+    # Format each event's times once rather than once per clash
+    local_tz = pytz.timezone('America/Denver')
+    start_labels = [datetime.fromtimestamp(ts, local_tz).strftime('%I:%M %p') for ts in starts]
+    end_labels = [datetime.fromtimestamp(ts, local_tz).strftime('%I:%M %p') for ts in ends]
     
     overlaps = []
-    for i in range(len(sorted_events)-1):
-        current = sorted_events[i]
-        next_evt = sorted_events[i+1]
-        
-        if current['end'] > next_evt['start']:
-            overlaps.append(
-                f"⏳ **{current['summary']}** (until {current['end'].strftime('%I:%M %p')}) "
-                f"clashes with **{next_evt['summary']}** (starts {next_evt['start'].strftime('%I:%M %p')})"
-            )
+    for i, j in pairs:
+        overlaps.append(
+            f"⏳ **{valid_events[i]['summary']}** (until {end_labels[i]}) "
+            f"clashes with **{valid_events[j]['summary']}** (starts {start_labels[j]})"
+        )
     
     return overlaps 
 
@@ -252,6 +453,13 @@ def format_event(event):
         f"_{start_dt.astimezone(pytz.timezone('America/Denver')).strftime('%a, %b %d %Y')}_"
     ) 
 
+def local_day_bounds(target_date, tz_name='America/Denver'):
+    """Local midnight-to-midnight window containing the target date"""
+    tz = pytz.timezone(tz_name)
+    day = target_date.astimezone(tz).date() if isinstance(target_date, datetime) else target_date
+    day_start = tz.localize(datetime.combine(day, datetime.min.time()))
+    return day_start, tz.localize(datetime.combine(day + timedelta(days=1), datetime.min.time()))
+
 def check_availability(target_date, events):
     """Check if user is free on a specific date"""
     mst = pytz.timezone('America/Denver')
@@ -278,19 +486,4 @@ def check_availability(target_date, events):
 
 def get_events_at_time(start_time, end_time):
     """Get events overlapping with a time range"""
-    try:
-        service = get_calendar_service()
-        time_min = start_time.isoformat()
-        time_max = end_time.isoformat()
-        
-        events_result = service.events().list(
-            calendarId='primary',
-            timeMin=time_min,
-            timeMax=time_max,
-            singleEvents=True,
-            orderBy='startTime'
-        ).execute()
-        return events_result.get('items', [])
-    except HttpError as error:
-        print(f"Error checking conflicts: {error}")
-        return []
\ No newline at end of file
+    return list(iter_events(start_time, end_time))
@@ -0,0 +1,50 @@
+import os
+
+def cpu_count():
+    """CPUs this process may run on, which respects container CPU pinning"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+# Threads per worker; requests mostly wait on Calendar/OpenAI/Airtable
+THREADS_PER_WORKER = 4
+# The database pool's pool_size plus max_overflow; more threads would queue for a connection
+MAX_THREADS = 12
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+default_workers = cpu_count() * 2 + 1
+# Calendar push channels (calendar_sync) and the event caches they keep fresh
+# live in process memory, and Google delivers a notification to whichever
+# worker accepts it: with several workers, channels opened elsewhere 404 and
+# the owner's cache stays stale. So push runs in one worker, which takes the
+# same concurrency as threads. Without push, per-session /chat single-flight
+# holds only within a worker; the job queue is database-backed either way.
+push_enabled = bool(os.getenv('CALENDAR_WEBHOOK_URL'))
+if push_enabled:
+    workers = 1
+    threads = int(os.getenv('GUNICORN_THREADS', min(default_workers * THREADS_PER_WORKER, MAX_THREADS)))
+else:
+    workers = int(os.getenv('WEB_CONCURRENCY', default_workers))
+    threads = int(os.getenv('GUNICORN_THREADS', THREADS_PER_WORKER))
+worker_class = 'gthread'
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+graceful_timeout = 30
+keepalive = 5
+
+# Import the app and run the shared warm-up once in the master; workers fork from it
+preload_app = True
+
+def post_fork(server, worker):
+    """Per-worker warm-up, done before the worker starts accepting connections"""
+    import warmup
+    from wsgi import app, db
+    pool_size = app.config['SQLALCHEMY_ENGINE_OPTIONS']['pool_size']
+    warmup.warm_worker(app, db, connections=min(threads, pool_size))
+
+def when_ready(server):
+    if push_enabled and int(os.getenv('WEB_CONCURRENCY', '1')) > 1:
+        server.log.warning(
+            "Ignoring WEB_CONCURRENCY=%s: calendar push is enabled, which needs a single worker "
+            "(see gunicorn.conf.py)", os.getenv('WEB_CONCURRENCY')
+        )
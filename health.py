@@ -0,0 +1,59 @@
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+HEALTH_CHECK_INTERVAL_SECONDS = 300
+
+_checks = {}
+_status = {}
+_lock = threading.Lock()
+_started = False
+
+def register(name, probe, hint=None):
+    """Add a connectivity probe; it runs in the background, never on import or a request"""
+    with _lock:
+        _checks[name] = (probe, hint)
+        _status.setdefault(name, {'ok': None, 'checked_at': None, 'error': None, 'latency_ms': None})
+
+def run_check(name):
+    probe, hint = _checks[name]
+    start = time.perf_counter()
+    try:
+        probe()
+        result = {'ok': True, 'error': None}
+    except Exception as e:
+        result = {'ok': False, 'error': str(e)}
+        logger.error("Health check %s failed: %s", name, e, extra={'hint': hint} if hint else None)
+    result['checked_at'] = time.time()
+    result['latency_ms'] = round((time.perf_counter() - start) * 1000, 1)
+    with _lock:
+        previous = _status.get(name, {}).get('ok')
+        _status[name] = result
+    if result['ok'] and previous is not True:
+        logger.info("Health check %s passed", name)
+    return result
+
+def run_all():
+    for name in list(_checks):
+        run_check(name)
+
+def _loop(interval):
+    while True:
+        run_all()
+        time.sleep(interval)
+
+def start(interval=HEALTH_CHECK_INTERVAL_SECONDS):
+    """Run every probe now and then every `interval` seconds on a daemon thread"""
+    global _started
+    with _lock:
+        if _started or not _checks:
+            return
+        _started = True
+    threading.Thread(target=_loop, args=(interval,), name='health-checks', daemon=True).start()
+
+def get_status():
+    """Latest result per check; ok is None until a check has run"""
+    with _lock:
+        return {name: dict(status) for name, status in _status.items()}
@@ -0,0 +1,167 @@
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from tracing import span
+
+# Seconds; spans fast SQLite reads through slow model calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts (the last slot is +Inf), sum, count
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self):
+        """{label values: (count, sum)} for quick summaries"""
+        with self._lock:
+            return {key: (series[2], series[1]) for key, series in self._series.items()}
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += bucket_count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, [('le', le)])} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+REQUEST_LATENCY = Histogram(
+    'genie_http_request_duration_seconds', 'HTTP request latency by route.',
+    ('route', 'method', 'status')
+)
+INTENT_LATENCY = Histogram(
+    'genie_chat_intent_duration_seconds', 'Time spent handling a chat message by route and intent.',
+    ('route', 'intent')
+)
+UPSTREAM_LATENCY = Histogram(
+    'genie_upstream_call_duration_seconds', 'Latency of calls to external services.',
+    ('service', 'operation')
+)
+UPSTREAM_ERRORS = Counter(
+    'genie_upstream_call_errors_total', 'Calls to external services that raised.',
+    ('service', 'operation')
+)
+DB_LATENCY = Histogram(
+    'genie_db_query_duration_seconds', 'SQL statement latency by statement type.',
+    ('statement',)
+)
+ADMISSION_WAIT = Histogram(
+    'genie_admission_wait_seconds', 'Time admitted or timed-out requests spent waiting for a slot.',
+    ('controller',)
+)
+ADMISSION_REJECTIONS = Counter(
+    'genie_admission_rejections_total', 'Requests turned away with 429 by reason.',
+    ('controller', 'reason')
+)
+JOB_DURATION = Histogram(
+    'genie_job_duration_seconds', 'Background job run time by kind and outcome (done, queued for retry, failed).',
+    ('kind', 'outcome')
+)
+METRICS = [
+    REQUEST_LATENCY, INTENT_LATENCY, UPSTREAM_LATENCY, UPSTREAM_ERRORS, DB_LATENCY,
+    ADMISSION_WAIT, ADMISSION_REJECTIONS, JOB_DURATION,
+]
+
+@contextmanager
+def timed(service, operation):
+    """Time a call to an external service, counting failures; also traced as a span"""
+    start = time.perf_counter()
+    try:
+        with span(f"{service} {operation}", **{'peer.service': service}):
+            yield
+    except Exception:
+        UPSTREAM_ERRORS.inc(service=service, operation=operation)
+        raise
+    finally:
+        UPSTREAM_LATENCY.observe(time.perf_counter() - start, service=service, operation=operation)
+
+def instrument_sqlalchemy():
+    """Time every SQL statement on every engine"""
+    # The start time lives on the statement's execution context rather than the
+    # pooled connection, so a statement that raises leaves nothing behind
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._query_start = time.perf_counter()
+
+    @event.listens_for(Engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, '_query_start', None)
+        if start is not None:
+            DB_LATENCY.observe(time.perf_counter() - start, statement=statement.lstrip().split(' ', 1)[0].upper())
+
+def init_app(app):
+    """Record per-route request latency for a Flask app"""
+    @app.before_request
+    def start_request_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def record_request_latency(response):
+        start = g.pop('request_start', None)
+        if start is not None:
+            REQUEST_LATENCY.observe(
+                time.perf_counter() - start,
+                route=request.url_rule.rule if request.url_rule else 'unmatched',
+                method=request.method,
+                status=str(response.status_code)
+            )
+        return response
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.expose())
+    return '\n'.join(lines) + '\n'
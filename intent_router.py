@@ -0,0 +1,84 @@
+import re
+import time
+import threading
+from contextlib import contextmanager
+from instrumentation import INTENT_LATENCY
+
+ROUTE_CALENDAR = 'calendar'
+ROUTE_CACHED = 'cached'
+ROUTE_CHAT = 'chat'
+
+# Any message that parse_event_details could turn into a calendar action
+# contains one of these words, so everything else can skip the parser.
+CALENDAR_HINT = re.compile(
+    r"\b(?:add|create|schedule|plan|view|show|display|list|check|tell|calendar|agenda|scheduled)\b"
+)
+
+CANNED_PATTERNS = [
+    ('greeting', re.compile(r"^(?:hi|hello|hey|hiya|good (?:morning|afternoon|evening))(?: genie| there)?[!. ]*$")),
+    ('thanks', re.compile(r"^(?:thanks|thank you|thx|ty|cheers)(?: so much| genie)?[!. ]*$")),
+    ('help', re.compile(r"^(?:help|what can you do|how do i use (?:this|you))\??$")),
+]
+
+CANNED_RESPONSES = {
+    'greeting': "👋 Hi! I'm Genie. Ask me to plan a trip, check your calendar or add an event.",
+    'thanks': "😊 You're welcome! Anything else I can help you plan?",
+    'help': (
+        "🧞 Here's what I can do:\n"
+        "• \"Show my calendar\" to see upcoming events\n"
+        "• \"Add dinner with Sam tomorrow at 7pm\" to create an event\n"
+        "• \"Plan a trip to Denver from June 3 to June 7\" to find free dates\n"
+        "• Ask me anything about travel planning"
+    ),
+}
+
+_stats_lock = threading.Lock()
+_route_stats = {}
+
+def normalize(message):
+    """Lowercase and collapse whitespace so equivalent messages classify the same"""
+    return ' '.join(message.lower().split())
+
+def classify(message):
+    """Classify a message locally, returning (route, label)"""
+    text = normalize(message)
+    if CALENDAR_HINT.search(text):
+        return ROUTE_CALENDAR, None
+    for label, pattern in CANNED_PATTERNS:
+        if pattern.match(text):
+            return ROUTE_CACHED, label
+    return ROUTE_CHAT, None
+
+def canned_response(label):
+    """Return the stored answer for a canned intent, or None"""
+    return CANNED_RESPONSES.get(label)
+
+@contextmanager
+def timed_route(route, intent=None):
+    """Record how long the block handling a route takes"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        record_latency(route, elapsed)
+        INTENT_LATENCY.observe(elapsed, route=route, intent=intent or route)
+
+def record_latency(route, seconds):
+    with _stats_lock:
+        stats = _route_stats.setdefault(route, {'count': 0, 'total': 0.0, 'max': 0.0})
+        stats['count'] += 1
+        stats['total'] += seconds
+        stats['max'] = max(stats['max'], seconds)
+
+def get_route_stats():
+    """Snapshot of per-route call counts and latencies in milliseconds"""
+    with _stats_lock:
+        return {
+            route: {
+                'count': stats['count'],
+                'avg_ms': round(stats['total'] / stats['count'] * 1000, 2),
+                'max_ms': round(stats['max'] * 1000, 2)
+            }
+            for route, stats in _route_stats.items()
+        }
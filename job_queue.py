@@ -0,0 +1,227 @@
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from google_calendar import acting_as
+from instrumentation import JOB_DURATION
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '5'))
+# A running job whose worker hasn't finished within this long is assumed lost and re-queued
+JOB_LEASE_SECONDS = 300
+# Fallback wake-up for jobs queued by another process or waiting out a retry delay
+POLL_INTERVAL_SECONDS = 1.0
+MAX_RETRY_DELAY_SECONDS = 60
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+class JobRun:
+    """A claimed job as handed to its handler"""
+
+    def __init__(self, job_id, kind, key, user_key, payload, attempts):
+        self.id = job_id
+        self.kind = kind
+        self.key = key  # Idempotency key if given, else the job id; stable across retries
+        self.user_key = user_key
+        self.payload = payload
+        self.attempts = attempts
+
+class JobQueue:
+    """Durable background jobs stored in the app database and run by worker threads.
+
+    `model` is the SQLAlchemy job table. Claiming is a conditional UPDATE, so
+    several processes can share one database without running a job twice. A
+    job is retried with backoff until JOB_MAX_ATTEMPTS; handlers receive a
+    stable `key` so retried side effects can be made idempotent.
+    """
+
+    def __init__(self, app, db, model, workers=JOB_WORKERS, max_attempts=JOB_MAX_ATTEMPTS,
+                 permanent_errors=()):
+        self.app = app
+        self.db = db
+        self.model = model
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.permanent_errors = tuple(permanent_errors)  # Never retried
+        self._handlers = {}
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._started = False
+
+    def register(self, kind, run, on_failure=None):
+        """`run(job)` returns a JSON-able result; `on_failure(job, error)` runs once retries are exhausted"""
+        self._handlers[kind] = (run, on_failure)
+
+    def enqueue(self, kind, payload, user_key=None, idempotency_key=None):
+        """Queue a job and return its id; an existing job with the same idempotency key is reused.
+
+        The job is added to the caller's transaction and runs once the caller commits.
+        """
+        Job = self.model
+        session = self.db.session
+        if idempotency_key:
+            existing = session.query(Job.id).filter_by(idempotency_key=idempotency_key).first()
+            if existing:
+                return existing.id
+        job = Job(
+            id=uuid.uuid4().hex, kind=kind, user_key=user_key, idempotency_key=idempotency_key,
+            payload=json.dumps(payload), status=QUEUED, attempts=0, run_after=time.time()
+        )
+        try:
+            # A savepoint, so losing the race below leaves the caller's transaction intact
+            with session.begin_nested():
+                session.add(job)
+        except IntegrityError:
+            # Lost a race with a retry carrying the same key
+            return session.query(Job.id).filter_by(idempotency_key=idempotency_key).one().id
+        event.listen(session(), 'after_commit', self._wake, once=True)
+        return job.id
+
+    def _wake(self, session):
+        self._wakeup.set()
+
+    def status(self, job_id):
+        job = self.db.session.get(self.model, job_id)
+        if job is None:
+            return None
+        return {
+            'id': job.id,
+            'kind': job.kind,
+            'user_key': job.user_key,
+            'status': job.status,
+            'attempts': job.attempts,
+            'result': json.loads(job.result) if job.result else None,
+            'error': job.error,
+        }
+
+    def start(self):
+        """Start the worker threads once per process"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        for i in range(self.workers):
+            threading.Thread(target=self._work, name=f'job-worker-{i}', daemon=True).start()
+
+    def _work(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                for job, error in self._sweep():
+                    self._give_up(job, error)
+                job = self._claim()
+            except Exception:
+                logger.exception("Failed to claim a job")
+                job = None
+            if job is None:
+                self._wakeup.wait(POLL_INTERVAL_SECONDS)
+                continue
+            self._run(job)
+
+    def _sweep(self):
+        """Requeue jobs left running by a crashed or killed worker.
+
+        Jobs already on their last attempt are failed instead; returns them,
+        with the error, for their failure handlers.
+        """
+        Job = self.model
+        with self.app.app_context():
+            session = self.db.session
+            now = time.time()
+            expired = (Job.status == RUNNING) & (Job.leased_until < now)
+            exhausted = []
+            for job in session.query(Job).filter(expired, Job.attempts >= self.max_attempts).all():
+                error = f"Worker lost on attempt {job.attempts} of {self.max_attempts}"
+                # Another worker's sweep may have got there first
+                failed = session.query(Job).filter(Job.id == job.id, expired).update(
+                    {'status': FAILED, 'error': error, 'leased_until': None}, synchronize_session=False
+                )
+                if failed:
+                    logger.warning("Job %s (%s) lost its worker on its last attempt; giving up", job.id, job.kind)
+                    exhausted.append((self._job_run(job), RuntimeError(error)))
+            session.query(Job).filter(expired).update({'status': QUEUED}, synchronize_session=False)
+            session.commit()
+            return exhausted
+
+    def _job_run(self, job):
+        return JobRun(
+            job.id, job.kind, job.idempotency_key or job.id, job.user_key,
+            json.loads(job.payload), job.attempts
+        )
+
+    def _claim(self):
+        Job = self.model
+        with self.app.app_context():
+            session = self.db.session
+            now = time.time()
+            while True:
+                candidate = session.query(Job.id).filter(
+                    Job.status == QUEUED, Job.run_after <= now
+                ).order_by(Job.run_after).first()
+                if candidate is None:
+                    session.commit()
+                    return None
+                claimed = session.query(Job).filter(Job.id == candidate.id, Job.status == QUEUED).update(
+                    {'status': RUNNING, 'attempts': Job.attempts + 1, 'leased_until': now + JOB_LEASE_SECONDS},
+                    synchronize_session=False
+                )
+                session.commit()
+                if claimed:
+                    break
+            return self._job_run(session.get(Job, candidate.id))
+
+    def _run(self, job):
+        run, on_failure = self._handlers.get(job.kind, (None, None))
+        start = time.perf_counter()
+        outcome = DONE
+        try:
+            if run is None:
+                raise LookupError(f"No handler registered for job kind {job.kind!r}")
+            with self.app.app_context(), acting_as(job.user_key), span(f"job {job.kind}", **{'job.id': job.id}):
+                result = run(job)
+            self._finish(job, status=DONE, result=json.dumps(result))
+        except Exception as e:
+            final = isinstance(e, self.permanent_errors) or run is None or job.attempts >= self.max_attempts
+            if not final:
+                outcome = QUEUED
+                delay = min(2 ** job.attempts, MAX_RETRY_DELAY_SECONDS)
+                logger.warning("Job %s (%s) failed on attempt %d, retrying in %ds: %s",
+                               job.id, job.kind, job.attempts, delay, e)
+                self._finish(job, status=QUEUED, error=str(e), run_after=time.time() + delay)
+            else:
+                outcome = FAILED
+                logger.exception("Job %s (%s) failed after %d attempt(s)", job.id, job.kind, job.attempts)
+                self._give_up(job, e)
+        finally:
+            JOB_DURATION.observe(time.perf_counter() - start, kind=job.kind, outcome=outcome)
+
+    def _give_up(self, job, error):
+        """Mark a job failed for good, recording what its failure handler returns"""
+        _, on_failure = self._handlers.get(job.kind, (None, None))
+        result = None
+        if on_failure is not None:
+            try:
+                with self.app.app_context(), acting_as(job.user_key):
+                    result = on_failure(job, error)
+            except Exception:
+                logger.exception("Failure handler for job %s raised", job.id)
+        self._finish(job, status=FAILED, error=str(error), result=json.dumps(result) if result else None)
+
+    def _finish(self, job, status, result=None, error=None, run_after=None):
+        Job = self.model
+        values = {'status': status, 'result': result, 'error': error, 'leased_until': None}
+        if run_after is not None:
+            values['run_after'] = run_after
+        with self.app.app_context():
+            self.db.session.query(Job).filter(Job.id == job.id).update(values, synchronize_session=False)
+            self.db.session.commit()
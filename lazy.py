@@ -0,0 +1,49 @@
+import threading
+from importlib import import_module
+
+class LazyObject:
+    """Stand-in that builds its target on first use.
+
+    Attribute access and calls are forwarded to the target, so a module,
+    class or client held in a module-level name can be swapped for one of
+    these without touching its call sites.
+    """
+
+    def __init__(self, factory):
+        object.__setattr__(self, '_factory', factory)
+        object.__setattr__(self, '_target', None)
+        object.__setattr__(self, '_lock', threading.Lock())
+
+    def _resolve(self):
+        target = self._target
+        if target is None:
+            with self._lock:
+                if self._target is None:
+                    object.__setattr__(self, '_target', self._factory())
+                target = self._target
+        return target
+
+    @property
+    def loaded(self):
+        return self._target is not None
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self._resolve()(*args, **kwargs)
+
+    def __repr__(self):
+        return f"<lazy {self._target!r}>" if self.loaded else "<lazy (not loaded)>"
+
+def lazy_import(module, name=None):
+    """A module, or one name from it, imported the first time it is used"""
+    if name is None:
+        return LazyObject(lambda: import_module(module))
+    return LazyObject(lambda: getattr(import_module(module), name))
+
+def preload(*objects):
+    """Resolve lazy objects now, e.g. while a worker warms up"""
+    for obj in objects:
+        if isinstance(obj, LazyObject):
+            obj._resolve()
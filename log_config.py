@@ -0,0 +1,149 @@
+import os
+import sys
+import json
+import queue
+import atexit
+import hashlib
+import logging
+import secrets
+import threading
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from flask import g, request
+import tracing
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+
+_request_id = ContextVar('request_id', default=None)
+
+# LogRecord attributes that are not user-supplied fields
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'request_id', 'trace_id', 'sample_rate'}
+
+def session_ref(session_id):
+    """Short stable reference to a session, so raw session ids never reach the logs"""
+    if not session_id:
+        return None
+    return hashlib.sha256(session_id.encode()).hexdigest()[:12]
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; `extra` fields become top-level keys"""
+
+    def format(self, record):
+        entry = {
+            'ts': self.formatTime(record, '%Y-%m-%dT%H:%M:%S') + f'.{int(record.msecs):03d}',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key in ('request_id', 'trace_id'):
+            if getattr(record, key, None):
+                entry[key] = getattr(record, key)
+        for key, value in vars(record).items():
+            if key not in _RESERVED and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            # Already formatted by the queue handler
+            entry['exc_info'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class ContextFilter(logging.Filter):
+    """Stamp records with the current request and trace ids while still on the calling thread"""
+
+    def filter(self, record):
+        record.request_id = _request_id.get()
+        span = tracing.current_span()
+        record.trace_id = span.trace_id if span else None
+        return True
+
+class SamplingFilter(logging.Filter):
+    """Keep one in N records logged with extra={'sample_rate': 1/N}.
+
+    Counting is per message template, so a chatty message is thinned out
+    without hiding rarer ones. Warnings and above are never dropped.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        rate = getattr(record, 'sample_rate', None)
+        if not rate or rate >= 1 or record.levelno >= logging.WARNING:
+            return True
+        every = round(1 / rate)
+        key = (record.name, record.msg)
+        with self._lock:
+            count = self._counts.get(key, 0)
+            self._counts[key] = count + 1
+        if count % every:
+            return False
+        record.sampled = f"1/{every}"
+        return True
+
+class _PassThroughQueueHandler(QueueHandler):
+    """Enqueue records as-is; the listener thread does the JSON encoding"""
+
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+_listener = None
+
+def setup_logging(level=LOG_LEVEL, stream=None):
+    """Route all logging through a queue to a JSON writer thread.
+
+    Request threads only pay for a queue put; formatting and the write to
+    stdout happen on the listener thread, so a slow pipe never stalls a
+    request. Safe to call more than once.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+    log_queue = queue.SimpleQueue()
+    handler = _PassThroughQueueHandler(log_queue)
+    handler.addFilter(ContextFilter())
+    handler.addFilter(SamplingFilter())
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter())
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+    _listener = QueueListener(log_queue, output)
+    _listener.start()
+    atexit.register(_listener.stop)
+    os.register_at_fork(after_in_child=_restart_listener)
+    return _listener
+
+def _restart_listener():
+    """Threads don't survive fork, so a forked worker needs its own listener thread"""
+    if _listener is not None:
+        _listener._thread = None
+        _listener.start()
+
+def init_app(app):
+    """Give each request an id (honouring X-Request-ID) and echo it back"""
+    @app.before_request
+    def assign_request_id():
+        g.request_id_token = _request_id.set(request.headers.get('X-Request-ID') or secrets.token_hex(8))
+
+    @app.after_request
+    def echo_request_id(response):
+        request_id = _request_id.get()
+        if request_id:
+            response.headers['X-Request-ID'] = request_id
+        return response
+
+    @app.teardown_request
+    def clear_request_id(error=None):
+        token = g.pop('request_id_token', None)
+        if token is not None:
+            _request_id.reset(token)
@@ -0,0 +1,40 @@
+import heapq
+
+def find_overlaps(starts, ends):
+    """Every overlapping pair (i, j), i starting no later than j.
+
+    Intervals are half-open [start, end), so back-to-back events do not
+    clash. A sweep over the starts keeps a min-heap of active intervals keyed
+    by end; each new interval overlaps exactly what is still active, which
+    makes the whole pass O(n log n + k) for k overlapping pairs.
+    """
+    order = sorted(range(len(starts)), key=starts.__getitem__)
+    active = []
+    pairs = []
+    for j in order:
+        start = starts[j]
+        while active and active[0][0] <= start:
+            heapq.heappop(active)
+        for _, i in active:
+            pairs.append((i, j))
+        heapq.heappush(active, (ends[j], j))
+    return pairs
+
+def overlap_clusters(starts, ends):
+    """Groups of intervals connected by overlaps; singletons are left out"""
+    order = sorted(range(len(starts)), key=starts.__getitem__)
+    clusters = []
+    current = []
+    current_end = None
+    for i in order:
+        if current and starts[i] < current_end:
+            current.append(i)
+            current_end = max(current_end, ends[i])
+        else:
+            if len(current) > 1:
+                clusters.append(current)
+            current = [i]
+            current_end = ends[i]
+    if len(current) > 1:
+        clusters.append(current)
+    return clusters
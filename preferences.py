@@ -0,0 +1,177 @@
+"""User preferences as small immutable objects.
+
+Profiles store preferences as a JSON string. parse_preferences turns that
+string into a Preferences object once and memoizes it on the string, so
+every later read of an unchanged profile is a dict lookup rather than a
+json.loads plus validation. Objects compare by value, which is how profile
+updates detect that nothing changed and skip the Airtable write.
+"""
+import json
+from functools import lru_cache
+
+# Version 1 (no "version" key) predates travel_preferences.home_location
+SCHEMA_VERSION = 2
+PARSE_CACHE_SIZE = 4096
+PREFERENCES_FIELD = 'Preferences'
+
+class Record:
+    """Immutable value object; subclasses list their fields in __slots__ and DEFAULTS"""
+    __slots__ = ()
+    DEFAULTS = {}
+    NESTED = {}  # field -> Record subclass
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            object.__setattr__(self, name, values.get(name, self.DEFAULTS.get(name)))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable; use replace()")
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build from decoded JSON, falling back to the default for missing or mistyped values"""
+        data = data if isinstance(data, dict) else {}
+        values = {}
+        for name in cls.__slots__:
+            if name in cls.NESTED:
+                values[name] = cls.NESTED[name].from_dict(data.get(name))
+            else:
+                values[name] = _coerce(data.get(name), cls.DEFAULTS[name])
+        return cls(**values)
+
+    def to_dict(self):
+        result = {}
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if isinstance(value, Record):
+                value = value.to_dict()
+            elif isinstance(value, tuple):
+                value = list(value)
+            result[name] = value
+        return result
+
+    def replace(self, **changes):
+        values = {name: getattr(self, name) for name in self.__slots__}
+        values.update(changes)
+        return type(self)(**values)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__
+        )
+
+    def __hash__(self):
+        return hash(tuple(getattr(self, name) for name in self.__slots__))
+
+    def __repr__(self):
+        fields = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+def _coerce(value, default):
+    """`value` as the type of `default`, or `default` if it can't be"""
+    if value is None:
+        return default
+    if isinstance(default, bool):
+        return value if isinstance(value, bool) else default
+    if isinstance(default, int):
+        # Every numeric preference is a positive amount or duration
+        try:
+            value = int(value)
+        except (TypeError, ValueError, OverflowError):
+            return default
+        return value if value > 0 else default
+    if isinstance(default, tuple):
+        return tuple(str(item) for item in value) if isinstance(value, list) else default
+    if isinstance(default, str):
+        return (value.strip() or default) if isinstance(value, str) else default
+    return value
+
+class FoodPreferences(Record):
+    __slots__ = ('budget_per_meal', 'dietary_restrictions', 'cuisine_preferences')
+    DEFAULTS = {
+        'budget_per_meal': 20,
+        'dietary_restrictions': (),
+        'cuisine_preferences': (),
+    }
+
+class TravelPreferences(Record):
+    __slots__ = ('mode', 'max_travel_time', 'accommodation_budget', 'preferred_airlines', 'home_location')
+    DEFAULTS = {
+        'mode': 'driving',
+        'max_travel_time': 60,
+        'accommodation_budget': 150,
+        'preferred_airlines': (),
+        'home_location': 'Denver',
+    }
+
+class Preferences(Record):
+    __slots__ = (
+        'version', 'theme', 'language', 'notifications', 'calendar_default_duration', 'timezone',
+        'food_preferences', 'travel_preferences'
+    )
+    DEFAULTS = {
+        'version': SCHEMA_VERSION,
+        'theme': 'light',
+        'language': 'en',
+        'notifications': True,
+        'calendar_default_duration': 60,
+        'timezone': 'America/Denver',
+    }
+    NESTED = {
+        'food_preferences': FoodPreferences,
+        'travel_preferences': TravelPreferences,
+    }
+
+    def to_json(self):
+        return json.dumps(self.to_dict())
+
+def _v1_to_v2(data):
+    travel = data.get('travel_preferences')
+    travel = dict(travel) if isinstance(travel, dict) else {}
+    travel.setdefault('home_location', TravelPreferences.DEFAULTS['home_location'])
+    return dict(data, travel_preferences=travel)
+
+# Upgrade step from each old version to the next
+MIGRATIONS = {1: _v1_to_v2}
+
+def migrate(data):
+    """`data` upgraded to SCHEMA_VERSION; a missing or unrecognised version is read as 1"""
+    version = data.get('version')
+    if not isinstance(version, int) or isinstance(version, bool) or not 1 <= version <= SCHEMA_VERSION:
+        version = 1
+    while version < SCHEMA_VERSION:
+        data = MIGRATIONS[version](data)
+        version += 1
+    return dict(data, version=SCHEMA_VERSION)
+
+DEFAULT_PREFERENCES = Preferences.from_dict({})
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_preferences(raw):
+    """Preferences from a stored JSON string; empty or invalid input gives the defaults"""
+    if not raw:
+        return DEFAULT_PREFERENCES
+    try:
+        data = json.loads(raw)
+    except (TypeError, ValueError):
+        return DEFAULT_PREFERENCES
+    if not isinstance(data, dict):
+        return DEFAULT_PREFERENCES
+    return Preferences.from_dict(migrate(data))
+
+def changed_fields(current, updates):
+    """The profile fields in `updates` whose value differs from `current`.
+
+    Preferences are compared as parsed objects, so a re-serialized but
+    equivalent JSON string doesn't count as a change.
+    """
+    changed = {}
+    for name, value in updates.items():
+        old = current.get(name)
+        if name == PREFERENCES_FIELD:
+            if old is not None and parse_preferences(old) == parse_preferences(value):
+                continue
+        elif old == value:
+            continue
+        changed[name] = value
+    return changed
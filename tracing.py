@@ -0,0 +1,197 @@
+import os
+import sys
+import json
+import time
+import secrets
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from flask import g, request
+
+# 'console' writes spans to stderr, 'file' appends them to TRACE_FILE; anything else disables tracing
+TRACE_EXPORTER = os.getenv('TRACE_EXPORTER', '')
+TRACE_FILE = os.getenv('TRACE_FILE', 'traces.jsonl')
+
+STATUS_UNSET = 'UNSET'
+STATUS_OK = 'OK'
+STATUS_ERROR = 'ERROR'
+
+_current_span = ContextVar('current_span', default=None)
+
+class Span:
+    """One timed operation; ids and fields follow the OpenTelemetry data model"""
+
+    def __init__(self, name, trace_id, parent_id=None, attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.status = STATUS_UNSET
+        self.status_message = ''
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def record_error(self, error):
+        self.status = STATUS_ERROR
+        self.status_message = f"{type(error).__name__}: {error}"
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_span_id': self.parent_id,
+            'start_time_unix_nano': self.start_ns,
+            'end_time_unix_nano': self.end_ns,
+            'duration_ms': round((self.end_ns - self.start_ns) / 1e6, 3),
+            'attributes': self.attributes,
+            'status': {'code': self.status, 'message': self.status_message}
+        }
+
+class ConsoleExporter:
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stderr
+        self._lock = threading.Lock()
+
+    def export(self, span):
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            self.stream.write(line + '\n')
+            self.stream.flush()
+
+class FileExporter(ConsoleExporter):
+    """Appends one JSON span per line"""
+
+    def __init__(self, path=TRACE_FILE):
+        super().__init__(open(path, 'a', buffering=1, encoding='utf-8'))
+        self.path = path
+
+def _default_exporter():
+    if TRACE_EXPORTER == 'console':
+        return ConsoleExporter()
+    if TRACE_EXPORTER == 'file':
+        return FileExporter()
+    return None
+
+exporter = _default_exporter()
+
+def set_exporter(new_exporter):
+    """Swap the exporter, e.g. for a benchmark or a one-off debugging session"""
+    global exporter
+    exporter = new_exporter
+
+def current_span():
+    return _current_span.get()
+
+@contextmanager
+def span(name, **attributes):
+    """Time a block as a child of the current span (or a new trace)"""
+    if exporter is None:
+        yield None
+        return
+    parent = _current_span.get()
+    current = Span(name, parent.trace_id if parent else secrets.token_hex(16),
+                   parent.span_id if parent else None, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except Exception as e:
+        current.record_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end_ns = time.time_ns()
+        exporter.export(current)
+
+def traced(name=None):
+    """Decorator form of span(), named after the function by default"""
+    def decorator(func):
+        span_name = name or func.__name__
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def parse_traceparent(header):
+    """(trace_id, parent span_id) from a W3C traceparent header, or None"""
+    parts = (header or '').split('-')
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    return parts[1], parts[2]
+
+def init_app(app):
+    """Open a root span per request, continuing an incoming traceparent if present"""
+    @app.before_request
+    def start_request_span():
+        if exporter is None:
+            return
+        incoming = parse_traceparent(request.headers.get('traceparent'))
+        trace_id, parent_id = incoming or (secrets.token_hex(16), None)
+        root = Span(f"{request.method} {request.path}", trace_id, parent_id, {
+            'http.method': request.method,
+            'http.route': request.url_rule.rule if request.url_rule else '',
+        })
+        g.trace_token = _current_span.set(root)
+        g.trace_span = root
+
+    @app.after_request
+    def tag_response(response):
+        root = g.get('trace_span')
+        if root is not None:
+            root.set_attribute('http.status_code', response.status_code)
+            if response.status_code >= 500:
+                root.status = STATUS_ERROR
+            response.headers['traceparent'] = f"00-{root.trace_id}-{root.span_id}-01"
+        return response
+
+    @app.teardown_request
+    def end_request_span(error=None):
+        root = g.pop('trace_span', None)
+        if root is None:
+            return
+        if error is not None:
+            root.record_error(error)
+        _current_span.reset(g.pop('trace_token'))
+        root.end_ns = time.time_ns()
+        exporter.export(root)
+
+def load_trace(trace_id, path=TRACE_FILE):
+    """Every span of one trace from an exported file"""
+    spans = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            data = json.loads(line)
+            if data['trace_id'] == trace_id:
+                spans.append(data)
+    return spans
+
+def format_waterfall(spans, width=40):
+    """Text waterfall of a trace: one row per span, indented under its parent"""
+    if not spans:
+        return ''
+    children = {}
+    ids = {s['span_id'] for s in spans}
+    for s in sorted(spans, key=lambda s: s['start_time_unix_nano']):
+        parent = s['parent_span_id'] if s['parent_span_id'] in ids else None
+        children.setdefault(parent, []).append(s)
+    origin = min(s['start_time_unix_nano'] for s in spans)
+    total = max(s['end_time_unix_nano'] for s in spans) - origin or 1
+
+    rows = []
+    def walk(parent, depth):
+        for s in children.get(parent, []):
+            offset = int((s['start_time_unix_nano'] - origin) / total * width)
+            length = max(int((s['end_time_unix_nano'] - s['start_time_unix_nano']) / total * width), 1)
+            bar = ' ' * offset + '█' * length
+            flag = ' !' if s['status']['code'] == STATUS_ERROR else ''
+            rows.append(f"{bar:<{width}} {s['duration_ms']:>9.2f}ms {'  ' * depth}{s['name']}{flag}")
+            walk(s['span_id'], depth + 1)
+    walk(None, 0)
+    return '\n'.join(rows)
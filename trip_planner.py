@@ -0,0 +1,163 @@
+import re
+import logging
+from datetime import datetime, date, time, timedelta
+import pytz
+from google_calendar import get_calendar_service, iter_events, build_event_body, event_id, is_duplicate
+from instrumentation import timed
+
+logger = logging.getLogger(__name__)
+
+LOCAL_TZ = pytz.timezone('America/Denver')
+DEFAULT_TRIP_DAYS = 7
+MAX_SEARCH_DAYS = 183  # Roughly six months of candidate start dates
+
+# Hours spent getting to the destination on top of the user's max travel time
+MODE_OVERHEAD_HOURS = {
+    'flying': 2,
+    'train': 0.5,
+    'transit': 0.5,
+    'driving': 0
+}
+OUTBOUND_DEPARTURE = time(8, 0)
+RETURN_DEPARTURE = time(17, 0)
+
+LENGTH_PATTERNS = [
+    (re.compile(r"\b(\d{1,2})[- ]days?\b"), 1),
+    (re.compile(r"\b(\d{1,2})[- ]weeks?\b"), 7),
+    (re.compile(r"\ba (week)\b"), 7),
+    (re.compile(r"\b(weekend)\b"), 2),
+]
+
+def parse_trip_length(message, default=DEFAULT_TRIP_DAYS):
+    """Read a trip length in days from phrases like "for 5 days" or "a week" """
+    msg_lower = message.lower()
+    for pattern, multiplier in LENGTH_PATTERNS:
+        match = pattern.search(msg_lower)
+        if match:
+            value = match.group(1)
+            return (int(value) if value.isdigit() else 1) * multiplier
+    return default
+
+def to_local_date(value):
+    """Normalize dates and naive/aware datetimes to a local calendar date"""
+    if isinstance(value, datetime):
+        if value.tzinfo:
+            value = value.astimezone(LOCAL_TZ)
+        return value.date()
+    return value
+
+def busy_dates(events, tz=LOCAL_TZ):
+    """Set of local dates touched by any event, from the events' own intervals"""
+    busy = set()
+    for event in events:
+        start, end = event.get('start', {}), event.get('end', {})
+        if 'date' in start:
+            first = date.fromisoformat(start['date'])
+            # All-day end dates are exclusive
+            last = date.fromisoformat(end['date']) - timedelta(days=1)
+        elif 'dateTime' in start:
+            first = datetime.fromisoformat(start['dateTime']).astimezone(tz).date()
+            end_dt = datetime.fromisoformat(end['dateTime']).astimezone(tz)
+            # An event ending exactly at midnight does not occupy the next day
+            last = (end_dt - timedelta(microseconds=1)).date()
+        else:
+            continue
+        day = first
+        while day <= last:
+            busy.add(day)
+            day += timedelta(days=1)
+    return busy
+
+def find_free_block(busy, window_start, window_end, length):
+    """Earliest run of `length` consecutive free days starting inside the window.
+
+    Walks the sorted busy dates once instead of checking every day, so the
+    cost depends on how many busy days there are, not the window size.
+    """
+    candidate = window_start
+    last_start = window_end
+    for day in sorted(d for d in busy if d >= window_start):
+        if candidate > last_start:
+            break
+        if day >= candidate + timedelta(days=length):
+            break
+        candidate = day + timedelta(days=1)
+    if candidate > last_start:
+        return None
+    return candidate, candidate + timedelta(days=length - 1)
+
+def plan_trip(window_start, length, search_days=MAX_SEARCH_DAYS):
+    """Find the earliest free block from one paginated pass over the window"""
+    window_start = to_local_date(window_start)
+    window_end = window_start + timedelta(days=search_days)
+    time_min = LOCAL_TZ.localize(datetime.combine(window_start, time(0, 0)))
+    time_max = LOCAL_TZ.localize(datetime.combine(window_end + timedelta(days=length), time(0, 0)))
+    return find_free_block(busy_dates(iter_events(time_min, time_max)), window_start, window_end, length)
+
+def build_trip_events(destination, trip_start, trip_end, preferences):
+    """Event bodies for the trip itself plus outbound and return travel buffers; `preferences` is a TravelPreferences"""
+    mode = preferences.mode
+    description = (
+        f"Travel Mode: {mode}\n"
+        f"Budget: ${preferences.accommodation_budget}/night"
+    )
+    bodies = [build_event_body(
+        summary=f"Trip to {destination}",
+        start_time=trip_start,
+        end_time=trip_end + timedelta(days=1),
+        description=description,
+        location=destination,
+        is_all_day=True
+    )]
+
+    buffer = timedelta(minutes=preferences.max_travel_time) + \
+        timedelta(hours=MODE_OVERHEAD_HOURS.get(mode, 0))
+    outbound = LOCAL_TZ.localize(datetime.combine(trip_start, OUTBOUND_DEPARTURE))
+    inbound = LOCAL_TZ.localize(datetime.combine(trip_end, RETURN_DEPARTURE))
+    bodies.append(build_event_body(
+        summary=f"Travel to {destination}",
+        start_time=outbound,
+        end_time=outbound + buffer,
+        description=f"Travel Mode: {mode}"
+    ))
+    bodies.append(build_event_body(
+        summary=f"Travel home from {destination}",
+        start_time=inbound,
+        end_time=inbound + buffer,
+        description=f"Travel Mode: {mode}"
+    ))
+    return bodies
+
+def book_trip(destination, trip_start, trip_end, preferences, key=None):
+    """Insert all trip events in one batch request; returns the created events.
+
+    With a `key` each event gets a stable id, so re-running a failed booking
+    fills in the missing events without duplicating the ones that succeeded.
+    Raises the first insert error once the batch has finished.
+    """
+    service = get_calendar_service()
+    created = []
+    errors = []
+
+    def on_insert(request_id, response, exception):
+        if exception is not None:
+            if key and is_duplicate(exception):
+                created.append(bodies[int(request_id)])
+            else:
+                errors.append(exception)
+        else:
+            created.append(response)
+
+    bodies = build_trip_events(destination, trip_start, trip_end, preferences)
+    batch = service.new_batch_http_request(callback=on_insert)
+    for i, body in enumerate(bodies):
+        if key:
+            body['id'] = event_id(key, i)
+        batch.add(service.events().insert(calendarId='primary', body=body), request_id=str(i))
+    with timed('google_calendar', 'events.batch_insert'):
+        batch.execute()
+
+    if errors:
+        logger.error("Failed to create %d trip event(s): %s", len(errors), errors[0])
+        raise errors[0]
+    return created
@@ -0,0 +1,80 @@
+import time
+import logging
+from lazy import preload
+import google_calendar
+import credential_store
+import feasibility
+from intent_router import classify
+from gazetteer import get_gazetteer
+
+logger = logging.getLogger(__name__)
+
+# One message per parser branch, so every pattern is compiled and cached
+SAMPLE_MESSAGES = (
+    'hello',
+    'show my calendar',
+    'add team lunch tomorrow at 12pm',
+    'schedule dentist on friday at 3pm',
+    'plan a trip to denver on december 12 to december 20',
+    'what should I pack for iceland?',
+)
+SAMPLE_TIMES = ('tomorrow at 3pm', 'next friday', 'december 20', 'in 2 hours')
+
+def load_sdks(*extra):
+    """Import the SDKs the app otherwise loads on first use"""
+    preload(
+        google_calendar.dateparser, google_calendar.discovery, google_calendar.discovery_cache,
+        credential_store.Credentials, credential_store.Request, feasibility.np,
+        *extra
+    )
+
+def build_calendar_client():
+    """Parse the Calendar discovery document and build a client from it once"""
+    google_calendar.build_calendar_service(developer_key='warm-up')
+
+def prime_parsers():
+    """Run the intent classifier, event parser and dateparser over sample input.
+
+    dateparser loads its language data and compiles its patterns on first
+    use; doing that here keeps it off the first real request.
+    """
+    for message in SAMPLE_MESSAGES:
+        classify(message)
+        google_calendar.parse_event_details(message)
+    for text in SAMPLE_TIMES:
+        google_calendar.parse_natural_datetime(text)
+
+def open_db_connections(db, count):
+    """Check out `count` pooled connections and return them, leaving the pool full"""
+    connections = [db.engine.connect() for _ in range(count)]
+    for connection in connections:
+        connection.close()
+
+def compile_templates(app, names=('chat.html',)):
+    for name in names:
+        app.jinja_env.get_template(name)
+
+def _step(name, func, *args):
+    start = time.perf_counter()
+    try:
+        func(*args)
+    except Exception as e:
+        # A failed step only costs the first request some time; never block startup on it
+        logger.warning("Warm-up step %s failed: %s", name, e)
+        return
+    logger.info("Warm-up step %s took %.1fms", name, (time.perf_counter() - start) * 1000)
+
+def warm_shared(*lazy_objects):
+    """Process-wide work: run once in the master so forked workers share the result"""
+    _step('load_sdks', load_sdks, *lazy_objects)
+    _step('build_calendar_client', build_calendar_client)
+    _step('load_gazetteer', get_gazetteer)
+    _step('prime_parsers', prime_parsers)
+
+def warm_worker(app, db, connections):
+    """Per-process work that can't be inherited across fork"""
+    with app.app_context():
+        # Connections opened before the fork belong to the master
+        db.engine.dispose(close=False)
+        _step('open_db_connections', open_db_connections, db, connections)
+    _step('compile_templates', compile_templates, app)
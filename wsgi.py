@@ -0,0 +1,18 @@
+"""Production entry point: gunicorn -c gunicorn.conf.py wsgi:app
+
+With preload_app the master imports this once, so the schema check and the
+shared warm-up run before any worker is forked.
+"""
+import app as app_module
+from app import app, db, ensure_schema
+import warmup
+import assets
+
+with app.app_context():
+    ensure_schema()
+
+# Fingerprint and compress static files before forking, so every worker serves the same build
+assets.build_on_start(app)
+
+# Import the SDKs only; clients hold sockets and are built per worker on first use
+warmup.warm_shared(app_module.OpenAI, app_module.Airtable, app_module.Flow)